@@ -10,25 +10,88 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import plotly.express as px
+from datetime import datetime, timedelta, timezone
 import numpy as np
-from groq import Groq
+from groq import Groq, APIConnectionError, APIStatusError
 import re
 import sqlite3
-from collections import Counter
+from collections import Counter, OrderedDict
 import io
+import hashlib
+import json
+import logging
+import unicodedata
+import zlib
 import os
+import sys
+import subprocess
+import queue
+import threading
+import time
+import uuid
+import functools
+import atexit
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
 from difflib import SequenceMatcher
 
-st.set_page_config(page_title="GINI Guardian v4.5 Chat", page_icon="🛡️", layout="wide")
+logger = logging.getLogger("gini")
+
+def parse_flag(value):
+    """
+    불리언 설정 값 해석 (secrets.toml에 문자열로 적은 "false"/"0"도 False)
+    
+    bool("false")는 True라 문자열은 직접 비교, 알 수 없는 문자열은 int()/float() 설정처럼 ValueError
+    """
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("1", "true", "yes", "on"):
+            return True
+        if text in ("0", "false", "no", "off", ""):
+            return False
+        raise ValueError(f"불리언 설정 값이 아닙니다: {value!r}")
+    return bool(value)
 
 # Groq API 설정
 GROQ_API_KEY = st.secrets.get("GROQ_API_KEY", "")
+GROQ_BASE_URL = st.secrets.get("GROQ_BASE_URL", "") or os.getenv("GROQ_BASE_URL") or None
+
+# LLM 호출 안정성 설정 (secrets로 조정 가능)
+LLM_CONNECT_TIMEOUT = float(st.secrets.get("LLM_CONNECT_TIMEOUT", 5.0))    # 연결 타임아웃 (초)
+LLM_READ_TIMEOUT = float(st.secrets.get("LLM_READ_TIMEOUT", 30.0))         # 응답 대기 타임아웃 (초)
+LLM_MAX_RETRIES = int(st.secrets.get("LLM_MAX_RETRIES", 3))                # 429/5xx 재시도 횟수
+LLM_BACKOFF_BASE = 0.5          # 지수 백오프 시작값 (초)
+LLM_BACKOFF_MAX = 8.0           # 백오프 상한 (초)
+LLM_BREAKER_THRESHOLD = 5       # 연속 실패 N회 → 회로 차단
+LLM_BREAKER_COOLDOWN = 30.0     # 차단 유지 시간 (초), 이후 1회 시험 호출
+
+# LLM 응답 캐시 설정
+LLM_CACHE_ENABLED = parse_flag(st.secrets.get("LLM_CACHE_ENABLED", True))
+LLM_CACHE_PERSIST = parse_flag(st.secrets.get("LLM_CACHE_PERSIST", True))       # SQLite에도 저장
+LLM_CACHE_MAX_ENTRIES = int(st.secrets.get("LLM_CACHE_MAX_ENTRIES", 500))  # 메모리 LRU 크기
+LLM_CACHE_TTL = float(st.secrets.get("LLM_CACHE_TTL", 6 * 3600))           # 유효 시간 (초)
+
+# 고위험 메시지 게이트 설정 (극단적 압박 감정 + HIGH 위험이면 LLM보다 개입을 먼저)
+#   off: 평소처럼 LLM 응답 후 개입 / defer: 개입 즉시 표시, LLM은 백그라운드 / skip: 개입만 (LLM 호출 생략)
+GATING_POLICY = str(st.secrets.get("GATING_POLICY", "defer")).lower()
+GATE_TAGS = ("자포자기", "충동")  # 게이트 대상 극단적 압박 감정 (탐욕 등은 평소처럼 LLM 응답 후 개입)
+GATE_MIN_TAG_SCORE = 1.5        # 해당 태그 키워드 가중치 합 하한 ('지금'/'급' 같은 약한 단어만으로는 게이트 안 함)
+GATE_MIN_RISK = 6.5             # 즉시 위험 추정이 HIGH(detect_risk_level) 이상일 때만 게이트
+COUNSEL_WORKERS = 4             # 백그라운드 LLM 상담 스레드 수
+
+# 다중 사용자 설정 (True면 로그인 이메일 / URL ?user= 사용자별로 데이터 분리)
+MULTI_USER = parse_flag(st.secrets.get("MULTI_USER", False))
+ADMIN_USERS = {str(email).lower() for email in st.secrets.get("ADMIN_USERS", [])}   # 전역 관리 작업 가능한 로그인 이메일
+
+# 저장소 설정 - sqlite: 로컬 gini.db (단일 노드) / postgres: DATABASE_URL (여러 replica가 공유)
+DB_BACKEND = str(st.secrets.get("DB_BACKEND", "sqlite")).lower()
+DATABASE_URL = st.secrets.get("DATABASE_URL", "") or os.getenv("DATABASE_URL", "")
 # ====================================================================
 # 🎨 강력한 라이라 디자인 CSS - FINAL 적용 버전
 # ====================================================================
 
-st.markdown("""
+THEME_CSS = """
 <style>
 
 :root {
@@ -145,7 +208,7 @@ p, div, span, label {
 }
 
 </style>
-""", unsafe_allow_html=True)
+"""
 
 
 
@@ -154,7 +217,7 @@ p, div, span, label {
 # 📱 PWA 설정
 # ============================================================================
 
-st.markdown("""
+PWA_HEAD_HTML = """
 <head>
     <meta name="theme-color" content="#667eea">
     <meta name="apple-mobile-web-app-capable" content="yes">
@@ -178,11 +241,12 @@ st.markdown("""
         });
     }
 </script>
-""", unsafe_allow_html=True)
+"""
 # ============================================================================
 # 📊 종목명 데이터베이스 (제미니 전략)
 # ============================================================================
 
+# 내장 기본 종목명 (종목 마스터가 아직 저장소에 없을 때 사용, 전 종목은 get_ticker_master)
 STOCK_NAMES_DB = {
     '삼성전자': '005930', 'SK하이닉스': '000660', 'NAVER': '035420', '카카오': '035720',
     '삼성바이오로직스': '207940', 'LG에너지솔루션': '373220', 'LG화학': '051910',
@@ -201,59 +265,317 @@ COMMON_MISTAKES = {
     '현대자동차': '현대차',
 }
 
+FUZZY_TOP_K = 3             # 유사 종목 최대 반환 수
+FUZZY_CACHE_SIZE = 4096     # 토큰별 매칭 결과 캐시 크기
+FUZZY_MIN_LENGTH = 3        # 이보다 짧은 단어는 퍼지 매칭 안 함 ('세계' → '신세계' 0.8 같은 오탐)
+
 def get_similarity(str1, str2):
     """두 문자열 유사도 (0.0~1.0)"""
     return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
 
+def build_stock_name_index(names):
+    """
+    종목명 퍼지 매칭용 역색인 (글자 → [(종목명 번호, 글자 수)])
+    
+    SequenceMatcher 점수는 글자 단위 일치로 계산되므로 글자를 하나도 공유하지 않는
+    종목명은 0점 → 질문 글자의 색인 목록만 훑어 후보와 공통 글자 수를 함께 구함
+    
+    Args:
+        names: {종목명: 종목코드}
+    """
+    postings = {}
+    for name_id, name in enumerate(names):
+        for char, count in Counter(name.lower()).items():
+            postings.setdefault(char, []).append((name_id, count))
+    
+    return {
+        'names': list(names),
+        'codes': list(names.values()),
+        'postings': postings,
+        'cache': OrderedDict(),
+        'lock': threading.Lock()
+    }
+
+@st.cache_resource(max_entries=2)
+def _stock_name_index_for(version):
+    """종목 마스터 버전별 색인 (마스터가 갱신되면 새 버전으로 다시 빌드)"""
+    return build_stock_name_index(get_stock_names())
+
+def get_stock_name_index():
+    """프로세스 전역 종목명 색인 (세션 간 공유, 토큰별 결과 캐시 포함)"""
+    return _stock_name_index_for(get_ticker_master()['version'])
+
+def _rank_similar_stocks(index, input_text, threshold):
+    """
+    색인으로 후보를 좁힌 뒤 SequenceMatcher로 정밀 채점
+    
+    - 공통 글자 수로 구한 점수 상한(difflib quick_ratio와 같은 값)이 높은 후보부터 채점
+    - 상한이 현재 FUZZY_TOP_K위 점수보다 낮아지면 중단 → 전 종목과 비교한 것과 같은 결과
+    """
+    common = Counter()
+    for char, query_count in Counter(input_text.lower()).items():
+        for name_id, count in index['postings'].get(char, ()):
+            common[name_id] += min(query_count, count)
+    
+    # ratio = 2·일치 글자 수 / 전체 길이 ≤ 2·공통 글자 수 / 전체 길이
+    query_len = len(input_text)
+    names = index['names']
+    bounded = []
+    for name_id, shared in common.items():
+        bound = 2 * shared / (query_len + len(names[name_id]))
+        if bound >= threshold:
+            bounded.append((bound, name_id))
+    bounded.sort(key=lambda x: (-x[0], x[1]))
+    
+    # (점수, 종목명 번호) - 동점은 종목 목록 순서
+    best = []
+    for bound, name_id in bounded:
+        if len(best) == FUZZY_TOP_K and bound < best[-1][0]:
+            break
+        similarity = get_similarity(input_text, names[name_id])
+        if similarity >= threshold:
+            best.append((similarity, name_id))
+            best.sort(key=lambda x: (-x[0], x[1]))
+            del best[FUZZY_TOP_K:]
+    
+    return [(names[name_id], index['codes'][name_id], similarity) for similarity, name_id in best]
+
 def find_similar_stock(input_text, threshold=0.7):
-    """퍼지 매칭으로 유사 종목 찾기"""
-    if input_text in STOCK_NAMES_DB:
-        return [(input_text, STOCK_NAMES_DB[input_text], 1.0)]
+    """퍼지 매칭으로 유사 종목 찾기 (글자 색인 후보 선별 + 토큰별 캐시)"""
+    stock_names = get_stock_names()
+    if input_text in stock_names:
+        return [(input_text, stock_names[input_text], 1.0)]
     
     if input_text in COMMON_MISTAKES:
         corrected = COMMON_MISTAKES[input_text]
-        if corrected in STOCK_NAMES_DB:
-            return [(corrected, STOCK_NAMES_DB[corrected], 0.95)]
+        if corrected in stock_names:
+            return [(corrected, stock_names[corrected], 0.95)]
     
-    similarities = []
-    for stock_name, stock_code in STOCK_NAMES_DB.items():
-        similarity = get_similarity(input_text, stock_name)
-        if similarity >= threshold:
-            similarities.append((stock_name, stock_code, similarity))
+    # 2글자 단어는 3글자 종목명에 들어 있기만 해도 0.8 → 정확한 종목명/흔한 오타만 인정
+    if len(input_text) < FUZZY_MIN_LENGTH:
+        return []
+    
+    index = get_stock_name_index()
+    key = (input_text, threshold)
+    
+    with index['lock']:
+        if key in index['cache']:
+            index['cache'].move_to_end(key)
+            return list(index['cache'][key])
+    
+    similarities = _rank_similar_stocks(index, input_text, threshold)
+    
+    with index['lock']:
+        index['cache'][key] = similarities
+        while len(index['cache']) > FUZZY_CACHE_SIZE:
+            index['cache'].popitem(last=False)
+    
+    return list(similarities)
+
+# 종목명 바로 뒤에 붙는 조사 (긴 것부터 확인)
+KOREAN_PARTICLES = (
+    '이랑', '에서', '으로', '까지', '부터', '처럼', '보다', '하고', '한테', '이나', '이요',
+    '은', '는', '이', '가', '을', '를', '도', '만', '랑', '과', '와', '의', '에', '로', '나', '요',
+)
+STOCK_TOKEN_PATTERN = re.compile(r'\w+')
+
+def build_keyword_automaton(entries):
+    """
+    Aho–Corasick 오토마톤 (여러 키워드를 문자열 1회 스캔으로 모두 찾음, 대소문자 무시)
+    
+    Args:
+        entries: [(키워드, payload), ...] - 같은 키워드의 payload는 모두 보관
+    
+    Returns:
+        dict: goto/fail/out 전이표 + patterns [(키워드 길이, [payload, ...])]
+    """
+    goto, fail, out = [{}], [0], [[]]
+    patterns = []
+    for keyword, payload in entries:
+        node = 0
+        for ch in keyword.lower():
+            if ch not in goto[node]:
+                goto.append({})
+                fail.append(0)
+                out.append([])
+                goto[node][ch] = len(goto) - 1
+            node = goto[node][ch]
+        if not out[node]:
+            out[node].append(len(patterns))
+            patterns.append((len(keyword.lower()), []))
+        patterns[out[node][0]][1].append(payload)
+    
+    # BFS로 실패 링크 연결, 실패 노드의 출력을 물려받음
+    frontier = list(goto[0].values())
+    while frontier:
+        next_frontier = []
+        for node in frontier:
+            for ch, child in goto[node].items():
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(ch, 0)
+                out[child] = out[child] + out[fail[child]]
+                next_frontier.append(child)
+        frontier = next_frontier
+    
+    return {'goto': goto, 'fail': fail, 'out': out, 'patterns': patterns}
+
+def scan_keywords(automaton, text):
+    """
+    오토마톤으로 text 1회 스캔 (겹치는 것 포함 전부)
+    
+    Returns:
+        list: [(시작, 끝, pattern_id)], 끝 위치 순
+    """
+    goto, fail, out, patterns = automaton['goto'], automaton['fail'], automaton['out'], automaton['patterns']
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        lowered = text
+    
+    hits = []
+    node = 0
+    for pos, ch in enumerate(lowered):
+        while node and ch not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(ch, 0)
+        for pattern_id in out[node]:
+            hits.append((pos + 1 - patterns[pattern_id][0], pos + 1, pattern_id))
+    
+    return hits
+
+def build_stock_automaton(names, aliases):
+    """
+    종목명 + 흔한 오타 전체를 한 번에 찾는 오토마톤
+    
+    Args:
+        names: {종목명: 종목코드}
+        aliases: {오타/별칭: 종목명}
+    """
+    entries = [(name, (name, code, 1.0)) for name, code in names.items()]
+    entries += [(alias, (name, names[name], 0.95)) for alias, name in aliases.items() if name in names]
+    return build_keyword_automaton(entries)
+
+@st.cache_resource(max_entries=2)
+def _stock_automaton_for(version):
+    """종목 마스터 버전별 오토마톤"""
+    return build_stock_automaton(get_stock_names(), COMMON_MISTAKES)
+
+def get_stock_automaton():
+    """프로세스 전역 종목명 오토마톤 (종목 마스터가 갱신되면 다시 빌드)"""
+    return _stock_automaton_for(get_ticker_master()['version'])
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+def _ends_at_boundary(text, end):
+    """종목명 뒤가 끝/공백·문장부호이거나 조사만 붙어 있는지"""
+    tail = STOCK_TOKEN_PATTERN.match(text, end)
+    return tail is None or tail.group() in KOREAN_PARTICLES
+
+def strip_particle(word):
+    """단어 끝의 조사 제거 ('하이닉스가' → '하이닉스', 남는 글자가 2자 미만이면 그대로)"""
+    for particle in KOREAN_PARTICLES:
+        if word.endswith(particle) and len(word) - len(particle) >= 2:
+            return word[:-len(particle)]
+    return word
+
+def find_stock_mentions(text):
+    """
+    문자열 1회 선형 스캔으로 종목명/오타 언급 찾기 (가장 왼쪽·가장 긴 것 우선, 겹치면 제외)
     
-    similarities.sort(key=lambda x: x[2], reverse=True)
-    return similarities[:3]
+    Returns:
+        list: [(시작, 끝, 종목명, 종목코드, 신뢰도)], 시작 위치 순
+    """
+    automaton = get_stock_automaton()
+    hits = sorted(scan_keywords(automaton, text), key=lambda hit: (hit[0], -hit[1]))
+    
+    mentions = []
+    covered_until = 0
+    for start, end, pattern_id in hits:
+        if start < covered_until:
+            continue
+        if start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if not _ends_at_boundary(text, end):
+            continue
+        name, code, confidence = automaton['patterns'][pattern_id][1][0]
+        mentions.append((start, end, name, code, confidence))
+        covered_until = end
+    
+    return mentions
 
 def extract_and_correct_stocks(text):
-    """텍스트에서 종목명 추출 및 보정"""
-    words = text.split()
+    """
+    텍스트에서 종목명 추출 및 보정
+    
+    - 정확한 종목명/흔한 오타: 오토마톤 1회 스캔 (조사가 붙어 있어도 인식)
+    - 나머지 단어: 조사를 뗀 뒤 퍼지 매칭
+    - 보정은 찾은 위치(offset)만 교체 → 다른 단어 속 같은 글자는 건드리지 않음
+    """
     found_stocks = []
-    corrected_text = text
-    needs_confirmation = False
+    spans = []
+    
+    mentions = find_stock_mentions(text)
+    for start, end, stock_name, stock_code, similarity in mentions:
+        spans.append((start, end, stock_name))
+        found_stocks.append({
+            'original': text[start:end],
+            'corrected': stock_name,
+            'code': stock_code,
+            'confidence': similarity,
+            'alternatives': [],
+            'start': start,
+            'end': end
+        })
     
-    for word in words:
-        matches = find_similar_stock(word, threshold=0.7)
+    # 오토마톤이 이미 잡은 구간과 겹치는 단어는 건너뜀 (둘 다 위치 순이라 한 번에 훑음)
+    taken = [(start, end) for start, end, *_ in mentions]
+    next_taken = 0
+    word_matches = {}
+    for token in STOCK_TOKEN_PATTERN.finditer(text):
+        while next_taken < len(taken) and taken[next_taken][1] <= token.start():
+            next_taken += 1
+        if next_taken < len(taken) and taken[next_taken][0] < token.end():
+            continue
+        if token.group().isdigit():
+            continue
+        
+        word = strip_particle(token.group())
+        if len(word) < 2:
+            continue  # 1글자는 2글자 이상 종목명과 유사도 0.7을 넘을 수 없음
+        if word not in word_matches:
+            word_matches[word] = find_similar_stock(word, threshold=0.7)
+        matches = word_matches[word]
         
         if matches:
-            best_match = matches[0]
-            stock_name, stock_code, similarity = best_match
-            
-            if similarity < 1.0:
-                needs_confirmation = True
-            
-            corrected_text = corrected_text.replace(word, stock_name)
-            
+            stock_name, stock_code, similarity = matches[0]
+            start, end = token.start(), token.start() + len(word)
+            spans.append((start, end, stock_name))
             found_stocks.append({
                 'original': word,
                 'corrected': stock_name,
                 'code': stock_code,
                 'confidence': similarity,
-                'alternatives': matches[1:] if len(matches) > 1 else []
+                'alternatives': matches[1:],
+                'start': start,
+                'end': end
             })
     
+    found_stocks.sort(key=lambda stock: stock['start'])
+    needs_confirmation = any(stock['confidence'] < 1.0 for stock in found_stocks)
+    
+    pieces = []
+    cursor = 0
+    for start, end, stock_name in sorted(spans):
+        pieces.append(text[cursor:start])
+        pieces.append(stock_name)
+        cursor = end
+    pieces.append(text[cursor:])
+    
     return {
         'original': text,
-        'corrected': corrected_text,
+        'corrected': ''.join(pieces),
         'found_stocks': found_stocks,
         'needs_confirmation': needs_confirmation
     }
@@ -270,267 +592,2160 @@ except:
 
 import random
 
+# ============================================================================
+# 🗓️ KRX 거래일 달력 + 로컬 시세 저장소
+# ============================================================================
+
+KST = timezone(timedelta(hours=9))
+KRX_SESSION_OPEN = (9, 0)        # 정규장 시작 (KST)
+KRX_SESSION_CLOSE = (15, 30)     # 정규장 마감 (KST)
+KRX_FINAL_AFTER = (16, 0)        # 이 시각 이후 받은 당일 종가는 확정으로 간주
+PRICE_STORE_PATH = "price_store.db"
+PRICE_LIVE_TTL = 300             # 장중 스냅샷 재사용 시간 (초)
+PRICE_SNAPSHOT_RETRY_AFTER = 60  # 스냅샷 갱신 실패 후 pykrx를 다시 부르기까지 대기 (초)
+
+# KRX 휴장일 (주말 제외, 연 1회 갱신 필요)
+KRX_HOLIDAYS = {
+    # 2025
+    "2025-01-01", "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30",
+    "2025-03-03", "2025-05-01", "2025-05-05", "2025-05-06", "2025-06-03",
+    "2025-06-06", "2025-08-15", "2025-10-03", "2025-10-06", "2025-10-07",
+    "2025-10-08", "2025-10-09", "2025-12-25", "2025-12-31",
+    # 2026
+    "2026-01-01", "2026-02-16", "2026-02-17", "2026-02-18", "2026-03-02",
+    "2026-05-01", "2026-05-05", "2026-05-25", "2026-06-03", "2026-08-17",
+    "2026-09-24", "2026-09-25", "2026-10-05", "2026-10-09", "2026-12-25",
+    "2026-12-31",
+}
+
+def now_kst():
+    """현재 한국 시각"""
+    return datetime.now(KST)
+
+def is_krx_trading_day(day):
+    """거래일 여부 (주말/휴장일 제외)"""
+    return day.weekday() < 5 and day.strftime("%Y-%m-%d") not in KRX_HOLIDAYS
+
+def previous_trading_day(day):
+    """day 이전의 가장 가까운 거래일 (date/datetime 모두 허용, 같은 타입 반환)"""
+    day -= timedelta(days=1)
+    while not is_krx_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+def latest_trading_day(now=None):
+    """
+    지금 기준 가장 최근 시세가 있는 거래일
+    
+    - 거래일 장 시작 이후 → 오늘
+    - 장 시작 전/휴장일 → 직전 거래일
+    """
+    now = now or now_kst()
+    if is_krx_trading_day(now) and (now.hour, now.minute) >= KRX_SESSION_OPEN:
+        return now.date()
+    return previous_trading_day(now).date()
+
+def is_krx_market_open(now=None):
+    """정규장 진행 중 여부"""
+    now = now or now_kst()
+    return is_krx_trading_day(now) and KRX_SESSION_OPEN <= (now.hour, now.minute) < KRX_SESSION_CLOSE
+
+def is_price_final(trade_date, fetched_at):
+    """trade_date 시세를 fetched_at(KST)에 받았다면 더 바뀌지 않는 확정 시세인지"""
+    fetched_day = fetched_at.date()
+    if fetched_day > trade_date:
+        return True
+    return fetched_day == trade_date and (fetched_at.hour, fetched_at.minute) >= KRX_FINAL_AFTER
+
+def _create_price_store(conn):
+    """시세 저장소 테이블 (거래일 × 종목 스냅샷, 거래일별 메타, 종목별 종가 이력, 종목 마스터)"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS daily_prices (
+        trade_date TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        close INTEGER NOT NULL,
+        change_rate REAL,
+        PRIMARY KEY (trade_date, ticker)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS price_snapshots (
+        trade_date TEXT PRIMARY KEY,
+        fetched_at TEXT NOT NULL,
+        is_final INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS daily_closes (
+        ticker TEXT NOT NULL,
+        trade_date TEXT NOT NULL,
+        close REAL NOT NULL,
+        PRIMARY KEY (ticker, trade_date)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS history_sync (
+        ticker TEXT PRIMARY KEY,
+        synced_through TEXT NOT NULL
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ticker_master (
+        ticker TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        market TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ticker_master_meta (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        listed_date TEXT NOT NULL,
+        refreshed_at TEXT NOT NULL
+    );
+    """)
+
+@st.cache_resource
+def get_price_store_lock():
+    """같은 거래일 스냅샷을 여러 세션이 동시에 받지 않도록 하는 잠금"""
+    with get_connection(PRICE_STORE_PATH) as conn:
+        _create_price_store(conn)
+    return threading.Lock()
+
+@st.cache_resource
+def get_price_snapshot_failures():
+    """스냅샷 갱신 실패 기록 {거래일: 실패 시각} (get_price_store_lock 안에서만 접근)"""
+    return {}
+
+def _snapshot_is_fresh(conn, trade_date, now):
+    """저장된 스냅샷을 그대로 써도 되는지 (확정 시세이거나 장중 TTL 이내)"""
+    row = conn.execute(
+        "SELECT fetched_at, is_final FROM price_snapshots WHERE trade_date = ?",
+        (trade_date.isoformat(),)
+    ).fetchone()
+    if row is None:
+        return False
+    if row[1]:
+        return True
+    fetched_at = datetime.fromisoformat(row[0])
+    return (now - fetched_at).total_seconds() < PRICE_LIVE_TTL and not is_price_final(trade_date, now)
+
+def refresh_price_snapshot(now=None):
+    """
+    최근 거래일 전 종목 시세를 저장소에 채움 (이미 신선하면 네트워크 호출 없음)
+    
+    실패하면 PRICE_SNAPSHOT_RETRY_AFTER 동안은 다시 부르지 않고 바로 None
+    → 잠금을 기다리던 조회가 같은 실패를 되풀이하지 않음
+    
+    Returns:
+        str or None: 저장소에 있는 거래일 (YYYY-MM-DD), 실패 시 None
+    """
+    now = now or now_kst()
+    trade_date = latest_trading_day(now)
+    lock = get_price_store_lock()
+    
+    with lock:
+        with get_connection(PRICE_STORE_PATH) as conn:
+            if _snapshot_is_fresh(conn, trade_date, now):
+                return trade_date.isoformat()
+        
+        if not PYKRX_AVAILABLE:
+            return None
+        
+        failures = get_price_snapshot_failures()
+        requested = trade_date
+        failed_at = failures.get(requested)
+        if failed_at is not None and (now - failed_at).total_seconds() < PRICE_SNAPSHOT_RETRY_AFTER:
+            return None
+        
+        # 달력에 없는 임시 휴장일이면 빈 결과 → 직전 거래일로 재시도
+        df = None
+        try:
+            for _ in range(5):
+                day_df = pykrx_stock.get_market_ohlcv(trade_date.strftime("%Y%m%d"), market="ALL")
+                if not day_df.empty and day_df['종가'].sum() > 0:
+                    df = day_df
+                    break
+                trade_date = previous_trading_day(trade_date)
+        except Exception:
+            logger.exception("시장 스냅샷 조회 실패")
+        
+        if df is None:
+            failures[requested] = now
+            return None
+        failures.pop(requested, None)
+        
+        with get_connection(PRICE_STORE_PATH) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily_prices (trade_date, ticker, close, change_rate) VALUES (?, ?, ?, ?)",
+                [(trade_date.isoformat(), ticker, int(row['종가']), round(float(row['등락률']), 2))
+                 for ticker, row in df.iterrows()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO price_snapshots (trade_date, fetched_at, is_final) VALUES (?, ?, ?)",
+                (trade_date.isoformat(), now.isoformat(), int(is_price_final(trade_date, now)))
+            )
+        
+        return trade_date.isoformat()
+
+def load_price_bars(tickers):
+    """
+    저장소에서 종목별 최근 거래일 시세 조회 (필요 시 스냅샷 갱신)
+    
+    Returns:
+        dict: {종목코드: {'종가', '등락률', '조회일'}}
+    """
+    trade_date = refresh_price_snapshot()
+    if trade_date is None or not tickers:
+        return {}
+    
+    placeholders = ",".join("?" * len(tickers))
+    with get_connection(PRICE_STORE_PATH) as conn:
+        rows = conn.execute(f"""
+        SELECT ticker, close, change_rate FROM daily_prices
+        WHERE trade_date = ? AND ticker IN ({placeholders})
+        """, (trade_date, *tickers)).fetchall()
+    
+    return {
+        ticker: {'종가': close, '등락률': change_rate, '조회일': trade_date}
+        for ticker, close, change_rate in rows
+    }
+
+# ============================================================================
+# 🏷️ 종목 마스터 (KOSPI/KOSDAQ 전 종목)
+# ============================================================================
+
+TICKER_MARKETS = ("KOSPI", "KOSDAQ")
+TICKER_MASTER_CHECK_INTERVAL = 3600   # 백그라운드 갱신 필요 여부 확인 주기 (초)
+
+def _load_ticker_master_rows():
+    """저장소에 저장된 종목 마스터 → ([(종목코드, 종목명)], 기준 거래일)"""
+    get_price_store_lock()  # 저장소 테이블 보장
+    with get_connection(PRICE_STORE_PATH) as conn:
+        rows = conn.execute("SELECT ticker, name FROM ticker_master").fetchall()
+        meta = conn.execute("SELECT listed_date FROM ticker_master_meta WHERE id = 1").fetchone()
+    return rows, (meta[0] if meta else None)
+
+def _publish_ticker_master(master, rows, listed_date):
+    """새 종목코드/종목명 맵으로 통째로 교체 (읽는 쪽은 잠금 없이 참조)"""
+    by_code = {code: name for name, code in STOCK_NAMES_DB.items()}
+    by_code.update(rows)
+    by_name = {name: code for code, name in by_code.items()}
+    
+    with master['lock']:
+        master['by_code'] = by_code
+        master['by_name'] = by_name
+        master['listed_date'] = listed_date
+        master['version'] += 1
+
+def refresh_ticker_master(master, now=None):
+    """
+    최근 거래일 기준 전 종목 목록을 pykrx에서 받아 저장소/메모리 갱신
+    
+    Returns:
+        bool: 갱신 여부 (이미 최신이거나 pykrx가 없으면 False)
+    """
+    trade_date = latest_trading_day(now).isoformat()
+    if not PYKRX_AVAILABLE or master['listed_date'] == trade_date:
+        return False
+    
+    day = trade_date.replace("-", "")
+    rows = [
+        (ticker, pykrx_stock.get_market_ticker_name(ticker), market)
+        for market in TICKER_MARKETS
+        for ticker in pykrx_stock.get_market_ticker_list(day, market=market)
+    ]
+    if not rows:
+        return False
+    
+    with get_connection(PRICE_STORE_PATH) as conn:
+        conn.execute("DELETE FROM ticker_master")
+        conn.executemany("INSERT OR REPLACE INTO ticker_master (ticker, name, market) VALUES (?, ?, ?)", rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO ticker_master_meta (id, listed_date, refreshed_at) VALUES (1, ?, ?)",
+            (trade_date, now_kst().isoformat())
+        )
+    
+    _publish_ticker_master(master, [(ticker, name) for ticker, name, _ in rows], trade_date)
+    return True
+
+def _ticker_master_worker(master):
+    """거래일이 바뀌면 종목 마스터 갱신 (데몬 스레드)"""
+    while True:
+        try:
+            refresh_ticker_master(master)
+        except Exception:
+            logger.exception("종목 마스터 갱신 실패 - 다음 주기에 재시도")
+        time.sleep(TICKER_MASTER_CHECK_INTERVAL)
+
+@st.cache_resource
+def get_ticker_master():
+    """
+    프로세스 전역 종목 마스터 (종목코드 ↔ 종목명)
+    
+    - 저장소에 저장된 전 종목 목록을 바로 로드 (비어 있으면 내장 STOCK_NAMES_DB)
+    - 갱신은 백그라운드 스레드가 담당 → 요청 경로에서는 네트워크 호출 없음
+    """
+    master = {'lock': threading.Lock(), 'version': 0, 'listed_date': None, 'by_code': {}, 'by_name': {}}
+    _publish_ticker_master(master, *_load_ticker_master_rows())
+    
+    threading.Thread(
+        target=_ticker_master_worker, args=(master,), name="gini-ticker-master", daemon=True
+    ).start()
+    
+    return master
+
+def get_stock_names():
+    """종목명 → 종목코드 (종목 마스터)"""
+    return get_ticker_master()['by_name']
+
+def get_ticker_name(ticker):
+    """종목코드 → 종목명 (종목 마스터, 모르는 종목이면 빈 문자열)"""
+    return get_ticker_master()['by_code'].get(ticker, '')
+
+@st.cache_data(ttl=300)  # 5분 캐싱
+def _fetch_stock_price_pykrx(ticker):
+    """pykrx 종목별 최근 7일 시세 (저장소 스냅샷에 없는 종목용, 실패 시 None) - 5분 캐싱"""
+    try:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=7)
+        end_str = end_date.strftime("%Y%m%d")
+        start_str = start_date.strftime("%Y%m%d")
+        
+        df = pykrx_stock.get_market_ohlcv_by_date(start_str, end_str, ticker)
+        
+        if not df.empty:
+            latest = df.iloc[-1]
+            stock_name = get_ticker_name(ticker)
+            
+            return {
+                '종목코드': ticker,
+                '종목명': stock_name,
+                '현재가': int(latest['종가']),
+                '등락률': round(latest['등락률'], 2),
+                '조회일': df.index[-1].strftime("%Y-%m-%d")
+            }
+    except Exception:
+        logger.exception("pykrx 종목 시세 조회 실패")
+    return None
+
 @st.cache_data(ttl=300)  # 5분 캐싱
 def get_stock_price_realtime(ticker):
-    """실시간 주가 조회 (pykrx 또는 Mock) - 5분 캐싱"""
+    """실시간 주가 조회 (로컬 시세 저장소 → pykrx → Mock) - 5분 캐싱"""
     if PYKRX_AVAILABLE:
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=7)
-            end_str = end_date.strftime("%Y%m%d")
-            start_str = start_date.strftime("%Y%m%d")
-            
-            df = pykrx_stock.get_market_ohlcv_by_date(start_str, end_str, ticker)
-            
-            if not df.empty:
-                latest = df.iloc[-1]
-                stock_name = pykrx_stock.get_market_ticker_name(ticker)
-                
+            bar = load_price_bars([ticker]).get(ticker)
+            if bar:
                 return {
                     '종목코드': ticker,
-                    '종목명': stock_name,
-                    '현재가': int(latest['종가']),
-                    '등락률': round(latest['등락률'], 2),
-                    '조회일': df.index[-1].strftime("%Y-%m-%d")
+                    '종목명': get_ticker_name(ticker),
+                    '현재가': bar['종가'],
+                    '등락률': bar['등락률'],
+                    '조회일': bar['조회일']
                 }
-        except:
-            pass
+        except Exception:
+            logger.exception("시세 저장소 조회 실패 - pykrx 직접 조회로 대체")
+        
+        quote = _fetch_stock_price_pykrx(ticker)
+        if quote:
+            return quote
     
     # Mock 데이터
     return get_mock_stock_data(ticker)
 
+def _last_stored_close(ticker):
+    """저장소에 남아 있는 가장 최근 (종가, 거래일) (없으면 None)"""
+    get_price_store_lock()  # 저장소 테이블 보장
+    with get_connection(PRICE_STORE_PATH) as conn:
+        return conn.execute(
+            "SELECT close, trade_date FROM daily_closes WHERE ticker = ? ORDER BY trade_date DESC LIMIT 1", (ticker,)
+        ).fetchone()
+
 def get_mock_stock_data(ticker):
-    """Mock 주식 데이터"""
-    mock_stocks = {
-        '005930': {'name': '삼성전자', 'base_price': 70000},
-        '000660': {'name': 'SK하이닉스', 'base_price': 130000},
-        '035420': {'name': 'NAVER', 'base_price': 200000},
-        '035720': {'name': '카카오', 'base_price': 50000},
-        '207940': {'name': '삼성바이오로직스', 'base_price': 800000},
-        '051910': {'name': 'LG화학', 'base_price': 400000},
-        '042700': {'name': '한미반도체', 'base_price': 70000},
+    """
+    시세 조회 실패 시 대체 데이터 - 저장소의 마지막 종가 그대로 (등락률 0)
+    
+    저장된 종가가 없으면 None → 매입가로 평가되고 '실시간 데이터 없음'으로 표시 (가짜 시세를 만들지 않음)
+    """
+    name = get_ticker_name(ticker)
+    if not name:
+        return None
+    
+    stored = _last_stored_close(ticker)
+    if stored is None:
+        return None
+    
+    close, trade_date = stored
+    return {
+        '종목코드': ticker,
+        '종목명': name,
+        '현재가': int(close),
+        '등락률': 0.0,
+        '조회일': trade_date
     }
+
+QUOTE_FETCH_WORKERS = 8           # 동시 시세 조회 스레드 수
+QUOTE_FETCH_TIMEOUT = 5.0         # 종목별 최대 대기 시간 (초), 초과 시 Mock/매입가로 대체
+
+@st.cache_resource
+def get_quote_executor():
+    """시세 조회용 프로세스 전역 스레드 풀"""
+    return ThreadPoolExecutor(max_workers=QUOTE_FETCH_WORKERS, thread_name_prefix="gini-quote")
+
+def _quotes_from_snapshot(tickers):
+    """시장 스냅샷(로컬 시세 저장소)에서 종목별 시세 구성 (없는 종목은 제외)"""
+    snapshot = load_price_bars(tickers)
+    quotes = {}
     
-    if ticker in mock_stocks:
-        info = mock_stocks[ticker]
-        base = info['base_price']
-        variation = random.uniform(-0.05, 0.05)
-        current = int(base * (1 + variation))
-        
-        return {
+    for ticker in tickers:
+        bar = snapshot.get(ticker)
+        if bar is None:
+            continue
+        quotes[ticker] = {
             '종목코드': ticker,
-            '종목명': info['name'],
-            '현재가': current,
-            '등락률': round(variation * 100, 2),
-            '조회일': datetime.now().strftime("%Y-%m-%d")
+            '종목명': get_ticker_name(ticker),
+            '현재가': bar['종가'],
+            '등락률': bar['등락률'],
+            '조회일': bar['조회일']
         }
     
-    return None
+    return quotes
 
-def update_portfolio_realtime(portfolio):
-    """포트폴리오 실시간 업데이트"""
-    updated = []
-    total_buy = 0
-    total_value = 0
+def get_stock_prices_batch(tickers):
+    """
+    여러 종목 시세 동시 조회
     
-    for item in portfolio:
-        data = get_stock_price_realtime(item['종목코드'])
-        
-        if data:
-            current_price = data['현재가']
-            buy_amount = item['매입가'] * item['수량']
-            current_amount = current_price * item['수량']
-            profit_loss = current_amount - buy_amount
-            profit_rate = ((current_price - item['매입가']) / item['매입가']) * 100
-            
-            updated.append({
-                '종목코드': item['종목코드'],
-                '종목명': data['종목명'],
-                '매입가': item['매입가'],
-                '현재가': current_price,
-                '수량': item['수량'],
-                '매입금액': buy_amount,
-                '평가금액': current_amount,
-                '손익금액': profit_loss,
-                '수익률': round(profit_rate, 2),
-                '등락률': data['등락률']
-            })
-            
-            total_buy += buy_amount
-            total_value += current_amount
+    - 시장 전체 스냅샷(로컬 시세 저장소)을 조회 전에 1회만 갱신해 전 종목에 사용
+    - 스냅샷에 없는 종목만 스레드 풀에서 pykrx로 동시에 조회 → 전체 지연 ≈ 가장 느린 1건
+    - QUOTE_FETCH_TIMEOUT 안에 끝나지 않은 종목은 Mock(없으면 None)으로 대체
+    
+    Returns:
+        dict: {종목코드: 시세 dict 또는 None}
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not PYKRX_AVAILABLE:
+        return {ticker: get_mock_stock_data(ticker) for ticker in tickers}
+    
+    try:
+        quotes = _quotes_from_snapshot(tickers)
+    except Exception:
+        logger.exception("시세 스냅샷 조회 실패 - 종목별 조회로 대체")
+        quotes = {}
+    
+    pending = [ticker for ticker in tickers if ticker not in quotes]
+    if not pending:
+        return quotes
+    
+    executor = get_quote_executor()
+    futures = {executor.submit(_fetch_stock_price_pykrx, ticker): ticker for ticker in pending}
+    done, _ = wait(futures, timeout=QUOTE_FETCH_TIMEOUT)
+    
+    for future, ticker in futures.items():
+        quote = None
+        if future in done and future.exception() is None:
+            quote = future.result()
         else:
-            buy_amount = item['매입가'] * item['수량']
-            
-            updated.append({
-                '종목코드': item['종목코드'],
-                '종목명': item.get('종목명', '정보없음'),
-                '매입가': item['매입가'],
-                '현재가': item['매입가'],
-                '수량': item['수량'],
-                '매입금액': buy_amount,
-                '평가금액': buy_amount,
-                '손익금액': 0,
-                '수익률': 0.0,
-                '등락률': 0.0
-            })
-            
-            total_buy += buy_amount
-            total_value += buy_amount
+            future.cancel()
+        quotes[ticker] = quote or get_mock_stock_data(ticker)
+    
+    return quotes
+
+PORTFOLIO_CARD_LIMIT = 30   # 보유 종목이 이보다 많으면 카드 대신 표로 표시
+
+def value_portfolio(portfolio, quotes):
+    """
+    포트폴리오 평가 (NumPy 열 단위 벡터 연산)
+    
+    - 같은 종목을 여러 번 매수한 기록(lot)은 한 줄로 합산, 매입가는 수량 가중 평균
+    - 시세가 없는 종목은 매입가로 평가 (손익 0)
+    
+    Args:
+        portfolio: [{'종목코드', '종목명', '매입가', '수량'}, ...]
+        quotes: {종목코드: 시세 dict 또는 None}
+    
+    Returns:
+        tuple: (종목별 평가 DataFrame, 요약 dict)
+    """
+    count = len(portfolio)
+    lot_codes, tickers = pd.factorize(np.array([item['종목코드'] for item in portfolio], dtype=object))
+    lot_qty = np.fromiter((item['수량'] for item in portfolio), dtype=np.int64, count=count)
+    lot_buy = np.fromiter((item['매입가'] for item in portfolio), dtype=np.int64, count=count) * lot_qty
+    
+    # lot → 종목 합산
+    quantity = np.bincount(lot_codes, weights=lot_qty, minlength=len(tickers)).astype(np.int64)
+    buy_amount = np.bincount(lot_codes, weights=lot_buy, minlength=len(tickers)).astype(np.int64)
+    lot_count = np.bincount(lot_codes, minlength=len(tickers))
+    first_lot = np.full(len(tickers), count, dtype=np.int64)
+    np.minimum.at(first_lot, lot_codes, np.arange(count))
+    
+    # 시세 결합 (종목 수만큼만 조회)
+    ticker_quotes = [quotes.get(ticker) for ticker in tickers]
+    has_quote = np.array([data is not None for data in ticker_quotes], dtype=bool)
+    avg_price = np.rint(buy_amount / np.maximum(quantity, 1)).astype(np.int64)
+    current_price = np.array(
+        [data['현재가'] if data else 0 for data in ticker_quotes], dtype=np.int64
+    )
+    current_price = np.where(has_quote, current_price, avg_price)
+    change_rate = np.array([data['등락률'] if data else 0.0 for data in ticker_quotes], dtype=np.float64)
+    names = [
+        (data and data['종목명']) or portfolio[first].get('종목명', '정보없음')
+        for data, first in zip(ticker_quotes, first_lot)
+    ]
+    
+    value_amount = np.where(has_quote, current_price * quantity, buy_amount)
+    profit = value_amount - buy_amount
+    profit_rate = np.round(
+        np.divide(profit * 100.0, buy_amount, out=np.zeros(len(tickers)), where=buy_amount > 0), 2
+    )
     
-    total_profit = total_value - total_buy
+    holdings = pd.DataFrame({
+        '종목코드': tickers,
+        '종목명': names,
+        '매입가': avg_price,
+        '현재가': current_price,
+        '수량': quantity,
+        '매입금액': buy_amount,
+        '평가금액': value_amount,
+        '손익금액': profit,
+        '수익률': profit_rate,
+        '등락률': change_rate,
+        '매수횟수': lot_count
+    })
+    
+    total_buy = int(buy_amount.sum())
+    total_value = int(value_amount.sum())
     total_rate = ((total_value - total_buy) / total_buy * 100) if total_buy > 0 else 0
     
     summary = {
         '총매입액': total_buy,
         '총평가액': total_value,
-        '총손익': total_profit,
+        '총손익': total_value - total_buy,
         '수익률': round(total_rate, 2)
     }
     
-    return updated, summary
+    return holdings, summary
+
+def update_portfolio_realtime(portfolio):
+    """포트폴리오 실시간 업데이트 (종목별 평가 DataFrame, 요약 dict)"""
+    quotes = get_stock_prices_batch([item['종목코드'] for item in portfolio])
+    return value_portfolio(portfolio, quotes)
 
 # ============================================================================
-# 🗄️ SQLite 데이터베이스 함수
+# 📈 포트폴리오 성과 & 위험 분석
 # ============================================================================
 
-def get_connection():
-    """SQLite 연결"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    return conn
+HISTORY_LOOKBACK_DAYS = 180      # 처음 동기화할 때 가져올 기간 (일)
+HISTORY_FETCH_TIMEOUT = 10.0     # 이력 동기화 전체 대기 시간 (초)
+TRADING_DAYS_PER_YEAR = 252
+BENCHMARK_INDEX = "1001"         # KOSPI 지수 코드 (pykrx)
+BENCHMARK_KEY = "KOSPI"          # 저장소에서 벤치마크 이력을 구분하는 키
+VOLATILITY_SCORE_SCALE = 5.0     # 연환산 변동성 5%p당 1점 (50% 이상 → 10점)
+DEFAULT_VOLATILITY_SCORE = 5.0   # 보유 종목/이력이 없을 때
+
+def _fetch_close_history(key, start, end):
+    """pykrx 종가 이력 → [(YYYY-MM-DD, 종가), ...]"""
+    if key == BENCHMARK_KEY:
+        df = pykrx_stock.get_index_ohlcv_by_date(start.strftime("%Y%m%d"), end.strftime("%Y%m%d"), BENCHMARK_INDEX)
+    else:
+        df = pykrx_stock.get_market_ohlcv_by_date(start.strftime("%Y%m%d"), end.strftime("%Y%m%d"), key)
+    
+    if df.empty:
+        return []
+    return [(day.strftime("%Y-%m-%d"), float(close)) for day, close in df['종가'].items() if close > 0]
 
-def create_tables():
-    """테이블 생성"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
+def sync_price_history(tickers, now=None):
+    """
+    보유 종목 + 벤치마크 일별 종가를 저장소에 증분 동기화
     
-    # 기존 상담 기록 테이블
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS chats (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_input TEXT NOT NULL,
-        ai_response TEXT NOT NULL,
-        emotion_score REAL,
-        risk_level TEXT,
-        tags TEXT,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
+    - 종목별로 마지막 확정 거래일 다음 날부터만 조회 (처음이면 HISTORY_LOOKBACK_DAYS)
+    - 장중/마감 직후 당일 종가는 저장하되 확정 전이라 다음 동기화 때 다시 조회
     
-    # 포트폴리오 테이블
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS portfolio (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        ticker TEXT NOT NULL,
-        stock_name TEXT,
-        buy_price INTEGER NOT NULL,
-        quantity INTEGER NOT NULL,
-        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
+    Returns:
+        date: 동기화 기준 거래일
+    """
+    now = now or now_kst()
+    end = latest_trading_day(now)
+    settled = end if is_price_final(end, now) else previous_trading_day(end)
+    keys = [BENCHMARK_KEY, *dict.fromkeys(tickers)]
+    
+    get_price_store_lock()  # 저장소 테이블 보장
+    placeholders = ",".join("?" * len(keys))
+    with get_connection(PRICE_STORE_PATH) as conn:
+        synced = dict(conn.execute(
+            f"SELECT ticker, synced_through FROM history_sync WHERE ticker IN ({placeholders})", keys
+        ).fetchall())
+    
+    starts = {}
+    for key in keys:
+        if key in synced:
+            start = datetime.strptime(synced[key], "%Y-%m-%d").date() + timedelta(days=1)
+        else:
+            start = end - timedelta(days=HISTORY_LOOKBACK_DAYS)
+        if start <= end:
+            starts[key] = start
+    
+    if not starts or not PYKRX_AVAILABLE:
+        return end
+    
+    executor = get_quote_executor()
+    futures = {executor.submit(_fetch_close_history, key, start, end): key for key, start in starts.items()}
+    done, _ = wait(futures, timeout=HISTORY_FETCH_TIMEOUT)
+    
+    with get_connection(PRICE_STORE_PATH) as conn:
+        for future, key in futures.items():
+            if future not in done or future.exception() is not None:
+                future.cancel()
+                continue
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily_closes (ticker, trade_date, close) VALUES (?, ?, ?)",
+                [(key, day, close) for day, close in future.result()]
+            )
+            if starts[key] <= settled:
+                conn.execute(
+                    "INSERT OR REPLACE INTO history_sync (ticker, synced_through) VALUES (?, ?)",
+                    (key, settled.isoformat())
+                )
+    
+    state = get_history_sync_state()
+    with state['lock']:
+        state['version'] += 1
+    return end
+
+@st.cache_resource
+def get_history_sync_state():
+    """
+    이력 동기화 상태 (프로세스 전역)
     
-    # ===== v4.0 NEW: 맥락 기억 테이블 =====
+    - version: 동기화로 저장소 이력이 바뀔 때마다 증가 (저장소 기반 분석 캐시 키)
+    - running / started: 보유 종목 조합별 백그라운드 동기화 진행 여부 / 마지막 시작 시각
+    """
+    return {'lock': threading.Lock(), 'version': 0, 'running': set(), 'started': {}}
+
+def _history_sync_worker(state, tickers):
+    """보유 종목 이력 동기화 (백그라운드 스레드)"""
+    try:
+        sync_price_history(list(tickers))
+    except Exception:
+        logger.exception("시세 이력 동기화 실패")  # 다음 주기에 재시도
+    finally:
+        with state['lock']:
+            state['running'].discard(tickers)
+
+def schedule_history_sync(tickers):
+    """보유 종목 이력 동기화를 백그라운드로 시작 (같은 종목 조합은 PRICE_LIVE_TTL마다 최대 1회)"""
+    tickers = tuple(sorted(set(tickers)))
+    state = get_history_sync_state()
+    with state['lock']:
+        if tickers in state['running'] or time.time() - state['started'].get(tickers, 0.0) < PRICE_LIVE_TTL:
+            return
+        state['running'].add(tickers)
+        state['started'][tickers] = time.time()
+    
+    threading.Thread(
+        target=_history_sync_worker, args=(state, tickers), name="gini-history-sync", daemon=True
+    ).start()
+
+def load_close_history(keys, since):
+    """저장소 종가 이력 → 거래일 × 종목 DataFrame"""
+    placeholders = ",".join("?" * len(keys))
+    with get_connection(PRICE_STORE_PATH) as conn:
+        rows = conn.execute(f"""
+        SELECT trade_date, ticker, close FROM daily_closes
+        WHERE ticker IN ({placeholders}) AND trade_date >= ?
+        """, (*keys, since.isoformat())).fetchall()
+    
+    frame = pd.DataFrame(rows, columns=['trade_date', 'ticker', 'close'])
+    return frame.pivot(index='trade_date', columns='ticker', values='close').sort_index()
+
+def compute_portfolio_analytics(closes, quantities):
+    """
+    종가 이력으로 포트폴리오 성과/위험 지표 계산 (NumPy 벡터 연산)
     
-    # 1. 가장 위험했던 순간 기록
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS dangerous_moments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp DATETIME NOT NULL,
-        risk_score REAL NOT NULL,
-        emotion_tags TEXT NOT NULL,
-        user_input TEXT,
-        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
+    Args:
+        closes: 거래일 × 종목 종가 DataFrame (BENCHMARK_KEY 열 포함 가능)
+        quantities: {종목코드: 보유 수량}
     
-    # 2. 사용자 중독 패턴
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS addiction_patterns (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        hour_of_day INTEGER,
-        day_of_week INTEGER,
-        investment_purpose TEXT,
-        pattern_count INTEGER DEFAULT 1,
-        last_detected DATETIME DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
+    Returns:
+        dict or None: 'value'(일별 평가액 Series), 'volatility'(연환산 %),
+                      'max_drawdown'(%), 'beta'({종목코드: 베타}), 'volatility_score'(0~10)
+    """
+    held = [ticker for ticker in quantities if ticker in closes.columns]
+    if not held:
+        return None
     
-    # 3. 압박 멘트 효과 추적
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS pressure_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+    # 보유 종목 모두 시세가 있는 구간만 사용 (중간 결측은 직전 종가로 채움)
+    prices = closes[held].ffill().dropna()
+    if len(prices) < 3:
+        return None
+    
+    price_matrix = prices.to_numpy()
+    value = price_matrix @ np.array([quantities[ticker] for ticker in held], dtype=np.float64)
+    
+    returns = np.diff(value) / value[:-1]
+    volatility = float(returns.std(ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR) * 100)
+    drawdown = value / np.maximum.accumulate(value) - 1
+    
+    beta = {}
+    if BENCHMARK_KEY in closes.columns:
+        market = closes[BENCHMARK_KEY].reindex(prices.index).ffill().to_numpy()
+        stock_returns = np.diff(price_matrix, axis=0) / price_matrix[:-1]
+        market_returns = np.diff(market) / market[:-1]
+        valid = np.isfinite(market_returns)
+        if valid.sum() >= 2:
+            stock_dev = stock_returns[valid] - stock_returns[valid].mean(axis=0)
+            market_dev = market_returns[valid] - market_returns[valid].mean()
+            market_var = (market_dev ** 2).sum()
+            if market_var > 0:
+                beta = dict(zip(held, np.round(market_dev @ stock_dev / market_var, 2).tolist()))
+    
+    return {
+        'value': pd.Series(value, index=pd.to_datetime(prices.index), name='평가액'),
+        'volatility': round(volatility, 2),
+        'max_drawdown': round(float(drawdown.min() * 100), 2),
+        'beta': beta,
+        'volatility_score': round(float(np.clip(volatility / VOLATILITY_SCORE_SCALE, 0, 10)), 2)
+    }
+
+def portfolio_quantities(portfolio):
+    """포트폴리오 lot → 종목별 보유 수량 (캐시 키로 쓰도록 정렬된 튜플)"""
+    quantities = Counter()
+    for item in portfolio:
+        quantities[item['종목코드']] += item['수량']
+    return tuple(sorted(quantities.items()))
+
+@st.cache_data(ttl=PRICE_LIVE_TTL)
+def get_portfolio_analytics(holdings):
+    """
+    보유 종목 성과/위험 분석 (이력 증분 동기화 후 계산, 5분 캐싱)
+    
+    Args:
+        holdings: portfolio_quantities() 결과
+    """
+    if not holdings:
+        return None
+    
+    quantities = dict(holdings)
+    end = sync_price_history(list(quantities))
+    return _analytics_from_store(quantities, end)
+
+@st.cache_data(ttl=PRICE_LIVE_TTL)
+def _stored_portfolio_analytics(holdings, version):
+    """저장소에 이미 있는 이력만으로 분석 (네트워크 호출 없음, 이력 동기화 version별 캐싱)"""
+    return _analytics_from_store(dict(holdings), latest_trading_day())
+
+def _analytics_from_store(quantities, end):
+    """저장소 종가 이력 (end 기준 HISTORY_LOOKBACK_DAYS) → compute_portfolio_analytics"""
+    closes = load_close_history([BENCHMARK_KEY, *quantities], end - timedelta(days=HISTORY_LOOKBACK_DAYS))
+    return compute_portfolio_analytics(closes, quantities)
+
+def get_volatility_score(portfolio):
+    """
+    위험지표용 변동성 점수 (0~10, 포트폴리오 실현 변동성 기반)
+    
+    - 상담 경로에서 호출 → 저장된 이력만 읽고, 새 거래일 이력은 백그라운드로 동기화
+      (이력이 아직 없으면 DEFAULT_VOLATILITY_SCORE, 동기화가 끝난 뒤 상담부터 반영)
+    """
+    holdings = portfolio_quantities(portfolio)
+    if not holdings:
+        return DEFAULT_VOLATILITY_SCORE
+    
+    schedule_history_sync(ticker for ticker, _ in holdings)
+    try:
+        analytics = _stored_portfolio_analytics(holdings, get_history_sync_state()['version'])
+    except Exception:
+        logger.exception("저장된 이력으로 변동성 계산 실패")
+        analytics = None
+    return analytics['volatility_score'] if analytics else DEFAULT_VOLATILITY_SCORE
+
+def create_portfolio_value_chart(analytics):
+    """포트폴리오 평가액 추이 (최대 낙폭 구간 표시)"""
+    value = analytics['value']
+    trough_day = (value / value.cummax()).idxmin()
+    peak_day = value.loc[:trough_day].idxmax()
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=value.index, y=value.values, mode='lines', name='평가액'))
+    if trough_day > peak_day:
+        fig.add_vrect(x0=peak_day, x1=trough_day, fillcolor="red", opacity=0.1,
+                      line_width=0, annotation_text=f"최대 낙폭 {analytics['max_drawdown']:.1f}%")
+    
+    fig.update_layout(title='📈 포트폴리오 평가액 추이 (현재 보유 수량 기준)', height=350)
+    
+    return fig
+
+# ============================================================================
+# 🗄️ 데이터베이스 함수 (SQLite / PostgreSQL)
+# ============================================================================
+
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool as PgConnectionPool
+    PSYCOPG_AVAILABLE = True
+except ImportError:
+    PSYCOPG_AVAILABLE = False
+
+DB_PATH = "gini.db"
+DB_POOL_SIZE = 8            # 동시에 열어둘 최대 연결 수
+DB_BUSY_TIMEOUT = 5.0       # 잠금/풀 대기 시간 (초)
+DB_STATEMENT_CACHE = 128    # 연결별 prepared statement 캐시 크기
+DEFAULT_USER_ID = "default" # 단일 사용자 모드의 사용자 (user_id 도입 전 데이터의 소유자)
+USER_CACHE_ENTRIES = 1000   # 사용자별 조회 캐시 최대 항목 수 (함수별)
+
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # 읽기/쓰기 동시 진행
+    "PRAGMA synchronous=NORMAL",      # WAL에서는 NORMAL로도 안전
+    "PRAGMA cache_size=-16000",       # 약 16MB 페이지 캐시
+    "PRAGMA mmap_size=134217728",     # 128MB 메모리 맵 I/O
+    "PRAGMA temp_store=MEMORY",
+)
+
+def _open_connection(path=DB_PATH):
+    """PRAGMA 튜닝이 적용된 새 SQLite 연결"""
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE
+    )
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@st.cache_resource
+def get_db_pool(path=DB_PATH):
+    """프로세스 전역 연결 풀 (DB 파일별 1개, Streamlit 재실행/세션 간 공유)"""
+    return {
+        'idle': queue.LifoQueue(),
+        'slots': threading.BoundedSemaphore(DB_POOL_SIZE),
+        'local': threading.local()
+    }
+
+@contextmanager
+def get_connection(path=DB_PATH):
+    """
+    풀에서 DB 연결 대여
+    
+    - 스레드당 연결 1개를 재사용 (같은 스레드의 중첩 호출은 바깥 트랜잭션에 합류)
+    - 정상 종료 시 커밋, 예외 시 롤백 후 풀에 반납
+    - DB_BACKEND가 postgres면 gini.db 대신 PostgreSQL 풀 사용 (시세 저장소는 항상 로컬 SQLite)
+    """
+    if path == DB_PATH and DB_BACKEND == "postgres":
+        with _pg_connection() as conn:
+            yield conn
+        return
+    
+    pool = get_db_pool(path)
+    local = pool['local']
+    
+    conn = getattr(local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    
+    if not pool['slots'].acquire(timeout=DB_BUSY_TIMEOUT):
+        raise sqlite3.OperationalError("DB 연결 풀 대기 시간 초과")
+    
+    try:
+        try:
+            conn = pool['idle'].get_nowait()
+        except queue.Empty:
+            conn = _open_connection(path)
+        
+        local.conn = conn
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            local.conn = None
+            pool['idle'].put(conn)
+    finally:
+        pool['slots'].release()
+
+# ----------------------------------------------------------------------------
+# PostgreSQL 어댑터 - 저장소 함수들이 쓰는 sqlite3 연결 인터페이스만 그대로 제공
+# ----------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=512)
+def _pg_sql(sql):
+    """SQLite 자리표시자 SQL → psycopg 형식 ('?' → '%s', 리터럴 '%' → '%%')"""
+    return sql.replace('%', '%%').replace('?', '%s')
+
+class PgCursor:
+    """psycopg 커서를 sqlite3 커서처럼 (execute가 자신을 반환, '?' 자리표시자)"""
+    
+    def __init__(self, raw):
+        self.raw = raw
+    
+    def execute(self, sql, params=()):
+        self.raw.execute(_pg_sql(sql), tuple(params))
+        return self
+    
+    def executemany(self, sql, seq_of_params):
+        self.raw.executemany(_pg_sql(sql), [tuple(params) for params in seq_of_params])
+        return self
+    
+    def fetchone(self):
+        return self.raw.fetchone()
+    
+    def fetchall(self):
+        return self.raw.fetchall()
+
+class PgConnection:
+    """psycopg 연결을 sqlite3 연결처럼 (conn.execute / executemany / cursor)"""
+    
+    def __init__(self, raw):
+        self.raw = raw
+    
+    def cursor(self):
+        return PgCursor(self.raw.cursor())
+    
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+    
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+@st.cache_resource
+def get_pg_pool():
+    """프로세스 전역 PostgreSQL 연결 풀 (replica마다 최대 DB_POOL_SIZE개)"""
+    if not PSYCOPG_AVAILABLE:
+        raise RuntimeError("DB_BACKEND=postgres에는 psycopg, psycopg_pool 패키지가 필요합니다. (pip install -r requirements-postgres.txt)")
+    if not DATABASE_URL:
+        raise RuntimeError("DB_BACKEND=postgres에는 DATABASE_URL 설정이 필요합니다.")
+    
+    return {
+        'pool': PgConnectionPool(
+            DATABASE_URL,
+            min_size=1,
+            max_size=DB_POOL_SIZE,
+            timeout=DB_BUSY_TIMEOUT,
+            name="gini-db",
+            open=True
+        ),
+        'local': threading.local()
+    }
+
+@contextmanager
+def _pg_connection():
+    """PostgreSQL 연결 대여 (get_connection과 같은 규칙: 스레드당 1개, 종료 시 커밋/롤백)"""
+    state = get_pg_pool()
+    local = state['local']
+    
+    conn = getattr(local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    
+    # pool.connection()이 정상 종료 시 커밋, 예외 시 롤백 후 반납
+    with state['pool'].connection() as raw:
+        local.conn = conn = PgConnection(raw)
+        try:
+            yield conn
+        finally:
+            local.conn = None
+
+def sql_weekday(column):
+    """요일 숫자(0=일요일) SQL 식 - 백엔드별"""
+    if DB_BACKEND == "postgres":
+        return f"CAST(EXTRACT(DOW FROM CAST({column} AS TIMESTAMP)) AS INTEGER)"
+    return f"CAST(strftime('%w', {column}) AS INTEGER)"
+
+def sql_hour(column):
+    """시(0~23) SQL 식 - 백엔드별"""
+    if DB_BACKEND == "postgres":
+        return f"CAST(EXTRACT(HOUR FROM CAST({column} AS TIMESTAMP)) AS INTEGER)"
+    return f"CAST(strftime('%H', {column}) AS INTEGER)"
+
+def sql_contains(column):
+    """부분 문자열 포함 조건 (대소문자 무시, 파라미터는 like_pattern으로 만든 값) - 백엔드별"""
+    if DB_BACKEND == "postgres":
+        return f"{column} ILIKE ? ESCAPE '\\'"
+    return f"{column} LIKE ? ESCAPE '\\'"
+
+def like_pattern(term):
+    """LIKE 특수문자(%, _)를 이스케이프한 '%term%' 패턴"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def utc_timestamp(offset=None):
+    """timestamp 컬럼과 같은 형식의 UTC 시각 문자열 (SQLite CURRENT_TIMESTAMP 형식)"""
+    now = datetime.now(timezone.utc)
+    if offset is not None:
+        now += offset
+    return now.strftime('%Y-%m-%d %H:%M:%S')
+
+def kst_day_start_utc(day):
+    """KST 날짜('YYYY-MM-DD') 0시 → timestamp 컬럼과 같은 형식의 UTC 시각 문자열"""
+    start = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=KST)
+    return start.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+# ============================================================================
+# ✍️ 비동기 쓰기 큐 (write-behind)
+# ============================================================================
+
+WRITE_QUEUE_SIZE = 1000         # 대기 가능한 최대 쓰기 건수 (초과 시 동기 쓰기)
+WRITE_BATCH_SIZE = 100          # 한 트랜잭션에 묶는 최대 건수
+WRITE_FLUSH_INTERVAL = 0.05     # 묶음을 모으는 최대 대기 시간 (초)
+
+def _commit_write_batch(batch):
+    """쓰기 묶음을 한 트랜잭션으로 커밋 (실패 시 건별 재시도)"""
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            for write_fn, args in batch:
+                write_fn(cur, *args)
+        return None
+    except Exception as e:
+        # 문제 있는 건만 버리고 나머지는 살림
+        for write_fn, args in batch:
+            try:
+                with get_connection() as conn:
+                    write_fn(conn.cursor(), *args)
+            except Exception as item_error:
+                e = item_error
+        return e
+
+def _write_behind_worker(state):
+    """백그라운드 쓰기 스레드 - 큐에서 모아 묶음 커밋, 배리어(Event)는 커밋 후 해제"""
+    write_queue = state['queue']
+    
+    while True:
+        batch = [write_queue.get()]
+        deadline = time.monotonic() + WRITE_FLUSH_INTERVAL
+        
+        # 배리어가 들어오면 즉시 커밋, 아니면 간격/크기 한도까지 모음
+        while len(batch) < WRITE_BATCH_SIZE and not isinstance(batch[-1], threading.Event):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(write_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        writes = [item for item in batch if not isinstance(item, threading.Event)]
+        if writes:
+            error = _commit_write_batch(writes)
+            state['written'] += len(writes)
+            if error is not None:
+                state['last_error'] = repr(error)
+            _invalidate_chat_caches({args[0] for _, args in writes})
+            with state['lock']:
+                state['pending'] -= Counter(args[0] for _, args in writes)   # 0이 된 사용자는 제거
+        
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+            write_queue.task_done()
+
+@st.cache_resource
+def get_write_queue():
+    """프로세스 전역 쓰기 큐 + 백그라운드 스레드 (종료 시 남은 쓰기 flush)"""
+    state = {
+        'queue': queue.Queue(maxsize=WRITE_QUEUE_SIZE),
+        'lock': threading.Lock(),
+        'pending': Counter(),   # 사용자별 아직 커밋되지 않은 쓰기 수
+        'written': 0,
+        'last_error': None
+    }
+    threading.Thread(
+        target=_write_behind_worker, args=(state,), name="gini-db-writer", daemon=True
+    ).start()
+    
+    def flush_on_exit():
+        barrier = threading.Event()
+        state['queue'].put(barrier)
+        barrier.wait(DB_BUSY_TIMEOUT)
+    
+    atexit.register(flush_on_exit)
+    return state
+
+def enqueue_write(write_fn, user_id, *args):
+    """
+    쓰기 작업을 큐에 넣고 즉시 반환
+    
+    Args:
+        write_fn: (cur, user_id, *args)를 받아 SQL을 실행하는 함수
+        user_id: 데이터 소유자 (커밋 후 이 사용자의 조회 캐시만 무효화)
+    """
+    args = (user_id,) + args
+    state = get_write_queue()
+    with state['lock']:
+        state['pending'][user_id] += 1
+    try:
+        state['queue'].put((write_fn, args), timeout=DB_BUSY_TIMEOUT)
+    except queue.Full:
+        with state['lock']:
+            state['pending'][user_id] -= 1
+        # 큐가 밀려 있으면 호출자가 직접 기록 (백프레셔)
+        with get_connection() as conn:
+            write_fn(conn.cursor(), *args)
+        _invalidate_chat_caches({user_id})
+
+def flush_writes(user_id=None, timeout=DB_BUSY_TIMEOUT):
+    """
+    배리어: 지금까지 넣은 쓰기가 커밋될 때까지 대기 (read-after-write가 필요한 곳에서 호출)
+    
+    Args:
+        user_id: 주면 그 사용자의 쓰기가 큐에 없을 때 배리어 없이 바로 반환 (화면 조회마다 큐를 거치지 않음)
+    
+    Returns:
+        bool: 시간 안에 모두 커밋되었는지
+    """
+    state = get_write_queue()
+    if user_id is not None:
+        with state['lock']:
+            if state['pending'][user_id] <= 0:
+                return True
+    
+    barrier = threading.Event()
+    state['queue'].put(barrier)
+    return barrier.wait(timeout)
+
+def _migration_base_tables(cur):
+    """v1: 기본 테이블"""
+    # 기존 상담 기록 테이블
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_input TEXT NOT NULL,
+        ai_response TEXT NOT NULL,
+        emotion_score REAL,
+        risk_level TEXT,
+        tags TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    
+    # 포트폴리오 테이블
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS portfolio (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticker TEXT NOT NULL,
+        stock_name TEXT,
+        buy_price INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    
+    # ===== v4.0 NEW: 맥락 기억 테이블 =====
+    
+    # 1. 가장 위험했던 순간 기록
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS dangerous_moments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME NOT NULL,
+        risk_score REAL NOT NULL,
+        emotion_tags TEXT NOT NULL,
+        user_input TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    
+    # 2. 사용자 중독 패턴
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS addiction_patterns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hour_of_day INTEGER,
+        day_of_week INTEGER,
+        investment_purpose TEXT,
+        pattern_count INTEGER DEFAULT 1,
+        last_detected DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    
+    # 3. 압박 멘트 효과 추적
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS pressure_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
         message_type TEXT NOT NULL,
         emotion_tag TEXT NOT NULL,
         user_stopped BOOLEAN,
         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
     );
     """)
+
+def _migration_chat_tags(cur):
+    """v2: 감정 태그 정규화 테이블 (상담 1건 × 태그 1개) + 기존 chats.tags 이관"""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_tags (
+        chat_id INTEGER NOT NULL REFERENCES chats(id) ON DELETE CASCADE,
+        tag TEXT NOT NULL,
+        timestamp DATETIME NOT NULL,
+        PRIMARY KEY (chat_id, tag)
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_tags_tag ON chat_tags (tag)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_tags_timestamp ON chat_tags (timestamp, tag)")
+    
+    # 태그 분리 규칙은 v2 시점 그대로 고정 (이후 split_tags가 바뀌어도 이 마이그레이션 결과는 같음)
+    cur.execute("SELECT id, tags, timestamp FROM chats WHERE tags IS NOT NULL AND tags != '중립'")
+    rows = []
+    for chat_id, tags, timestamp in cur.fetchall():
+        for tag in tags.split(', '):
+            tag = tag.strip()
+            if tag and tag != '중립':
+                rows.append((chat_id, tag, timestamp))
+    cur.executemany("INSERT OR IGNORE INTO chat_tags (chat_id, tag, timestamp) VALUES (?, ?, ?)", rows)
+
+def _migration_chat_aggregates(cur):
+    """v3: 대시보드 집계 테이블 생성 + 기존 chats로 초기 집계 (이후 save_chat이 증분 갱신)"""
+    # 1. 전체 합계 (단일 행)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_chats INTEGER NOT NULL DEFAULT 0,
+        emotion_sum REAL NOT NULL DEFAULT 0,
+        emotion_count INTEGER NOT NULL DEFAULT 0,
+        high_risk_count INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    
+    # 2. 감정 태그별 빈도
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_tag_counts (
+        tag TEXT PRIMARY KEY,
+        tag_count INTEGER NOT NULL DEFAULT 0
+    );
+    """)
     
-    conn.commit()
-    conn.close()
+    # 3. 요일 × 시간대 감정 점수 합계/건수
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_emotion_grid (
+        day_of_week INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        emotion_sum REAL NOT NULL DEFAULT 0,
+        emotion_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day_of_week, hour)
+    );
+    """)
+    
+    # 초기 집계 (이 버전 스키마 기준 SQL - 앱의 rebuild_chat_aggregates는 이후 스키마를 따름)
+    cur.execute("""
+    INSERT OR REPLACE INTO chat_totals (id, total_chats, emotion_sum, emotion_count, high_risk_count)
+    SELECT 1,
+           COUNT(*),
+           COALESCE(SUM(emotion_score), 0),
+           COUNT(emotion_score),
+           COALESCE(SUM(CASE WHEN UPPER(risk_level) = 'HIGH' THEN 1 ELSE 0 END), 0)
+    FROM chats
+    """)
+    cur.execute("""
+    INSERT OR REPLACE INTO chat_emotion_grid (day_of_week, hour, emotion_sum, emotion_count)
+    SELECT CAST(strftime('%w', timestamp) AS INTEGER) as day_of_week,
+           CAST(strftime('%H', timestamp) AS INTEGER) as hour,
+           SUM(emotion_score),
+           COUNT(*)
+    FROM chats
+    WHERE emotion_score IS NOT NULL
+    GROUP BY day_of_week, hour
+    """)
+    cur.execute("""
+    INSERT OR REPLACE INTO chat_tag_counts (tag, tag_count)
+    SELECT tag, COUNT(*) FROM chat_tags GROUP BY tag
+    """)
+
+def _migration_query_indexes(cur):
+    """v4: 조회 패턴별 보조 인덱스 + addiction_patterns UPSERT용 UNIQUE 인덱스"""
+    # 시간 구간 필터 (패턴 감지, 주간 리포트, 최근 7일 통계)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_timestamp ON chats (timestamp)")
+    
+    # 맥락 기억: 위험 점수 상위 / 패턴 빈도 상위 / 압박 멘트 효과
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dangerous_moments_risk ON dangerous_moments (risk_score)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_addiction_patterns_count ON addiction_patterns (pattern_count)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pressure_messages_tag ON pressure_messages (emotion_tag, user_stopped)")
+    
+    # 포트폴리오 종목 삭제
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_portfolio_ticker ON portfolio (ticker)")
+    
+    # 중복 패턴 행을 가장 오래된 행으로 합친 뒤 UNIQUE 인덱스 생성
+    cur.execute("""
+    UPDATE addiction_patterns
+    SET pattern_count = (
+            SELECT SUM(p.pattern_count) FROM addiction_patterns p
+            WHERE p.hour_of_day IS addiction_patterns.hour_of_day
+              AND p.day_of_week IS addiction_patterns.day_of_week
+              AND p.investment_purpose IS addiction_patterns.investment_purpose
+        ),
+        last_detected = (
+            SELECT MAX(p.last_detected) FROM addiction_patterns p
+            WHERE p.hour_of_day IS addiction_patterns.hour_of_day
+              AND p.day_of_week IS addiction_patterns.day_of_week
+              AND p.investment_purpose IS addiction_patterns.investment_purpose
+        )
+    WHERE id IN (
+        SELECT MIN(id) FROM addiction_patterns
+        GROUP BY hour_of_day, day_of_week, investment_purpose
+        HAVING COUNT(*) > 1
+    )
+    """)
+    cur.execute("""
+    DELETE FROM addiction_patterns
+    WHERE id NOT IN (
+        SELECT MIN(id) FROM addiction_patterns
+        GROUP BY hour_of_day, day_of_week, investment_purpose
+    )
+    """)
+    cur.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_addiction_patterns_slot
+    ON addiction_patterns (hour_of_day, day_of_week, investment_purpose)
+    """)
+
+def _migration_llm_cache(cur):
+    """v5: LLM 응답 캐시 영구 저장 테이블"""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        cache_key TEXT PRIMARY KEY,
+        response TEXT NOT NULL,
+        emotion_score REAL,
+        created_at REAL NOT NULL
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache (created_at)")
+
+def _migration_retag_job(cur):
+    """v6: 상담별 위험 점수 보관 + 배치 작업 체크포인트"""
+    cur.execute("PRAGMA table_info(chats)")
+    if 'risk_score' not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE chats ADD COLUMN risk_score REAL")
+    
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS job_checkpoints (
+        job TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        processed INTEGER NOT NULL DEFAULT 0,
+        changed INTEGER NOT NULL DEFAULT 0,
+        started_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        finished_at TEXT
+    );
+    """)
+
+def _migration_emotion_model(cur):
+    """v7: 감정 점수 출처(llm/local) + 로컬 감정 분류기 가중치"""
+    cur.execute("PRAGMA table_info(chats)")
+    if 'emotion_source' not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE chats ADD COLUMN emotion_source TEXT")
+    
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS emotion_model (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        weights BLOB NOT NULL,
+        bias REAL NOT NULL,
+        samples INTEGER NOT NULL,
+        label_count INTEGER NOT NULL,
+        mae REAL,
+        trained_at TEXT NOT NULL
+    );
+    """)
+
+# user_id로 나뉘는 테이블 (llm_cache, emotion_model, job_checkpoints, 시세 저장소는 전역 공유)
+USER_PARTITIONED_TABLES = ("chats", "chat_tags", "portfolio", "dangerous_moments", "addiction_patterns", "pressure_messages")
+
+def _migration_user_partition(cur):
+    """v8: 사용자별 데이터 분리 - user_id 컬럼 + user_id 선두 복합 인덱스 + 사용자별 집계 테이블"""
+    for table in USER_PARTITIONED_TABLES:
+        cur.execute(f"PRAGMA table_info({table})")
+        if 'user_id' not in [row[1] for row in cur.fetchall()]:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}'")
+    
+    # 전체 테이블 기준 인덱스 → user_id 선두 복합 인덱스 (사용자 1명 조회가 자기 구간만 탐색)
+    for index in (
+        "idx_chats_timestamp", "idx_chat_tags_timestamp", "idx_dangerous_moments_risk",
+        "idx_addiction_patterns_count", "idx_addiction_patterns_slot",
+        "idx_pressure_messages_tag", "idx_portfolio_ticker"
+    ):
+        cur.execute(f"DROP INDEX IF EXISTS {index}")
+    
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_id ON chats (user_id, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_timestamp ON chats (user_id, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_tags_user_timestamp ON chat_tags (user_id, timestamp, tag)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dangerous_moments_user_risk ON dangerous_moments (user_id, risk_score)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_addiction_patterns_user_count ON addiction_patterns (user_id, pattern_count)")
+    cur.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_addiction_patterns_user_slot
+    ON addiction_patterns (user_id, hour_of_day, day_of_week, investment_purpose)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pressure_messages_user_tag ON pressure_messages (user_id, emotion_tag, user_stopped)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_portfolio_user_ticker ON portfolio (user_id, ticker)")
+    
+    # 집계 테이블은 파생 데이터 → 사용자 키로 다시 만들고 chats에서 재계산
+    cur.execute("DROP TABLE IF EXISTS chat_totals")
+    cur.execute("DROP TABLE IF EXISTS chat_tag_counts")
+    cur.execute("DROP TABLE IF EXISTS chat_emotion_grid")
+    
+    cur.execute("""
+    CREATE TABLE chat_totals (
+        user_id TEXT PRIMARY KEY,
+        total_chats INTEGER NOT NULL DEFAULT 0,
+        emotion_sum REAL NOT NULL DEFAULT 0,
+        emotion_count INTEGER NOT NULL DEFAULT 0,
+        high_risk_count INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE chat_tag_counts (
+        user_id TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        tag_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, tag)
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE chat_emotion_grid (
+        user_id TEXT NOT NULL,
+        day_of_week INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        emotion_sum REAL NOT NULL DEFAULT 0,
+        emotion_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day_of_week, hour)
+    );
+    """)
+    
+    cur.execute("""
+    INSERT INTO chat_totals (user_id, total_chats, emotion_sum, emotion_count, high_risk_count)
+    SELECT user_id,
+           COUNT(*),
+           COALESCE(SUM(emotion_score), 0),
+           COUNT(emotion_score),
+           COALESCE(SUM(CASE WHEN UPPER(risk_level) = 'HIGH' THEN 1 ELSE 0 END), 0)
+    FROM chats
+    GROUP BY user_id
+    """)
+    cur.execute("""
+    INSERT INTO chat_emotion_grid (user_id, day_of_week, hour, emotion_sum, emotion_count)
+    SELECT user_id,
+           CAST(strftime('%w', timestamp) AS INTEGER) as day_of_week,
+           CAST(strftime('%H', timestamp) AS INTEGER) as hour,
+           SUM(emotion_score),
+           COUNT(*)
+    FROM chats
+    WHERE emotion_score IS NOT NULL
+    GROUP BY user_id, day_of_week, hour
+    """)
+    cur.execute("""
+    INSERT INTO chat_tag_counts (user_id, tag, tag_count)
+    SELECT user_id, tag, COUNT(*) FROM chat_tags GROUP BY user_id, tag
+    """)
+
+def _migration_history_indexes(cur):
+    """v9: 상담 기록 페이지 조회 - 위험도/태그 필터를 id 역순으로 바로 읽는 인덱스 (SQLite/PostgreSQL 공용)"""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_risk ON chats (user_id, risk_level, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_tags_user_tag ON chat_tags (user_id, tag, chat_id)")
+
+def _migration_chat_search(cur):
+    """
+    v10: 상담 전문 검색 - chats를 원본으로 하는 FTS5 색인 + 동기화 트리거
+    
+    - trigram 토크나이저: 띄어쓰기/조사와 무관하게 부분 문자열 검색 ("에코프로" ⊂ "에코프로를")
+    - user_key('#user_id#')도 색인 → MATCH 안에서 사용자 범위를 먼저 좁힘
+      ('#'으로 감싸 다른 사용자 키의 부분 문자열과 구분, 검색어는 본문 컬럼으로만 제한)
+    - 외부 콘텐츠(뷰)라 본문은 chats에만 저장 (색인만 추가)
+    - FTS5/trigram(SQLite 3.34+)이 없는 빌드는 건너뜀 → search_chats가 LIKE 검색으로 대체
+    """
+    cur.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    if sqlite3.sqlite_version_info < (3, 34, 0) or not cur.fetchone()[0]:
+        return
+    
+    cur.execute("""
+    CREATE VIEW IF NOT EXISTS chats_search_source AS
+    SELECT id, user_input, ai_response, '#' || user_id || '#' AS user_key FROM chats
+    """)
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS chats_fts USING fts5(
+        user_input, ai_response, user_key,
+        content='chats_search_source', content_rowid='id', tokenize='trigram'
+    )
+    """)
+    
+    # save_chat(INSERT)과 본문 변경만 색인에 반영 (재태깅 UPDATE는 트리거 대상 아님)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS chats_fts_insert AFTER INSERT ON chats BEGIN
+        INSERT INTO chats_fts (rowid, user_input, ai_response, user_key)
+        VALUES (new.id, new.user_input, new.ai_response, '#' || new.user_id || '#');
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS chats_fts_delete AFTER DELETE ON chats BEGIN
+        INSERT INTO chats_fts (chats_fts, rowid, user_input, ai_response, user_key)
+        VALUES ('delete', old.id, old.user_input, old.ai_response, '#' || old.user_id || '#');
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS chats_fts_update AFTER UPDATE OF user_input, ai_response, user_id ON chats BEGIN
+        INSERT INTO chats_fts (chats_fts, rowid, user_input, ai_response, user_key)
+        VALUES ('delete', old.id, old.user_input, old.ai_response, '#' || old.user_id || '#');
+        INSERT INTO chats_fts (rowid, user_input, ai_response, user_key)
+        VALUES (new.id, new.user_input, new.ai_response, '#' || new.user_id || '#');
+    END
+    """)
+    
+    # 기존 상담 색인 후 세그먼트를 하나로 병합
+    cur.execute("INSERT INTO chats_fts (chats_fts) VALUES ('rebuild')")
+    cur.execute("INSERT INTO chats_fts (chats_fts) VALUES ('optimize')")
+
+# (버전, 설명, 함수) - 새 스키마 변경은 항상 맨 뒤에 추가
+# 적용된 마이그레이션은 수정하지 않음 (append-only) - 변경은 새 버전으로 추가하고,
+# 각 함수는 앱 함수 대신 그 버전 시점의 스키마 기준 SQL만 사용
+MIGRATIONS = [
+    (1, "기본 테이블", _migration_base_tables),
+    (2, "chat_tags 정규화", _migration_chat_tags),
+    (3, "대시보드 집계 테이블", _migration_chat_aggregates),
+    (4, "조회 인덱스 + addiction_patterns UNIQUE", _migration_query_indexes),
+    (5, "LLM 응답 캐시", _migration_llm_cache),
+    (6, "chats.risk_score + 배치 작업 체크포인트", _migration_retag_job),
+    (7, "chats.emotion_source + 로컬 감정 분류기", _migration_emotion_model),
+    (8, "사용자별 데이터 분리 (user_id)", _migration_user_partition),
+    (9, "상담 기록 페이지 조회 인덱스", _migration_history_indexes),
+    (10, "상담 전문 검색 (FTS5 trigram)", _migration_chat_search),
+]
+
+def _pg_migration_base(cur):
+    """PostgreSQL v8: SQLite v1~v8을 모두 적용한 것과 같은 스키마 (신규 DB라 이관 단계 없음)"""
+    # timestamp는 SQLite와 같은 'YYYY-MM-DD HH:MM:SS' (UTC) 문자열로 저장 → 비교/파싱 코드 공유
+    now_text = "to_char(timezone('UTC', now()), 'YYYY-MM-DD HH24:MI:SS')"
+    
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS chats (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        user_input TEXT NOT NULL,
+        ai_response TEXT NOT NULL,
+        emotion_score DOUBLE PRECISION,
+        risk_level TEXT,
+        tags TEXT,
+        timestamp TEXT NOT NULL DEFAULT {now_text},
+        risk_score DOUBLE PRECISION,
+        emotion_source TEXT
+    );
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS chat_tags (
+        chat_id BIGINT NOT NULL REFERENCES chats(id) ON DELETE CASCADE,
+        tag TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        PRIMARY KEY (chat_id, tag)
+    );
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS portfolio (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        ticker TEXT NOT NULL,
+        stock_name TEXT,
+        buy_price BIGINT NOT NULL,
+        quantity BIGINT NOT NULL,
+        created_at TEXT DEFAULT {now_text}
+    );
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS dangerous_moments (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        timestamp TEXT NOT NULL,
+        risk_score DOUBLE PRECISION NOT NULL,
+        emotion_tags TEXT NOT NULL,
+        user_input TEXT,
+        created_at TEXT DEFAULT {now_text}
+    );
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS addiction_patterns (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        hour_of_day INTEGER,
+        day_of_week INTEGER,
+        investment_purpose TEXT,
+        pattern_count INTEGER DEFAULT 1,
+        last_detected TEXT DEFAULT {now_text}
+    );
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS pressure_messages (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        message_type TEXT NOT NULL,
+        emotion_tag TEXT NOT NULL,
+        user_stopped INTEGER,
+        timestamp TEXT DEFAULT {now_text}
+    );
+    """)
+    
+    # 대시보드 집계 (사용자별)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_totals (
+        user_id TEXT PRIMARY KEY,
+        total_chats BIGINT NOT NULL DEFAULT 0,
+        emotion_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        emotion_count BIGINT NOT NULL DEFAULT 0,
+        high_risk_count BIGINT NOT NULL DEFAULT 0
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_tag_counts (
+        user_id TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        tag_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, tag)
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_emotion_grid (
+        user_id TEXT NOT NULL,
+        day_of_week INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        emotion_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        emotion_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day_of_week, hour)
+    );
+    """)
+    
+    # 전역 공유 테이블
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        cache_key TEXT PRIMARY KEY,
+        response TEXT NOT NULL,
+        emotion_score DOUBLE PRECISION,
+        created_at DOUBLE PRECISION NOT NULL
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS job_checkpoints (
+        job TEXT PRIMARY KEY,
+        last_id BIGINT NOT NULL DEFAULT 0,
+        processed BIGINT NOT NULL DEFAULT 0,
+        changed BIGINT NOT NULL DEFAULT 0,
+        started_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        finished_at TEXT
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS emotion_model (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        weights BYTEA NOT NULL,
+        bias DOUBLE PRECISION NOT NULL,
+        samples INTEGER NOT NULL,
+        label_count INTEGER NOT NULL,
+        mae DOUBLE PRECISION,
+        trained_at TEXT NOT NULL
+    );
+    """)
+    
+    # SQLite v2/v4/v5/v8과 같은 인덱스
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_tags_tag ON chat_tags (tag)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache (created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_id ON chats (user_id, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_timestamp ON chats (user_id, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_tags_user_timestamp ON chat_tags (user_id, timestamp, tag)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dangerous_moments_user_risk ON dangerous_moments (user_id, risk_score)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_addiction_patterns_user_count ON addiction_patterns (user_id, pattern_count)")
+    cur.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_addiction_patterns_user_slot
+    ON addiction_patterns (user_id, hour_of_day, day_of_week, investment_purpose)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pressure_messages_user_tag ON pressure_messages (user_id, emotion_tag, user_stopped)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_portfolio_user_ticker ON portfolio (user_id, ticker)")
+
+def _pg_migration_chat_search(cur):
+    """PostgreSQL v10: 상담 전문 검색 - pg_trgm GIN 인덱스 (ILIKE 부분 문자열 검색에 사용, 확장이 없으면 건너뜀)"""
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    if cur.fetchone() is None:
+        return
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_chats_search_trgm
+    ON chats USING GIN (user_input gin_trgm_ops, ai_response gin_trgm_ops)
+    """)
+
+# PostgreSQL은 신규 DB에서 시작 → 현재 스키마를 한 번에 생성
+# (v9부터의 스키마 변경은 MIGRATIONS와 PG_MIGRATIONS 양쪽에 같은 버전으로 추가)
+PG_MIGRATIONS = [
+    (8, "PostgreSQL 초기 스키마 (SQLite v1~v8과 동일)", _pg_migration_base),
+    (9, "상담 기록 페이지 조회 인덱스", _migration_history_indexes),
+    (10, "상담 전문 검색 (pg_trgm)", _pg_migration_chat_search),
+]
+
+PG_MIGRATION_LOCK_ID = 72_001   # 여러 replica가 동시에 기동할 때 마이그레이션 직렬화용 advisory lock
+
+def get_schema_version(cur):
+    """현재 적용된 스키마 버전 (없으면 0)"""
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+def run_migrations():
+    """
+    미적용 마이그레이션을 버전 순서대로 실행
+    
+    - 버전마다 하나의 트랜잭션 (실패 시 해당 버전만 롤백)
+    - 쓰기 잠금을 잡은 뒤 버전을 다시 확인 (다중 프로세스/replica 안전)
+      SQLite: BEGIN IMMEDIATE / PostgreSQL: 트랜잭션 advisory lock
+    
+    Returns:
+        int: 적용 후 스키마 버전
+    """
+    postgres = DB_BACKEND == "postgres"
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+    
+    for version, description, migrate in (PG_MIGRATIONS if postgres else MIGRATIONS):
+        with get_connection() as conn:
+            cur = conn.cursor()
+            if postgres:
+                cur.execute("SELECT pg_advisory_xact_lock(?)", (PG_MIGRATION_LOCK_ID,))
+            else:
+                cur.execute("BEGIN IMMEDIATE")
+            if get_schema_version(cur) >= version:
+                continue
+            
+            migrate(cur)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+    
+    with get_connection() as conn:
+        conn.execute("ANALYZE" if postgres else "PRAGMA optimize")
+        return get_schema_version(conn.cursor())
+
+@st.cache_resource
+def create_tables():
+    """테이블 생성 및 스키마 마이그레이션 (프로세스당 1회)"""
+    return run_migrations()
+
 
-def save_chat(user_input, ai_response, emotion_score, risk_level, tags):
-    """상담 기록 저장"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
+def split_tags(tags):
+    """태그 리스트/문자열 → '중립' 제외 태그 리스트"""
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(', ')
+    return [t.strip() for t in tags if t.strip() and t.strip() != '중립']
+
+def _apply_chat_aggregates(cur, user_id, chat_id, emotion_score, risk_level, tags):
+    """새 상담 1건을 해당 사용자의 집계 행에 반영 (save_chat 트랜잭션 안에서 호출)"""
+    cur.execute("""
+    INSERT INTO chat_totals (user_id, total_chats, emotion_sum, emotion_count, high_risk_count)
+    VALUES (?, 1, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_chats = chat_totals.total_chats + 1,
+        emotion_sum = chat_totals.emotion_sum + excluded.emotion_sum,
+        emotion_count = chat_totals.emotion_count + excluded.emotion_count,
+        high_risk_count = chat_totals.high_risk_count + excluded.high_risk_count
+    """, (
+        user_id,
+        emotion_score or 0,
+        1 if emotion_score is not None else 0,
+        1 if (risk_level or '').upper() == 'HIGH' else 0
+    ))
+    
+    if emotion_score is not None:
+        cur.execute(f"""
+        INSERT INTO chat_emotion_grid (user_id, day_of_week, hour, emotion_sum, emotion_count)
+        SELECT user_id,
+               {sql_weekday('timestamp')},
+               {sql_hour('timestamp')},
+               emotion_score, 1
+        FROM chats WHERE id = ?
+        ON CONFLICT (user_id, day_of_week, hour) DO UPDATE SET
+            emotion_sum = chat_emotion_grid.emotion_sum + excluded.emotion_sum,
+            emotion_count = chat_emotion_grid.emotion_count + 1
+        """, (chat_id,))
+    
+    cur.executemany("""
+    INSERT INTO chat_tag_counts (user_id, tag, tag_count) VALUES (?, ?, 1)
+    ON CONFLICT (user_id, tag) DO UPDATE SET tag_count = chat_tag_counts.tag_count + 1
+    """, [(user_id, tag) for tag in split_tags(tags)])
+
+def rebuild_chat_aggregates(user_id=None):
+    """
+    chats를 다시 읽어 대시보드 집계 테이블 재생성
+    
+    - 설정 탭의 재계산 버튼, retag.py 배치 작업에서 사용
+    - user_id를 주면 그 사용자 행만, None이면 전체 사용자
+    """
+    where, scope = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
     
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(f"DELETE FROM chat_totals {where}", scope)
+        cur.execute(f"DELETE FROM chat_tag_counts {where}", scope)
+        cur.execute(f"DELETE FROM chat_emotion_grid {where}", scope)
+        
+        cur.execute(f"""
+        INSERT INTO chat_totals (user_id, total_chats, emotion_sum, emotion_count, high_risk_count)
+        SELECT user_id,
+               COUNT(*),
+               COALESCE(SUM(emotion_score), 0),
+               COUNT(emotion_score),
+               COALESCE(SUM(CASE WHEN UPPER(risk_level) = 'HIGH' THEN 1 ELSE 0 END), 0)
+        FROM chats
+        {where}
+        GROUP BY user_id
+        """, scope)
+        
+        cur.execute(f"""
+        INSERT INTO chat_emotion_grid (user_id, day_of_week, hour, emotion_sum, emotion_count)
+        SELECT user_id,
+               {sql_weekday('timestamp')} as day_of_week,
+               {sql_hour('timestamp')} as hour,
+               SUM(emotion_score),
+               COUNT(*)
+        FROM chats
+        WHERE emotion_score IS NOT NULL {where.replace('WHERE', 'AND')}
+        GROUP BY user_id, day_of_week, hour
+        """, scope)
+        
+        cur.execute(f"""
+        INSERT INTO chat_tag_counts (user_id, tag, tag_count)
+        SELECT user_id, tag, COUNT(*) FROM chat_tags
+        {where}
+        GROUP BY user_id, tag
+        """, scope)
+
+SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)   # INSERT ... RETURNING 지원 여부
+
+def _write_chat(cur, user_id, user_input, ai_response, emotion_score, risk_level, tags, risk_score=None, emotion_source=None):
+    """상담 1건 INSERT + 정규화 태그 + 대시보드 집계 (호출자 트랜잭션 안에서)"""
     # 태그를 문자열로 변환
     tags_str = ", ".join(tags) if isinstance(tags, list) else tags
     
-    cur.execute("""
-    INSERT INTO chats (user_input, ai_response, emotion_score, risk_level, tags)
-    VALUES (?, ?, ?, ?, ?)
-    """, (user_input, ai_response, emotion_score, risk_level, tags_str))
+    insert_sql = """
+    INSERT INTO chats (user_id, user_input, ai_response, emotion_score, risk_level, tags, risk_score, emotion_source)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    params = (user_id, user_input, ai_response, emotion_score, risk_level, tags_str, risk_score, emotion_source)
+    if isinstance(cur, sqlite3.Cursor) and not SQLITE_HAS_RETURNING:
+        # SQLite 3.35 미만은 RETURNING 없음 → 같은 커서의 lastrowid (PostgreSQL은 항상 RETURNING)
+        chat_id = cur.execute(insert_sql, params).lastrowid
+    else:
+        chat_id = cur.execute(insert_sql + "RETURNING id", params).fetchone()[0]
     
-    conn.commit()
-    conn.close()
+    # 정규화 태그 저장
+    cur.executemany("""
+    INSERT INTO chat_tags (chat_id, user_id, tag, timestamp)
+    SELECT id, user_id, ?, timestamp FROM chats WHERE id = ?
+    ON CONFLICT DO NOTHING
+    """, [(tag, chat_id) for tag in split_tags(tags)])
     
-    # 캐시 무효화
-    load_history.clear()
-    get_emotion_stats.clear()
-    get_user_memory.clear()
-
-@st.cache_data(ttl=30)  # 30초 캐싱
-def load_history():
-    """과거 상담 기록 조회 (캐싱)"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    cur.execute("SELECT user_input, ai_response, emotion_score, risk_level, tags, timestamp FROM chats ORDER BY id DESC LIMIT 50")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    _apply_chat_aggregates(cur, user_id, chat_id, emotion_score, risk_level, tags)
+
+def save_chat(user_id, user_input, ai_response, emotion_score, risk_level, tags, risk_score=None, emotion_source=None):
+    """
+    상담 기록 저장 (쓰기 큐 경유, 집계 갱신과 같은 트랜잭션)
+    
+    emotion_source: 'llm'(응답의 감정점수 태그) 또는 'local'(로컬 분류기 대체값)
+    """
+    enqueue_write(_write_chat, user_id, user_input, ai_response, emotion_score, risk_level, tags, risk_score, emotion_source)
+
+# ============================================================================
+# 👤 사용자별 캐시 버전
+# ============================================================================
+
+@st.cache_resource
+def get_user_data_versions():
+    """
+    사용자별 데이터 버전 (프로세스 전역)
+    
+    - 조회 캐시 키에 (epoch, 사용자 버전)을 넣어 쓰기가 있었던 사용자 캐시만 새로 계산
+    - epoch는 전체 재계산(재태깅, 집계 재생성) 때 모든 사용자를 한 번에 무효화
+    """
+    return {'lock': threading.Lock(), 'epoch': 0, 'versions': {}}
+
+def user_data_version(user_id):
+    """조회 캐시 키로 쓰는 사용자 데이터 버전"""
+    state = get_user_data_versions()
+    return state['epoch'], state['versions'].get(user_id, 0)
+
+def _invalidate_chat_caches(user_ids=None):
+    """상담/맥락 기억/포트폴리오 조회 캐시 무효화 (user_ids=None이면 전체 사용자)"""
+    state = get_user_data_versions()
+    with state['lock']:
+        if user_ids is None:
+            state['epoch'] += 1
+        else:
+            for user_id in user_ids:
+                state['versions'][user_id] = state['versions'].get(user_id, 0) + 1
+
+HISTORY_PAGE_SIZES = (10, 20, 50, 100)   # 상담 기록 탭 페이지 크기 선택지
+HISTORY_RISK_LEVELS = ("high", "mid", "low")
+
+def load_history_page(user_id, before_id=None, page_size=20, date_from=None, date_to=None, tag=None, risk_level=None):
+    """
+    상담 기록 한 페이지 조회 (id 키셋 페이지네이션, 사용자별 캐싱)
+    
+    - OFFSET 없이 "id < before_id" 로 다음 페이지를 인덱스에서 바로 이어 읽음
+    - ai_response 본문은 제외 (펼쳐볼 때 load_chat_response로 따로 조회)
+    
+    Args:
+        before_id: 이전 페이지의 next_before_id (None이면 최신부터)
+        date_from, date_to: KST 날짜 'YYYY-MM-DD' (양 끝 포함)
+        tag: 감정 태그 필터 / risk_level: 'high' / 'mid' / 'low'
+    
+    Returns:
+        (rows, next_before_id): rows는 (id, user_input, emotion_score, risk_level, tags, timestamp),
+        next_before_id는 다음 페이지가 없으면 None
+    """
+    return _load_history_page(
+        user_id, user_data_version(user_id), before_id, page_size, date_from, date_to, tag, risk_level
+    )
+
+def _history_id_bounds(cur, user_id, date_from, date_to):
+    """
+    날짜 범위 → id 범위 (idx_chats_user_timestamp에서 양 끝 한 건씩만 탐색)
+    
+    날짜는 KST 기준, timestamp 컬럼은 UTC → KST 0시를 UTC로 바꿔 비교
+    timestamp는 저장 시점에 DB가 채우므로 id 순서와 시간 순서가 같음
+    → 페이지 조회는 날짜 대신 id 범위로 걸어 id 역순 인덱스를 그대로 사용
+    
+    Returns:
+        (min_id, max_id) - 범위에 기록이 없으면 None
+    """
+    min_id, max_id = None, None
+    if date_from:
+        cur.execute("""
+        SELECT id FROM chats WHERE user_id = ? AND timestamp >= ?
+        ORDER BY timestamp, id LIMIT 1
+        """, (user_id, kst_day_start_utc(date_from)))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        min_id = row[0]
+    if date_to:
+        next_day = (datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        cur.execute("""
+        SELECT id FROM chats WHERE user_id = ? AND timestamp < ?
+        ORDER BY timestamp DESC, id DESC LIMIT 1
+        """, (user_id, kst_day_start_utc(next_day)))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        max_id = row[0]
+    if min_id is not None and max_id is not None and min_id > max_id:
+        return None
+    return min_id, max_id
+
+@st.cache_data(ttl=30, max_entries=USER_CACHE_ENTRIES)  # 30초 캐싱
+def _load_history_page(user_id, version, before_id, page_size, date_from, date_to, tag, risk_level):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        bounds = _history_id_bounds(cur, user_id, date_from, date_to)
+        if bounds is None:
+            return [], None
+        min_id, max_id = bounds
+        if before_id is not None and (max_id is None or before_id <= max_id):
+            max_id = before_id - 1
+        
+        # 태그 필터는 chat_tags (user_id, tag, chat_id) 인덱스에서 출발, 그 외는 chats 인덱스
+        # (위험도만 있으면 (user_id, risk_level, id), 없으면 (user_id, id))
+        if tag:
+            query = """
+            SELECT chats.id, chats.user_input, chats.emotion_score, chats.risk_level, chats.tags, chats.timestamp
+            FROM chat_tags JOIN chats ON chats.id = chat_tags.chat_id
+            WHERE chat_tags.user_id = ? AND chat_tags.tag = ?
+            """
+            params = [user_id, tag]
+            id_column = "chat_tags.chat_id"
+        else:
+            query = """
+            SELECT chats.id, chats.user_input, chats.emotion_score, chats.risk_level, chats.tags, chats.timestamp
+            FROM chats WHERE chats.user_id = ?
+            """
+            params = [user_id]
+            id_column = "chats.id"
+        
+        if risk_level:
+            query += " AND chats.risk_level = ?"
+            params.append(risk_level)
+        if min_id is not None:
+            query += f" AND {id_column} >= ?"
+            params.append(min_id)
+        if max_id is not None:
+            query += f" AND {id_column} <= ?"
+            params.append(max_id)
+        
+        # 한 건 더 읽어 다음 페이지 유무 판단
+        query += f" ORDER BY {id_column} DESC LIMIT ?"
+        params.append(page_size + 1)
+        
+        cur.execute(query, params)
+        rows = cur.fetchall()
+    
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, rows[-1][0]
+    return rows, None
+
+def load_chat_response(user_id, chat_id):
+    """상담 한 건의 AI 답변 본문 (상담 기록 탭에서 펼쳐볼 때만 조회)"""
+    return _load_chat_response(user_id, chat_id, user_data_version(user_id))
+
+@st.cache_data(ttl=300, max_entries=USER_CACHE_ENTRIES)  # 5분 캐싱 (답변 본문은 바뀌지 않음)
+def _load_chat_response(user_id, chat_id, version):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT ai_response FROM chats WHERE user_id = ? AND id = ?", (user_id, chat_id))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+SEARCH_RESULT_LIMIT = 20     # 검색 결과 최대 건수
+SEARCH_RANK_WINDOW = 1000    # 순위를 매길 최신 일치 상담 수 (사용자 기록이 아무리 많아도 검색 비용 고정)
+SEARCH_MIN_FTS_TERM = 3      # trigram 색인으로 찾을 수 있는 최소 글자 수 (더 짧은 단어는 LIKE)
+SEARCH_SNIPPET_CHARS = 40    # 스니펫에서 검색어 앞뒤로 보여줄 글자 수
+
+def search_chats(user_id, query, limit=SEARCH_RESULT_LIMIT):
+    """
+    상담 전문 검색 (사용자별 캐싱)
+    
+    - 공백으로 나눈 단어가 모두 user_input 또는 ai_response에 들어간 상담만 (AND)
+    - 최신 일치 SEARCH_RANK_WINDOW건을 모아 관련도 순 정렬 (_search_score, 동점은 최신순)
+    - SQLite: FTS5 trigram 색인 (user_key로 사용자 범위 먼저 제한)
+      3글자 미만 단어는 LIKE로 추가 필터, 전부 짧으면 사용자 상담만 LIKE 검색
+    - PostgreSQL: ILIKE (pg_trgm 인덱스가 있으면 사용)
+    
+    Returns:
+        list: (id, timestamp, tags, risk_level, snippet) - snippet은 일치 부분을 **굵게** 표시한 markdown
+    """
+    terms = tuple(dict.fromkeys(query.split()))
+    if not terms:
+        return []
+    return _search_chats(user_id, user_data_version(user_id), terms, limit)
 
-@st.cache_data(ttl=30)  # 30초 캐싱
-def get_emotion_stats():
-    """감정 통계 (캐싱)"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    cur.execute("SELECT emotion_score, timestamp FROM chats WHERE emotion_score IS NOT NULL ORDER BY timestamp")
-    rows = cur.fetchall()
-    conn.close()
+def _search_score(user_input, ai_response, terms):
+    """
+    관련도 점수 - 단어별 등장 횟수를 BM25의 tf 항처럼 포화시켜 합산 (질문 일치는 2배)
+    
+    FTS5 bm25()는 IDF 계산을 위해 단어가 들어간 전체 문서 수를 매번 세므로
+    ("삼성전자"처럼 흔한 단어는 전 사용자 수십만 건) 사용자 후보만으로 계산
+    """
+    user_input, ai_response = user_input.lower(), ai_response.lower()
+    score = 0.0
+    for term in terms:
+        term = term.lower()
+        for text, weight in ((user_input, 2.0), (ai_response, 1.0)):
+            tf = text.count(term)
+            score += weight * tf / (tf + 1.2)
+    return score
+
+def _fts_phrase(text):
+    """FTS5 phrase 리터럴 (따옴표는 FTS5 규칙대로 두 번)"""
+    return '"' + text.replace('"', '""') + '"'
+
+def _search_snippet(text, terms):
+    """첫 번째 일치 위치 주변을 잘라 검색어를 **굵게** 표시"""
+    lowered = text.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(min(positions, default=0) - SEARCH_SNIPPET_CHARS, 0)
+    end = min(start + SEARCH_SNIPPET_CHARS * 2 + max(len(term) for term in terms), len(text))
+    snippet = text[start:end]
+    for term in sorted(terms, key=len, reverse=True):
+        snippet = re.sub(re.escape(term), lambda m: f"**{m.group(0)}**", snippet, flags=re.IGNORECASE)
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+@st.cache_data(ttl=30, max_entries=USER_CACHE_ENTRIES)  # 30초 캐싱
+def _search_chats(user_id, version, terms, limit):
+    fts_terms = [term for term in terms if len(term) >= SEARCH_MIN_FTS_TERM]
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        use_fts = False
+        if DB_BACKEND != "postgres" and fts_terms:
+            cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chats_fts'")
+            use_fts = cur.fetchone() is not None
+        like_terms = [term for term in terms if term not in fts_terms] if use_fts else list(terms)
+        
+        conditions, params = [], []
+        for term in like_terms:
+            conditions.append(f"({sql_contains('chats.user_input')} OR {sql_contains('chats.ai_response')})")
+            params += [like_pattern(term), like_pattern(term)]
+        filters = "".join(f" AND {condition}" for condition in conditions)
+        
+        if use_fts:
+            # 사용자 키 + 각 단어를 phrase로 묶어 AND
+            # 검색어는 본문 컬럼으로만 제한 (user_key까지 보면 'gmail'·'ult' 같은 단어가 그 사용자 상담 전부와 일치)
+            match = (
+                f"user_key : {_fts_phrase('#' + user_id + '#')} AND "
+                f"{{user_input ai_response}} : ({' AND '.join(_fts_phrase(term) for term in fts_terms)})"
+            )
+            cur.execute(f"""
+            SELECT chats.id, chats.timestamp, chats.tags, chats.risk_level, chats.user_input, chats.ai_response
+            FROM chats_fts JOIN chats ON chats.id = chats_fts.rowid
+            WHERE chats_fts MATCH ? AND chats.user_id = ?{filters}
+            ORDER BY chats_fts.rowid DESC
+            LIMIT ?
+            """, [match, user_id] + params + [SEARCH_RANK_WINDOW])
+        else:
+            cur.execute(f"""
+            SELECT chats.id, chats.timestamp, chats.tags, chats.risk_level, chats.user_input, chats.ai_response
+            FROM chats WHERE chats.user_id = ?{filters}
+            ORDER BY chats.id DESC
+            LIMIT ?
+            """, [user_id] + params + [SEARCH_RANK_WINDOW])
+        rows = cur.fetchall()
+    
+    rows.sort(key=lambda row: (-_search_score(row[4], row[5], terms), -row[0]))
+    results = []
+    for chat_id, timestamp, tags, risk, user_input, ai_response in rows[:limit]:
+        matched = user_input if any(term.lower() in user_input.lower() for term in terms) else ai_response
+        results.append((chat_id, timestamp, tags, risk, _search_snippet(matched, terms)))
+    return results
+
+def get_emotion_stats(user_id):
+    """감정 통계 (사용자별 캐싱)"""
+    return _get_emotion_stats(user_id, user_data_version(user_id))
+
+@st.cache_data(ttl=30, max_entries=USER_CACHE_ENTRIES)  # 30초 캐싱
+def _get_emotion_stats(user_id, version):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+        SELECT emotion_score, timestamp FROM chats
+        WHERE user_id = ? AND emotion_score IS NOT NULL
+        ORDER BY timestamp
+        """, (user_id,))
+        rows = cur.fetchall()
     return rows
 
-def save_portfolio_stock(ticker, stock_name, buy_price, quantity):
+def save_portfolio_stock(user_id, ticker, stock_name, buy_price, quantity):
     """포트폴리오에 종목 추가"""
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-    INSERT INTO portfolio (ticker, stock_name, buy_price, quantity)
-    VALUES (?, ?, ?, ?)
-    """, (ticker, stock_name, buy_price, quantity))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+        INSERT INTO portfolio (user_id, ticker, stock_name, buy_price, quantity)
+        VALUES (?, ?, ?, ?, ?)
+        """, (user_id, ticker, stock_name, buy_price, quantity))
     
     # 캐시 무효화
-    load_portfolio_from_db.clear()
+    _invalidate_chat_caches({user_id})
+
+def load_portfolio_from_db(user_id):
+    """DB에서 포트폴리오 로드 (사용자별 캐싱)"""
+    return _load_portfolio_from_db(user_id, user_data_version(user_id))
 
-@st.cache_data(ttl=60)  # 1분 캐싱
-def load_portfolio_from_db():
-    """DB에서 포트폴리오 로드 (캐싱)"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    cur.execute("SELECT ticker, stock_name, buy_price, quantity FROM portfolio")
-    rows = cur.fetchall()
-    conn.close()
+@st.cache_data(ttl=60, max_entries=USER_CACHE_ENTRIES)  # 1분 캐싱
+def _load_portfolio_from_db(user_id, version):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT ticker, stock_name, buy_price, quantity FROM portfolio WHERE user_id = ?", (user_id,))
+        rows = cur.fetchall()
     
     return [
         {
@@ -542,18 +2757,14 @@ def load_portfolio_from_db():
         for row in rows
     ]
 
-def delete_portfolio_stock(ticker):
+def delete_portfolio_stock(user_id, ticker):
     """포트폴리오에서 종목 삭제"""
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM portfolio WHERE ticker = ?", (ticker,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM portfolio WHERE user_id = ? AND ticker = ?", (user_id, ticker))
     
     # 캐시 무효화
-    load_portfolio_from_db.clear()
-
-create_tables()
+    _invalidate_chat_caches({user_id})
 
 # ============================================================================
 # 🎨 애니메이션 CSS
@@ -633,8 +2844,6 @@ ANIMATION_CSS = """
 </style>
 """
 
-st.markdown(ANIMATION_CSS, unsafe_allow_html=True)
-
 # ============================================================================
 # 🎯 위험지표 계산
 # ============================================================================
@@ -664,63 +2873,307 @@ def detect_risk_level(risk_score):
     else:
         return "low"
 
+# 감정 태그 12종 사전 (태그 → {키워드: 가중치}), 태그 순서가 detect_tags 결과 순서
+EMOTION_LEXICON = {
+    "불안": {"불안": 1.0, "걱정": 1.0, "두려": 1.0, "무서": 1.0, "떨려": 1.0},
+    "분노": {"손실": 1.0, "떨어": 1.0, "내려": 1.0, "털렸": 1.5, "씨발": 2.0, "화나": 1.5, "짜증": 1.0},
+    "충동": {"사도": 1.0, "들어갈": 1.0, "몰빵": 2.0, "급": 0.5, "지금": 0.5, "당장": 1.5},
+    "후회": {"후회": 1.5, "실수": 1.0, "잘못": 1.0, "했어야": 1.0},
+    "탐욕": {"더": 0.5, "많이": 0.5, "대박": 1.5, "벌고": 1.0, "수익": 1.0, "올랐": 1.0, "급등": 1.5},  # 고위험
+    "공포": {"망했": 1.5, "끝났": 1.5, "파산": 2.0, "다 잃": 2.0, "무섭": 1.0},
+    "FOMO": {"남들은": 1.0, "다들": 1.0, "나만": 1.5, "놓쳤": 1.5, "늦었": 1.0, "올라가는데": 1.0},
+    "자포자기": {"어차피": 1.5, "상관없": 1.0, "아무거나": 1.5, "됐어": 1.0, "포기": 1.5},  # 고위험
+    "우울": {"우울": 1.5, "힘들": 1.0, "지쳤": 1.0, "포기하고싶": 2.0, "의미없": 1.5},
+    "흥분": {"와!": 1.0, "대박": 1.0, "완전": 0.5, "진짜!": 1.0, "미쳤": 1.5},
+    "회의감": {"의심": 1.0, "믿을수없": 1.5, "사기": 1.5, "조작": 1.5, "속았": 1.5},
+    "냉정": {"분석": 1.0, "계획": 1.0, "전략": 1.0, "냉정": 1.5, "객관": 1.0},
+}
+
+# 거래 패턴 감지기용 키워드 (감정 태그와 같은 오토마톤에서 함께 찾음)
+PATTERN_LEXICON = {
+    "revenge_loss": {"손실": 1.0, "떨어": 1.0, "손해": 1.0, "마이너스": 1.0, "잃": 1.0, "-": 1.0},
+    "loss_streak": {"손실": 1.0, "떨어": 1.0, "손해": 1.0, "마이너스": 1.0, "잃": 1.0, "물렸": 1.0},
+    "fomo_streak": {"급등": 1.0, "올라": 1.0, "놓쳤": 1.0, "남들": 1.0, "다들": 1.0, "나만": 1.0, "뒤쳐": 1.0},
+}
+
+TAG_CACHE_SIZE = 1024       # 메시지별 태깅 결과 캐시 크기 (패턴 감지기가 같은 상담을 반복 검사)
+
+@st.cache_resource
+def get_lexicon_automaton():
+    """감정 태그 + 패턴 키워드 전체를 한 번에 찾는 공용 오토마톤 (메시지별 결과 캐시 포함)"""
+    automaton = build_keyword_automaton([
+        (keyword, (tag, weight))
+        for lexicon in (EMOTION_LEXICON, PATTERN_LEXICON)
+        for tag, keywords in lexicon.items()
+        for keyword, weight in keywords.items()
+    ])
+    automaton['cache'] = OrderedDict()
+    automaton['lock'] = threading.Lock()
+    return automaton
+
+def tag_text(text):
+    """
+    사전 키워드 1회 스캔 (결과는 공유 캐시 객체이므로 읽기 전용으로 사용)
+    
+    Returns:
+        dict: 'spans'([(시작, 끝, 태그)]), 'counts'(태그별 적중 수), 'scores'(태그별 가중치 합)
+    """
+    automaton = get_lexicon_automaton()
+    with automaton['lock']:
+        if text in automaton['cache']:
+            automaton['cache'].move_to_end(text)
+            return automaton['cache'][text]
+    
+    spans = []
+    counts = Counter()
+    scores = Counter()
+    
+    for start, end, pattern_id in scan_keywords(automaton, text):
+        for tag, weight in automaton['patterns'][pattern_id][1]:
+            spans.append((start, end, tag))
+            counts[tag] += 1
+            scores[tag] += weight
+    
+    result = {'spans': spans, 'counts': counts, 'scores': dict(scores)}
+    with automaton['lock']:
+        automaton['cache'][text] = result
+        while len(automaton['cache']) > TAG_CACHE_SIZE:
+            automaton['cache'].popitem(last=False)
+    
+    return result
+
 def detect_tags(user_input):
     """감정 태그 12종 감지"""
-    tags = []
-    
-    # 1. 불안
-    if any(word in user_input for word in ["불안", "걱정", "두려", "무서", "떨려"]):
-        tags.append("불안")
+    counts = tag_text(user_input)['counts']
+    tags = [tag for tag in EMOTION_LEXICON if counts[tag]]
+    return tags if tags else ["중립"]
+
+def get_high_risk_tags():
+    """고위험 감정 태그 리스트"""
+    return ["탐욕", "자포자기", "충동", "FOMO", "공포"]
+
+# ============================================================================
+# 🏷️ 상담 기록 재태깅 배치 작업 상태 + 실행 (작업 자체는 retag.py)
+# ============================================================================
+
+RETAG_JOB = "retag_chats"
+RETAG_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retag.py")
+
+def get_job_checkpoint(job=RETAG_JOB):
+    """배치 작업 진행 상태 (없으면 None)"""
+    with get_connection() as conn:
+        row = conn.execute("""
+        SELECT last_id, processed, changed, started_at, updated_at, finished_at
+        FROM job_checkpoints WHERE job = ?
+        """, (job,)).fetchone()
     
-    # 2. 분노
-    if any(word in user_input for word in ["손실", "떨어", "내려", "털렸", "씨발", "화나", "짜증"]):
-        tags.append("분노")
+    if row is None:
+        return None
+    return dict(zip(['last_id', 'processed', 'changed', 'started_at', 'updated_at', 'finished_at'], row))
+
+@st.cache_resource
+def get_retag_runner():
+    """설정 탭에서 띄운 재태깅 프로세스 (프로세스 전역, 한 번에 하나)"""
+    return {'lock': threading.Lock(), 'process': None}
+
+def is_retag_job_running():
+    """설정 탭에서 띄운 재태깅 프로세스가 아직 실행 중인지"""
+    process = get_retag_runner()['process']
+    return process is not None and process.poll() is None
+
+def start_retag_job():
+    """
+    retag.py를 별도 프로세스로 실행 (중단된 작업이면 체크포인트 다음부터 이어함)
     
-    # 3. 충동
-    if any(word in user_input for word in ["사도", "들어갈", "몰빵", "급", "지금", "당장"]):
-        tags.append("충동")
+    - 요청 스레드를 막지 않고, Streamlit 프로세스 안에서 전체 chats를 훑지 않음
+    - 같은 작업 디렉터리/환경 변수로 실행 → 같은 gini.db (또는 PostgreSQL)에 기록
     
-    # 4. 후회
-    if any(word in user_input for word in ["후회", "실수", "잘못", "했어야"]):
-        tags.append("후회")
+    Returns:
+        bool: 새로 시작했는지 (이미 실행 중이면 False)
+    """
+    runner = get_retag_runner()
+    with runner['lock']:
+        if runner['process'] is not None and runner['process'].poll() is None:
+            return False
+        runner['process'] = subprocess.Popen([sys.executable, RETAG_SCRIPT], cwd=os.getcwd())
+        return True
+
+# ============================================================================
+# 🧮 로컬 감정 분류기 (문자 n-gram 해싱 + 로지스틱 회귀)
+# ============================================================================
+
+EMOTION_MODEL_FEATURES = 2 ** 16    # 해시 특징 차원
+EMOTION_MODEL_NGRAMS = (1, 2, 3)    # 문자 n-gram 길이
+EMOTION_MODEL_MAX_CHARS = 500       # 특징 추출에 쓰는 최대 글자 수
+EMOTION_MODEL_MIN_SAMPLES = 30      # 이보다 적으면 감정 사전 기반 추정 사용
+EMOTION_MODEL_MAX_SAMPLES = 20000   # 최근 상담만 학습
+EMOTION_MODEL_RETRAIN_EVERY = 50    # LLM 점수가 붙은 상담이 이만큼 늘면 재학습
+EMOTION_MODEL_CHECK_INTERVAL = 60   # 재학습 필요 여부 확인 주기 (초)
+EMOTION_MODEL_EPOCHS = 300
+EMOTION_MODEL_LEARNING_RATE = 4.0   # 특징 벡터를 L2 정규화하므로 큰 학습률도 안정적
+EMOTION_MODEL_L2 = 1e-5
+
+def emotion_features(text):
+    """문자 n-gram → 해시 특징 번호 배열 (중복 제거, crc32라 프로세스가 달라도 같은 번호)"""
+    text = " " + " ".join(text.lower().split())[:EMOTION_MODEL_MAX_CHARS] + " "
+    ids = {
+        zlib.crc32(text[i:i + n].encode()) % EMOTION_MODEL_FEATURES
+        for n in EMOTION_MODEL_NGRAMS
+        for i in range(len(text) - n + 1)
+    }
+    return np.fromiter(ids, dtype=np.int64, count=len(ids))
+
+def train_emotion_model(texts, scores):
+    """
+    감정 점수(0~10)를 확률(0~1)로 보고 로지스틱 회귀 학습 (전체 배치 경사하강, NumPy 희소 연산)
     
-    # 5. 탐욕 (고위험)
-    if any(word in user_input for word in ["더", "많이", "대박", "벌고", "수익", "올랐", "급등"]):
-        tags.append("탐욕")
+    Returns:
+        dict: weights(float32 배열), bias, samples, mae(학습 데이터 평균 절대 오차)
+    """
+    rows = [emotion_features(text) for text in texts]
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    indices = np.concatenate(rows)
+    row_of = np.repeat(np.arange(len(rows)), lengths)
+    values = (1.0 / np.sqrt(np.maximum(lengths, 1)))[row_of]   # 행별 L2 정규화
+    
+    target = np.clip(np.asarray(scores, dtype=np.float64) / 10, 0.0, 1.0)
+    mean = np.clip(target.mean(), 0.01, 0.99)
+    weights = np.zeros(EMOTION_MODEL_FEATURES)
+    bias = float(np.log(mean / (1 - mean)))
+    
+    for _ in range(EMOTION_MODEL_EPOCHS):
+        logits = np.bincount(row_of, weights=weights[indices] * values, minlength=len(rows)) + bias
+        error = (1 / (1 + np.exp(-logits)) - target) / len(rows)
+        gradient = np.bincount(indices, weights=error[row_of] * values, minlength=EMOTION_MODEL_FEATURES)
+        weights -= EMOTION_MODEL_LEARNING_RATE * (gradient + EMOTION_MODEL_L2 * weights)
+        bias -= EMOTION_MODEL_LEARNING_RATE * error.sum()
+    
+    logits = np.bincount(row_of, weights=weights[indices] * values, minlength=len(rows)) + bias
+    mae = float(np.abs(10 / (1 + np.exp(-logits)) - target * 10).mean())
+    
+    return {'weights': weights.astype(np.float32), 'bias': bias, 'samples': len(rows), 'mae': round(mae, 2)}
+
+def _load_emotion_model():
+    """저장된 분류기 가중치 (없으면 None)"""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT weights, bias, samples, label_count, mae, trained_at FROM emotion_model WHERE id = 1"
+        ).fetchone()
+    
+    if row is None:
+        return None
+    return {
+        'weights': np.frombuffer(row[0], dtype=np.float32),
+        'bias': row[1],
+        'samples': row[2],
+        'label_count': row[3],
+        'mae': row[4],
+        'trained_at': row[5]
+    }
+
+@st.cache_resource
+def get_emotion_model():
+    """프로세스 전역 분류기 홀더 (재학습되면 'model'만 교체)"""
+    return {'model': _load_emotion_model(), 'lock': threading.Lock(), 'training': False, 'next_check': 0.0}
+
+def retrain_emotion_model():
+    """
+    LLM이 매긴 감정 점수가 있는 최근 상담으로 재학습 후 저장
     
-    # 6. 공포
-    if any(word in user_input for word in ["망했", "끝났", "파산", "다 잃", "무섭"]):
-        tags.append("공포")
+    Returns:
+        dict or None: 새 모델 (학습 데이터 부족 시 None)
+    """
+    with get_connection() as conn:
+        label_count = conn.execute("""
+        SELECT COUNT(*) FROM chats
+        WHERE emotion_score IS NOT NULL AND COALESCE(emotion_source, 'llm') = 'llm'
+        """).fetchone()[0]
+        rows = conn.execute("""
+        SELECT user_input, emotion_score FROM chats
+        WHERE emotion_score IS NOT NULL AND COALESCE(emotion_source, 'llm') = 'llm'
+        ORDER BY id DESC LIMIT ?
+        """, (EMOTION_MODEL_MAX_SAMPLES,)).fetchall()
+    
+    if len(rows) < EMOTION_MODEL_MIN_SAMPLES:
+        return None
     
-    # 7. FOMO (Fear Of Missing Out)
-    if any(word in user_input for word in ["남들은", "다들", "나만", "놓쳤", "늦었", "올라가는데"]):
-        tags.append("FOMO")
+    model = train_emotion_model([row[0] for row in rows], [row[1] for row in rows])
+    model['label_count'] = label_count
+    model['trained_at'] = datetime.now().isoformat(timespec='seconds')
     
-    # 8. 자포자기 (고위험)
-    if any(word in user_input for word in ["어차피", "상관없", "아무거나", "됐어", "포기"]):
-        tags.append("자포자기")
+    with get_connection() as conn:
+        conn.execute("""
+        INSERT INTO emotion_model (id, weights, bias, samples, label_count, mae, trained_at)
+        VALUES (1, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            weights = excluded.weights, bias = excluded.bias, samples = excluded.samples,
+            label_count = excluded.label_count, mae = excluded.mae, trained_at = excluded.trained_at
+        """, (model['weights'].tobytes(), model['bias'], model['samples'], label_count, model['mae'], model['trained_at']))
     
-    # 9. 우울
-    if any(word in user_input for word in ["우울", "힘들", "지쳤", "포기하고싶", "의미없"]):
-        tags.append("우울")
+    get_emotion_model()['model'] = model
+    return model
+
+def _emotion_model_worker(holder, force=False):
+    """재학습 필요 여부 확인 후 학습 (백그라운드 스레드, force면 새 라벨 수와 무관하게 학습)"""
+    try:
+        with get_connection() as conn:
+            label_count = conn.execute("""
+            SELECT COUNT(*) FROM chats
+            WHERE emotion_score IS NOT NULL AND COALESCE(emotion_source, 'llm') = 'llm'
+            """).fetchone()[0]
+        
+        model = holder['model']
+        trained_count = model['label_count'] if model else 0
+        if label_count >= EMOTION_MODEL_MIN_SAMPLES and (force or label_count - trained_count >= (EMOTION_MODEL_RETRAIN_EVERY if model else 0)):
+            retrain_emotion_model()
+    except Exception:
+        logger.exception("감정 모델 학습 실패 - 다음 확인 주기에 재시도")
+    finally:
+        holder['training'] = False
+
+def schedule_emotion_model_training(force=False):
+    """
+    필요하면 백그라운드 재학습 시작 (확인은 EMOTION_MODEL_CHECK_INTERVAL마다 최대 1회)
     
-    # 10. 흥분
-    if any(word in user_input for word in ["와!", "대박", "완전", "진짜!", "미쳤"]):
-        tags.append("흥분")
+    Args:
+        force: 확인 주기/새 라벨 수와 무관하게 바로 재학습 (설정 탭의 관리자 버튼)
     
-    # 11. 회의감
-    if any(word in user_input for word in ["의심", "믿을수없", "사기", "조작", "속았"]):
-        tags.append("회의감")
+    Returns:
+        bool: 이번 호출로 학습 스레드를 시작했는지 (이미 학습 중이면 False)
+    """
+    holder = get_emotion_model()
+    with holder['lock']:
+        if holder['training'] or (not force and time.time() < holder['next_check']):
+            return False
+        holder['training'] = True
+        holder['next_check'] = time.time() + EMOTION_MODEL_CHECK_INTERVAL
+    
+    threading.Thread(target=_emotion_model_worker, args=(holder, force), name="gini-emotion-model", daemon=True).start()
+    return True
+
+def lexicon_emotion_score(text):
+    """학습 데이터가 없을 때의 감정 점수 추정 (감정 사전 가중치 기반, 0~10)"""
+    scores = tag_text(text)['scores']
+    score = 5.0
+    score += sum(scores.get(tag, 0.0) for tag in get_high_risk_tags())
+    score += 0.5 * sum(scores.get(tag, 0.0) for tag in ("불안", "분노", "후회", "우울"))
+    score -= scores.get("냉정", 0.0)
+    return round(float(np.clip(score, 0.0, 10.0)), 1)
+
+def predict_emotion_score(text):
+    """
+    LLM 없이 즉시 감정 점수 추정 (0~10)
     
-    # 12. 냉정
-    if any(word in user_input for word in ["분석", "계획", "전략", "냉정", "객관"]):
-        tags.append("냉정")
+    - 학습된 분류기가 있으면 n-gram 가중치 합 → 시그모이드
+    - 없으면 감정 사전 기반 추정
+    """
+    model = get_emotion_model()['model']
+    if model is None:
+        return lexicon_emotion_score(text)
     
-    return tags if tags else ["중립"]
-
-def get_high_risk_tags():
-    """고위험 감정 태그 리스트"""
-    return ["탐욕", "자포자기", "충동", "FOMO", "공포"]
+    ids = emotion_features(text)
+    logit = float(model['weights'][ids].sum()) / np.sqrt(max(len(ids), 1)) + model['bias']
+    return round(10 / (1 + np.exp(-logit)), 1)
 
 # ============================================================================
 # 💥 압박 멘트 시스템 (v4.0)
@@ -875,141 +3328,291 @@ def get_pressure_message(emotion_tags):
     return None
 
 # ============================================================================
-# 🧠 맥락 기억 시스템 (v4.0)
+# 🚦 LLM 호출 전 안전 게이트
 # ============================================================================
 
-def save_dangerous_moment(risk_score, emotion_tags, user_input):
-    """위험한 순간 기록"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
+def gate_message(user_id, user_input, risk_estimate, policy=None):
+    """
+    LLM 호출 전에 감정 태그·압박 멘트·거래 패턴을 먼저 판정
     
-    tags_str = ", ".join(emotion_tags) if isinstance(emotion_tags, list) else emotion_tags
+    - 이번 메시지는 아직 저장 전이므로 거래 패턴은 저장된 최근 상담 + 이번 메시지로 판정
+    - 게이트(개입 먼저)는 극단적 압박만: GATE_TAGS 키워드 가중치 합이 GATE_MIN_TAG_SCORE 이상이고
+      즉시 위험 추정이 GATE_MIN_RISK 이상일 때. 나머지 압박 멘트는 평소처럼 LLM 응답 뒤에 표시
     
-    cur.execute("""
-    INSERT INTO dangerous_moments (timestamp, risk_score, emotion_tags, user_input)
-    VALUES (datetime('now'), ?, ?, ?)
-    """, (risk_score, tags_str, user_input))
+    Args:
+        user_id: 거래 패턴을 볼 사용자
+        user_input: 사용자 메시지
+        risk_estimate: LLM 없이 계산한 즉시 위험 추정 (0~10)
+        policy: 'off' / 'defer' / 'skip' (None이면 GATING_POLICY)
     
-    conn.commit()
-    conn.close()
-
-def update_addiction_pattern(hour, day_of_week, purpose="만회"):
-    """중독 패턴 업데이트"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
+    Returns:
+        dict: {'tags', 'pressure', 'pattern_warnings', 'action'}
+              action: 'llm' (평소대로 LLM 응답) / 'defer' (개입 먼저, LLM은 백그라운드) / 'skip' (개입만)
+    """
+    policy = policy or GATING_POLICY
+    tags = detect_tags(user_input)
+    pressure = get_pressure_message(tags)
+    
+    action = "llm"
+    if policy in ("defer", "skip") and risk_estimate >= GATE_MIN_RISK:
+        scores = tag_text(user_input)['scores']
+        gate_tags = [tag for tag in GATE_TAGS if scores.get(tag, 0.0) >= GATE_MIN_TAG_SCORE]
+        if gate_tags:
+            action = policy
+            pressure = get_pressure_message(gate_tags)
     
-    # 기존 패턴 확인
-    cur.execute("""
-    SELECT id, pattern_count FROM addiction_patterns
-    WHERE hour_of_day = ? AND day_of_week = ? AND investment_purpose = ?
-    """, (hour, day_of_week, purpose))
+    return {
+        'tags': tags,
+        'pressure': pressure,
+        'pattern_warnings': get_trading_pattern_warnings(user_id, analyze_trading_patterns(user_id, pending_input=user_input)),
+        'action': action
+    }
+
+def format_pressure_message(pressure_msg):
+    """압박 멘트를 대화 기록용 마크다운으로 변환"""
+    return (
+        f"**{pressure_msg['title']}**\n\n{pressure_msg['message'].strip()}\n\n"
+        f"⚠️ 계속하려면 **'{pressure_msg['blocking_word']}'** 를 입력하세요."
+    )
+
+def render_pattern_warnings(pattern_warnings):
+    """거래 패턴 경고 표시"""
+    if not pattern_warnings:
+        return
+    
+    st.markdown("### 🚨 거래 패턴 경고")
+    for warning in pattern_warnings:
+        if warning['level'] == 'CRITICAL':
+            st.error(f"**🔴 {warning['type']}**: {warning['message']}")
+        elif warning['level'] == 'HIGH':
+            st.warning(f"**🟠 {warning['type']}**: {warning['message']}")
+    st.markdown("---")
+
+def render_pressure_intervention(pressure_msg):
+    """압박 멘트 + 즉시 행동 목록 표시"""
+    st.markdown(f"""
+    <div class="danger-box">
+        <h2 style="color: #dc3545; margin: 0;">{pressure_msg['title']}</h2>
+        {pressure_msg['message']}
+    </div>
+    """, unsafe_allow_html=True)
+    
+    st.markdown("### 💡 지금 당장 해야 할 행동")
+    for action in pressure_msg['actions']:
+        st.markdown(f"- {action}")
+    
+    st.warning(f"⚠️ 계속하려면 **'{pressure_msg['blocking_word']}'** 를 입력하세요.")
+
+@st.cache_resource
+def get_counsel_executor():
+    """게이트에서 미룬 LLM 상담용 프로세스 전역 스레드 풀"""
+    return ThreadPoolExecutor(max_workers=COUNSEL_WORKERS, thread_name_prefix="gini-counsel")
+
+def _deferred_counsel(user_id, messages, user_input, tags, fallback_score, volatility_score, news_score, use_cache):
+    """
+    백그라운드 LLM 상담 - 응답을 끝까지 받아 상담 기록까지 저장
     
-    existing = cur.fetchone()
+    실패는 여기서 기록 (결과를 확인할 세션이 이미 닫혔을 수도 있음)
+    """
+    try:
+        chunks, result = groq_counsel_chat_stream(messages, use_cache=use_cache, fallback_score=fallback_score)
+        for _ in chunks:
+            pass
+        
+        risk = calc_risk_score(result['emotion_score'], volatility_score, news_score)
+        emotion_source = "llm" if result['scored'] else "local"
+        save_chat(user_id, user_input, result['text'], result['emotion_score'], detect_risk_level(risk), tags, risk, emotion_source)
+        schedule_emotion_model_training()
+    except Exception:
+        logger.exception("백그라운드 상담 실패")
+        raise
     
-    if existing:
-        # 카운트 증가
-        cur.execute("""
-        UPDATE addiction_patterns
-        SET pattern_count = pattern_count + 1, last_detected = datetime('now')
-        WHERE id = ?
-        """, (existing[0],))
-    else:
-        # 새 패턴 추가
-        cur.execute("""
-        INSERT INTO addiction_patterns (hour_of_day, day_of_week, investment_purpose)
-        VALUES (?, ?, ?)
-        """, (hour, day_of_week, purpose))
+    return {'text': result['text'], 'risk': risk, 'emotion_score': result['emotion_score']}
+
+def defer_counsel(user_id, messages, user_input, tags, fallback_score, volatility_score, news_score, use_cache=True):
+    """
+    LLM 상담을 백그라운드로 넘기고 바로 반환
     
-    conn.commit()
-    conn.close()
+    Returns:
+        Future: 완료되면 {'text', 'risk', 'emotion_score'} (상담 기록은 이미 저장됨)
+    """
+    return get_counsel_executor().submit(
+        _deferred_counsel, user_id, messages, user_input, tags, fallback_score, volatility_score, news_score, use_cache
+    )
 
-def save_pressure_result(message_type, emotion_tag, user_stopped):
-    """압박 멘트 결과 저장"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
+# ============================================================================
+# 🧠 맥락 기억 시스템 (v4.0)
+# ============================================================================
+
+def _write_dangerous_moment(cur, user_id, risk_score, emotion_tags, user_input):
+    """위험한 순간 INSERT (호출자 트랜잭션 안에서)"""
+    tags_str = ", ".join(emotion_tags) if isinstance(emotion_tags, list) else emotion_tags
     
     cur.execute("""
-    INSERT INTO pressure_messages (message_type, emotion_tag, user_stopped)
-    VALUES (?, ?, ?)
-    """, (message_type, emotion_tag, user_stopped))
-    
-    conn.commit()
-    conn.close()
-
-@st.cache_data(ttl=60)
-def get_user_memory():
-    """사용자 맥락 기억 불러오기"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    
-    memory = {
-        "dangerous_moments": [],
-        "addiction_patterns": [],
-        "pressure_effectiveness": {}
-    }
-    
-    # 1. 가장 위험했던 순간 (최근 5개)
+    INSERT INTO dangerous_moments (user_id, timestamp, risk_score, emotion_tags, user_input)
+    VALUES (?, ?, ?, ?, ?)
+    """, (user_id, utc_timestamp(), risk_score, tags_str, user_input))
+
+def save_dangerous_moment(user_id, risk_score, emotion_tags, user_input):
+    """위험한 순간 기록 (쓰기 큐 경유)"""
+    enqueue_write(_write_dangerous_moment, user_id, risk_score, emotion_tags, user_input)
+
+def _write_addiction_pattern(cur, user_id, hour, day_of_week, purpose):
+    """중독 패턴 UPSERT (호출자 트랜잭션 안에서)"""
+    # 새 패턴 추가, 이미 있으면 카운트 증가 (UNIQUE 인덱스 기반 UPSERT)
     cur.execute("""
-    SELECT timestamp, risk_score, emotion_tags, user_input
-    FROM dangerous_moments
-    ORDER BY risk_score DESC
-    LIMIT 5
-    """)
-    memory["dangerous_moments"] = cur.fetchall()
+    INSERT INTO addiction_patterns (user_id, hour_of_day, day_of_week, investment_purpose, last_detected)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, hour_of_day, day_of_week, investment_purpose) DO UPDATE SET
+        pattern_count = addiction_patterns.pattern_count + 1,
+        last_detected = excluded.last_detected
+    """, (user_id, hour, day_of_week, purpose, utc_timestamp()))
+
+def update_addiction_pattern(user_id, hour, day_of_week, purpose="만회"):
+    """중독 패턴 업데이트 (쓰기 큐 경유)"""
+    enqueue_write(_write_addiction_pattern, user_id, hour, day_of_week, purpose)
+
+def save_pressure_result(user_id, message_type, emotion_tag, user_stopped):
+    """압박 멘트 결과 저장"""
+    with get_connection() as conn:
+        cur = conn.cursor()
     
-    # 2. 중독 패턴 (상위 3개)
-    cur.execute("""
-    SELECT hour_of_day, day_of_week, investment_purpose, pattern_count
-    FROM addiction_patterns
-    ORDER BY pattern_count DESC
-    LIMIT 3
-    """)
-    memory["addiction_patterns"] = cur.fetchall()
+        cur.execute("""
+        INSERT INTO pressure_messages (user_id, message_type, emotion_tag, user_stopped)
+        VALUES (?, ?, ?, ?)
+        """, (user_id, message_type, emotion_tag, user_stopped))
     
-    # 3. 압박 멘트 효과
-    cur.execute("""
-    SELECT emotion_tag, 
-           SUM(CASE WHEN user_stopped = 1 THEN 1 ELSE 0 END) as stopped,
-           COUNT(*) as total
-    FROM pressure_messages
-    GROUP BY emotion_tag
-    """)
+    _invalidate_chat_caches({user_id})
+
+def get_user_memory(user_id):
+    """사용자 맥락 기억 불러오기 (사용자별 캐싱)"""
+    return _get_user_memory(user_id, user_data_version(user_id))
+
+@st.cache_data(ttl=60, max_entries=USER_CACHE_ENTRIES)
+def _get_user_memory(user_id, version):
+    with get_connection() as conn:
+        cur = conn.cursor()
     
-    for row in cur.fetchall():
-        emotion_tag, stopped, total = row
-        memory["pressure_effectiveness"][emotion_tag] = {
-            "stopped": stopped,
-            "total": total,
-            "rate": round(stopped / total * 100, 1) if total > 0 else 0
+        memory = {
+            "dangerous_moments": [],
+            "addiction_patterns": [],
+            "pressure_effectiveness": {}
         }
     
-    conn.close()  
+        # 1. 가장 위험했던 순간 (최근 5개)
+        cur.execute("""
+        SELECT timestamp, risk_score, emotion_tags, user_input
+        FROM dangerous_moments
+        WHERE user_id = ?
+        ORDER BY risk_score DESC
+        LIMIT 5
+        """, (user_id,))
+        memory["dangerous_moments"] = cur.fetchall()
+    
+        # 2. 중독 패턴 (상위 3개)
+        cur.execute("""
+        SELECT hour_of_day, day_of_week, investment_purpose, pattern_count
+        FROM addiction_patterns
+        WHERE user_id = ?
+        ORDER BY pattern_count DESC
+        LIMIT 3
+        """, (user_id,))
+        memory["addiction_patterns"] = cur.fetchall()
+    
+        # 3. 압박 멘트 효과
+        cur.execute("""
+        SELECT emotion_tag, 
+               SUM(CASE WHEN user_stopped = 1 THEN 1 ELSE 0 END) as stopped,
+               COUNT(*) as total
+        FROM pressure_messages
+        WHERE user_id = ?
+        GROUP BY emotion_tag
+        """, (user_id,))
+    
+        for row in cur.fetchall():
+            emotion_tag, stopped, total = row
+            memory["pressure_effectiveness"][emotion_tag] = {
+                "stopped": stopped,
+                "total": total,
+                "rate": round(stopped / total * 100, 1) if total > 0 else 0
+            }
     return memory
 
 # ============================================================================
 # 📊 대시보드 시각화 함수 (v4.1)
 # ============================================================================
 
-def create_emotion_heatmap():
-    """감정 히트맵 생성 (요일 × 시간대)"""
-    import plotly.graph_objects as go
-    import numpy as np
-    
-    conn = sqlite3.connect("gini.db", check_same_thread=False)  
-    # 시간대별, 요일별 감정 점수 조회
-    cur.execute("""
-    SELECT 
-        CAST(strftime('%w', timestamp) AS INTEGER) as day_of_week,
-        CAST(strftime('%H', timestamp) AS INTEGER) as hour,
-        AVG(emotion_score) as avg_emotion
-    FROM chats
-    WHERE emotion_score IS NOT NULL
-    GROUP BY day_of_week, hour
-    """)
+FIGURE_CACHE_MAX_ENTRIES = 3 * USER_CACHE_ENTRIES   # (차트, 사용자)별 Figure 최대 보관 수
+
+@st.cache_resource
+def get_figure_cache():
+    """
+    프로세스 전역 Figure 캐시 ((차트, 사용자) → (원본 데이터, Figure)) + 적중/실패 지표
     
-    data = cur.fetchall()
-    conn.close()
+    - 조회 데이터는 사용자 데이터 버전(save_chat 등 쓰기마다 증가)으로 캐싱,
+      Figure는 그 데이터가 지난번과 다를 때만 다시 생성 → 바뀐 차트만 재계산
+    - Figure 객체를 그대로 보관: JSON/pickle에서 되살리면 plotly 검증 때문에 새로 만드는 것보다 느림
+    - 여러 세션이 같은 객체를 공유하므로 꺼낸 Figure는 수정하지 않음
+    """
+    return {
+        'lock': threading.Lock(),
+        'entries': OrderedDict(),
+        'hits': 0,
+        'misses': 0
+    }
+
+def _chart_figure(chart, user_id, load_data, build, timings=None):
+    """
+    차트 데이터 조회 → 같은 데이터로 만든 Figure가 있으면 재사용, 없으면 build(data)
     
+    timings(dict)를 넘기면 timings[chart]에 {'data_ms', 'figure_ms', 'cached'} 기록
+    """
+    cache = get_figure_cache()
+    key = (chart, user_id)
+    
+    started = time.perf_counter()
+    data = load_data(user_id, user_data_version(user_id))
+    loaded = time.perf_counter()
+    
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        cached = entry is not None and entry[0] == data
+        if cached:
+            cache['entries'].move_to_end(key)
+            cache['hits'] += 1
+            fig = entry[1]
+    
+    if not cached:
+        fig = build(data)
+        with cache['lock']:
+            cache['entries'][key] = (data, fig)
+            cache['entries'].move_to_end(key)
+            cache['misses'] += 1
+            while len(cache['entries']) > FIGURE_CACHE_MAX_ENTRIES:
+                cache['entries'].popitem(last=False)
+    
+    if timings is not None:
+        timings[chart] = {
+            'data_ms': (loaded - started) * 1000,
+            'figure_ms': (time.perf_counter() - loaded) * 1000,
+            'cached': cached
+        }
+    return fig
+
+@st.cache_data(ttl=30, max_entries=USER_CACHE_ENTRIES)  # 30초 캐싱
+def _emotion_heatmap_data(user_id, version):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        # 시간대별, 요일별 감정 점수 조회 (집계 테이블, 최대 168행)
+        cur.execute("""
+        SELECT day_of_week, hour, emotion_sum / emotion_count as avg_emotion
+        FROM chat_emotion_grid
+        WHERE user_id = ? AND emotion_count > 0
+        ORDER BY day_of_week, hour
+        """, (user_id,))
+        return tuple(tuple(row) for row in cur.fetchall())
+
+def _build_emotion_heatmap(data):
     # 히트맵 데이터 생성 (7일 × 24시간)
     heatmap_data = np.zeros((7, 24))
     
@@ -1040,31 +3643,31 @@ def create_emotion_heatmap():
     
     return fig
 
-def create_risk_timeline():
-    """위험지표 시간별 추이"""
-    import plotly.express as px
-    
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    
-    cur.execute("""
-    SELECT timestamp, emotion_score
-    FROM chats
-    WHERE emotion_score IS NOT NULL
-    ORDER BY timestamp
-    LIMIT 50
-    """)
-    
-    data = cur.fetchall()
-    conn.close()
+def create_emotion_heatmap(user_id, timings=None):
+    """감정 히트맵 생성 (요일 × 시간대)"""
+    return _chart_figure('heatmap', user_id, _emotion_heatmap_data, _build_emotion_heatmap, timings)
+
+@st.cache_data(ttl=30, max_entries=USER_CACHE_ENTRIES)  # 30초 캐싱
+def _risk_timeline_data(user_id, version):
+    with get_connection() as conn:
+        cur = conn.cursor()
     
+        cur.execute("""
+        SELECT timestamp, emotion_score
+        FROM chats
+        WHERE user_id = ? AND emotion_score IS NOT NULL
+        ORDER BY timestamp
+        LIMIT 50
+        """, (user_id,))
+        return tuple(tuple(row) for row in cur.fetchall())
+
+def _build_risk_timeline(data):
     if not data:
         return None
     
     timestamps = [row[0] for row in data]
     scores = [row[1] for row in data]
     
-    import pandas as pd
     df = pd.DataFrame({
         '시간': timestamps,
         '감정점수': scores
@@ -1084,39 +3687,30 @@ def create_risk_timeline():
     
     return fig
 
-def create_emotion_tag_chart():
-    """감정 태그 빈도 차트"""
-    import plotly.express as px
-    
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    
-    cur.execute("""
-    SELECT tags
-    FROM chats
-    WHERE tags IS NOT NULL AND tags != '중립'
-    """)
-    
-    rows = cur.fetchall()
-    conn.close()
-    
-    # 태그 카운트
-    tag_counts = {}
-    for row in rows:
-        tags = row[0].split(', ')
-        for tag in tags:
-            tag = tag.strip()
-            if tag and tag != '중립':
-                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+def create_risk_timeline(user_id, timings=None):
+    """위험지표 시간별 추이"""
+    return _chart_figure('timeline', user_id, _risk_timeline_data, _build_risk_timeline, timings)
+
+@st.cache_data(ttl=30, max_entries=USER_CACHE_ENTRIES)  # 30초 캐싱
+def _emotion_tag_data(user_id, version):
+    with get_connection() as conn:
+        cur = conn.cursor()
     
-    if not tag_counts:
+        # 상위 10개 (집계 테이블)
+        cur.execute("""
+        SELECT tag, tag_count
+        FROM chat_tag_counts
+        WHERE user_id = ? AND tag_count > 0
+        ORDER BY tag_count DESC, tag
+        LIMIT 10
+        """, (user_id,))
+        return tuple(tuple(row) for row in cur.fetchall())
+
+def _build_emotion_tag_chart(data):
+    if not data:
         return None
     
-    # 상위 10개
-    sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    import pandas as pd
-    df = pd.DataFrame(sorted_tags, columns=['감정태그', '빈도'])
+    df = pd.DataFrame(list(data), columns=['감정태그', '빈도'])
     
     fig = px.bar(df, x='감정태그', y='빈도',
                  title='🏷️ 감정 태그 빈도 (상위 10개)',
@@ -1127,75 +3721,100 @@ def create_emotion_tag_chart():
     
     return fig
 
-def get_dashboard_stats():
-    """대시보드 통계 데이터"""
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    
-    stats = {}
-    
-    # 총 상담 횟수
-    cur.execute("SELECT COUNT(*) FROM chats")
-    stats['total_chats'] = cur.fetchone()[0]
-    
-    # 평균 감정 점수
-    cur.execute("SELECT AVG(emotion_score) FROM chats WHERE emotion_score IS NOT NULL")
-    avg_emotion = cur.fetchone()[0]
-    stats['avg_emotion'] = round(avg_emotion, 2) if avg_emotion else 0
-    
-    # 고위험 상담 횟수
-    cur.execute("SELECT COUNT(*) FROM chats WHERE risk_level = 'HIGH'")
-    stats['high_risk_count'] = cur.fetchone()[0]
-    
-    # 최근 7일 상담 횟수
-    cur.execute("""
-    SELECT COUNT(*) FROM chats 
-    WHERE timestamp >= datetime('now', '-7 days')
-    """)
-    stats['week_chats'] = cur.fetchone()[0]
-    
-    # 가장 많이 나온 감정 태그
-    cur.execute("""
-    SELECT tags FROM chats 
-    WHERE tags IS NOT NULL AND tags != '중립'
-    """)
+def create_emotion_tag_chart(user_id, timings=None):
+    """감정 태그 빈도 차트"""
+    return _chart_figure('tags', user_id, _emotion_tag_data, _build_emotion_tag_chart, timings)
+
+def format_chart_timing(timing, render_ms):
+    """차트별 소요 시간 캡션 (조회 / Figure 생성 또는 재사용 / 화면 전송)"""
+    figure = "재사용" if timing['cached'] else "새로 생성"
+    return (f"⏱️ 조회 {timing['data_ms']:.1f}ms · Figure {figure} {timing['figure_ms']:.1f}ms"
+            f" · 렌더 {render_ms:.1f}ms")
+
+def get_dashboard_stats(user_id):
+    """대시보드 통계 데이터 (집계 테이블 기반)"""
+    with get_connection() as conn:
+        cur = conn.cursor()
     
-    all_tags = []
-    for row in cur.fetchall():
-        tags = row[0].split(', ')
-        all_tags.extend([t.strip() for t in tags if t.strip() and t.strip() != '중립'])
+        stats = {}
     
-    if all_tags:
-        from collections import Counter
-        most_common = Counter(all_tags).most_common(1)[0]
-        stats['most_common_tag'] = most_common[0]
-        stats['most_common_count'] = most_common[1]
-    else:
-        stats['most_common_tag'] = '없음'
-        stats['most_common_count'] = 0
+        # 총 상담 횟수 / 평균 감정 점수 / 고위험 상담 횟수
+        cur.execute("""
+        SELECT total_chats, emotion_sum, emotion_count, high_risk_count
+        FROM chat_totals WHERE user_id = ?
+        """, (user_id,))
+        total_chats, emotion_sum, emotion_count, high_risk_count = cur.fetchone() or (0, 0, 0, 0)
+        stats['total_chats'] = total_chats
+        stats['avg_emotion'] = round(emotion_sum / emotion_count, 2) if emotion_count else 0
+        stats['high_risk_count'] = high_risk_count
+    
+        # 최근 7일 상담 횟수
+        cur.execute("""
+        SELECT COUNT(*) FROM chats 
+        WHERE user_id = ? AND timestamp >= ?
+        """, (user_id, utc_timestamp(timedelta(days=-7))))
+        stats['week_chats'] = cur.fetchone()[0]
     
-    conn.close()
+        # 가장 많이 나온 감정 태그
+        cur.execute("""
+        SELECT tag, tag_count FROM chat_tag_counts
+        WHERE user_id = ? AND tag_count > 0
+        ORDER BY tag_count DESC
+        LIMIT 1
+        """, (user_id,))
+        most_common = cur.fetchone()
+    
+        if most_common:
+            stats['most_common_tag'] = most_common[0]
+            stats['most_common_count'] = most_common[1]
+        else:
+            stats['most_common_tag'] = '없음'
+            stats['most_common_count'] = 0
     return stats
 
 # ============================================================================
 # 🎯 위험지표 고도화 - 거래 패턴 분석 (v4.2)
 # ============================================================================
 
-def detect_overtrading():
+PATTERN_WINDOW_DAYS = 3     # 과매매 판단 기간 (일)
+PATTERN_RECENT_LIMIT = 5    # 복수매매/연속손실/FOMO 판단에 쓰는 최근 상담 수
+
+def load_pattern_window(user_id):
+    """
+    패턴 분석용 상담 구간 1회 조회 (최신순)
+    
+    - 최근 PATTERN_WINDOW_DAYS일 상담 + 최근 PATTERN_RECENT_LIMIT개 상담
+    - 각 행: (emotion_score, timestamp, user_input, in_window, id)
+    - 두 조건을 UNION으로 나눠 각각 (user_id, timestamp) 인덱스 탐색
+    """
+    window = utc_timestamp(timedelta(days=-PATTERN_WINDOW_DAYS))
+    
+    # 방금 저장한 상담까지 포함해야 함 (이 사용자의 쓰기가 큐에 있을 때만 대기)
+    flush_writes(user_id)
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+        SELECT emotion_score, timestamp, user_input, 1 AS in_window, id
+        FROM chats
+        WHERE user_id = ? AND timestamp >= ?
+        UNION
+        SELECT emotion_score, timestamp, user_input,
+               CASE WHEN timestamp >= ? THEN 1 ELSE 0 END AS in_window, id
+        FROM (SELECT * FROM chats WHERE user_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?)
+        ORDER BY timestamp DESC, id DESC
+        """, (user_id, window, window, user_id, PATTERN_RECENT_LIMIT))
+        return cur.fetchall()
+
+def detect_overtrading(user_id, recent_chats=None):
     """
     과매매 감지
     - 최근 3일 내 5회 이상 상담 → 과매매 의심
     """
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    
-    cur.execute("""
-    SELECT COUNT(*) FROM chats
-    WHERE timestamp >= datetime('now', '-3 days')
-    """)
+    if recent_chats is None:
+        recent_chats = load_pattern_window(user_id)
     
-    recent_count = cur.fetchone()[0]
-    conn.close()
+    recent_count = sum(1 for row in recent_chats if row[3])
     
     if recent_count >= 5:
         return {
@@ -1206,37 +3825,25 @@ def detect_overtrading():
     
     return {'detected': False, 'count': recent_count}
 
-def detect_revenge_trading():
+def detect_revenge_trading(user_id, recent_chats=None):
     """
     복수 매매 감지
     - 손실 후 즉시(1시간 내) 재상담 → 복수 매매 의심
     """
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
+    if recent_chats is None:
+        recent_chats = load_pattern_window(user_id)
     
-    # 최근 2개 상담 조회
-    cur.execute("""
-    SELECT emotion_score, timestamp, user_input
-    FROM chats
-    ORDER BY timestamp DESC
-    LIMIT 2
-    """)
-    
-    recent_chats = cur.fetchall()
-    conn.close()
+    # 최근 2개 상담
+    recent_chats = recent_chats[:2]
     
     if len(recent_chats) < 2:
         return {'detected': False}
     
     # 첫 번째 상담에 "손실", "떨어", "손해" 키워드 있고
     # 두 번째 상담이 1시간 이내면 복수 매매
-    first_input = recent_chats[0][2].lower()
-    loss_keywords = ["손실", "떨어", "손해", "마이너스", "잃", "-"]
-    
-    has_loss = any(keyword in first_input for keyword in loss_keywords)
+    has_loss = tag_text(recent_chats[0][2])['counts']['revenge_loss'] > 0
     
     if has_loss and len(recent_chats) >= 2:
-        from datetime import datetime
         time1 = datetime.fromisoformat(recent_chats[0][1])
         time2 = datetime.fromisoformat(recent_chats[1][1])
         time_diff = abs((time1 - time2).total_seconds() / 3600)  # 시간 단위
@@ -1250,28 +3857,20 @@ def detect_revenge_trading():
     
     return {'detected': False}
 
-def detect_loss_pattern():
+def detect_loss_pattern(user_id, recent_chats=None):
     """
     연속 손실 패턴 감지
     - 최근 5회 상담 중 3회 이상 "손실" 관련 → 악순환 경고
     """
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    
-    cur.execute("""
-    SELECT user_input FROM chats
-    ORDER BY timestamp DESC
-    LIMIT 5
-    """)
+    if recent_chats is None:
+        recent_chats = load_pattern_window(user_id)
     
-    recent_inputs = [row[0].lower() for row in cur.fetchall()]
-    conn.close()
+    recent_inputs = [row[2] for row in recent_chats[:5]]
     
     if not recent_inputs:
         return {'detected': False}
     
-    loss_keywords = ["손실", "떨어", "손해", "마이너스", "잃", "물렸"]
-    loss_count = sum(1 for inp in recent_inputs if any(kw in inp for kw in loss_keywords))
+    loss_count = sum(1 for inp in recent_inputs if tag_text(inp)['counts']['loss_streak'])
     
     if loss_count >= 3:
         return {
@@ -1282,28 +3881,20 @@ def detect_loss_pattern():
     
     return {'detected': False, 'count': loss_count}
 
-def detect_fomo_pattern():
+def detect_fomo_pattern(user_id, recent_chats=None):
     """
     FOMO 연속 패턴 감지
     - 최근 3회 상담에 "급등", "올라", "놓쳤" 등 → FOMO 중독
     """
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
+    if recent_chats is None:
+        recent_chats = load_pattern_window(user_id)
     
-    cur.execute("""
-    SELECT user_input FROM chats
-    ORDER BY timestamp DESC
-    LIMIT 3
-    """)
-    
-    recent_inputs = [row[0].lower() for row in cur.fetchall()]
-    conn.close()
+    recent_inputs = [row[2] for row in recent_chats[:3]]
     
     if not recent_inputs:
         return {'detected': False}
     
-    fomo_keywords = ["급등", "올라", "놓쳤", "남들", "다들", "나만", "뒤쳐"]
-    fomo_count = sum(1 for inp in recent_inputs if any(kw in inp for kw in fomo_keywords))
+    fomo_count = sum(1 for inp in recent_inputs if tag_text(inp)['counts']['fomo_streak'])
     
     if fomo_count >= 2:
         return {
@@ -1314,14 +3905,49 @@ def detect_fomo_pattern():
     
     return {'detected': False}
 
-def get_trading_pattern_warnings():
+def analyze_trading_patterns(user_id, pending_input=None):
+    """
+    거래 패턴 엔진 - 최근 상담 구간을 한 번만 조회하고 4개 감지기를 한 번에 평가
+    
+    Args:
+        pending_input: 아직 저장 전인 이번 메시지 (LLM 호출 전 게이트) - 가장 최근 상담으로 넣어 평가
+    
+    Returns:
+        dict: {overtrading, revenge, loss_streak, fomo} 각 감지 결과
+              (상담 탭 경고와 주간 리포트가 함께 재사용)
+    """
+    if pending_input is not None:
+        recent_chats = [(None, utc_timestamp(), pending_input, 1, None)] + load_pattern_window(user_id)
+        return _evaluate_trading_patterns(user_id, recent_chats)
+    
+    # 캐시 키(버전)를 읽기 전에 대기 중인 쓰기를 커밋 → 방금 저장한 상담이 있으면 버전이 바뀌어 재계산
+    flush_writes(user_id)
+    return _analyze_trading_patterns(user_id, user_data_version(user_id))
+
+@st.cache_data(ttl=30, max_entries=USER_CACHE_ENTRIES)  # 30초 캐싱 (save_chat 시 해당 사용자만 무효화)
+def _analyze_trading_patterns(user_id, version):
+    return _evaluate_trading_patterns(user_id, load_pattern_window(user_id))
+
+def _evaluate_trading_patterns(user_id, recent_chats):
+    """load_pattern_window 형식의 상담 구간(최신순)에 4개 감지기 적용"""
+    return {
+        'overtrading': detect_overtrading(user_id, recent_chats),
+        'revenge': detect_revenge_trading(user_id, recent_chats),
+        'loss_streak': detect_loss_pattern(user_id, recent_chats),
+        'fomo': detect_fomo_pattern(user_id, recent_chats)
+    }
+
+def get_trading_pattern_warnings(user_id, patterns=None):
     """
     모든 거래 패턴 경고 통합
     """
+    if patterns is None:
+        patterns = analyze_trading_patterns(user_id)
+    
     warnings = []
     
     # 1. 과매매
-    overtrading = detect_overtrading()
+    overtrading = patterns['overtrading']
     if overtrading['detected']:
         warnings.append({
             'type': '과매매',
@@ -1330,7 +3956,7 @@ def get_trading_pattern_warnings():
         })
     
     # 2. 복수 매매
-    revenge = detect_revenge_trading()
+    revenge = patterns['revenge']
     if revenge['detected']:
         warnings.append({
             'type': '복수매매',
@@ -1339,7 +3965,7 @@ def get_trading_pattern_warnings():
         })
     
     # 3. 연속 손실
-    loss = detect_loss_pattern()
+    loss = patterns['loss_streak']
     if loss['detected']:
         warnings.append({
             'type': '연속손실',
@@ -1348,7 +3974,7 @@ def get_trading_pattern_warnings():
         })
     
     # 4. FOMO 중독
-    fomo = detect_fomo_pattern()
+    fomo = patterns['fomo']
     if fomo['detected']:
         warnings.append({
             'type': 'FOMO중독',
@@ -1362,115 +3988,107 @@ def get_trading_pattern_warnings():
 # 📝 주간 리포트 생성 (v4.3)
 # ============================================================================
 
-def generate_weekly_report():
+def generate_weekly_report(user_id, patterns=None):
     """
     주간 리포트 데이터 생성
-    """
-    from datetime import datetime, timedelta
-    
-    conn = sqlite3.connect("gini.db", check_same_thread=False)
-    cur = conn.cursor()
-    
-    # 지난 7일 날짜
-    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
-    
-    report = {
-        'period': f"{(datetime.now() - timedelta(days=7)).strftime('%Y.%m.%d')} ~ {datetime.now().strftime('%Y.%m.%d')}",
-        'generated_at': datetime.now().strftime('%Y년 %m월 %d일 %H:%M')
-    }
-    
-    # 1. 기본 통계
-    cur.execute(f"""
-    SELECT COUNT(*) FROM chats
-    WHERE timestamp >= '{week_ago}'
-    """)
-    report['total_chats'] = cur.fetchone()[0]
     
-    # 2. 평균 감정 점수
-    cur.execute(f"""
-    SELECT AVG(emotion_score) FROM chats
-    WHERE timestamp >= '{week_ago}' AND emotion_score IS NOT NULL
-    """)
-    avg_emotion = cur.fetchone()[0]
-    report['avg_emotion'] = round(avg_emotion, 2) if avg_emotion else 0
-    
-    # 3. 고위험 상담 횟수
-    cur.execute(f"""
-    SELECT COUNT(*) FROM chats
-    WHERE timestamp >= '{week_ago}' AND risk_level = 'HIGH'
-    """)
-    report['high_risk_count'] = cur.fetchone()[0]
+    Args:
+        user_id: 리포트 대상 사용자
+        patterns: analyze_trading_patterns() 결과 (없으면 새로 분석)
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
     
-    # 4. 가장 많이 나온 감정 태그
-    cur.execute(f"""
-    SELECT tags FROM chats
-    WHERE timestamp >= '{week_ago}' AND tags IS NOT NULL AND tags != '중립'
-    """)
+        # 지난 7일 (timestamp 컬럼은 UTC, 화면 표시는 KST)
+        week_ago = utc_timestamp(timedelta(days=-7))
+        now = now_kst()
     
-    all_tags = []
-    for row in cur.fetchall():
-        tags = row[0].split(', ')
-        all_tags.extend([t.strip() for t in tags if t.strip() and t.strip() != '중립'])
+        report = {
+            'period': f"{(now - timedelta(days=7)).strftime('%Y.%m.%d')} ~ {now.strftime('%Y.%m.%d')}",
+            'generated_at': now.strftime('%Y년 %m월 %d일 %H:%M')
+        }
     
-    if all_tags:
-        from collections import Counter
-        top_tags = Counter(all_tags).most_common(3)
-        report['top_tags'] = [{'tag': tag, 'count': count} for tag, count in top_tags]
-    else:
-        report['top_tags'] = []
+        # 1. 기본 통계
+        cur.execute("""
+        SELECT COUNT(*) FROM chats
+        WHERE user_id = ? AND timestamp >= ?
+        """, (user_id, week_ago))
+        report['total_chats'] = cur.fetchone()[0]
     
-    # 5. 가장 위험했던 순간
-    cur.execute(f"""
-    SELECT timestamp, emotion_score, user_input
-    FROM chats
-    WHERE timestamp >= '{week_ago}' AND emotion_score IS NOT NULL
-    ORDER BY emotion_score DESC
-    LIMIT 1
-    """)
+        # 2. 평균 감정 점수
+        cur.execute("""
+        SELECT AVG(emotion_score) FROM chats
+        WHERE user_id = ? AND timestamp >= ? AND emotion_score IS NOT NULL
+        """, (user_id, week_ago))
+        avg_emotion = cur.fetchone()[0]
+        report['avg_emotion'] = round(avg_emotion, 2) if avg_emotion else 0
     
-    dangerous = cur.fetchone()
-    if dangerous:
-        report['most_dangerous'] = {
-            'time': dangerous[0],
-            'score': round(dangerous[1], 1),
-            'input': dangerous[2][:50] + '...' if len(dangerous[2]) > 50 else dangerous[2]
-        }
-    else:
-        report['most_dangerous'] = None
-    
-    # 6. 거래 패턴 분석
-    report['patterns'] = {
-        'overtrading': detect_overtrading()['detected'],
-        'revenge': detect_revenge_trading()['detected'],
-        'loss_streak': detect_loss_pattern()['detected'],
-        'fomo': detect_fomo_pattern()['detected']
-    }
+        # 3. 고위험 상담 횟수 (detect_risk_level은 소문자 'high'를 저장 → 대소문자 무시 비교)
+        cur.execute("""
+        SELECT COUNT(*) FROM chats
+        WHERE user_id = ? AND timestamp >= ? AND UPPER(risk_level) = 'HIGH'
+        """, (user_id, week_ago))
+        report['high_risk_count'] = cur.fetchone()[0]
     
-    # 7. 요일별 상담 횟수
-    cur.execute(f"""
-    SELECT CAST(strftime('%w', timestamp) AS INTEGER) as day, COUNT(*)
-    FROM chats
-    WHERE timestamp >= '{week_ago}'
-    GROUP BY day
-    ORDER BY day
-    """)
+        # 4. 가장 많이 나온 감정 태그
+        cur.execute("""
+        SELECT tag, COUNT(*) as tag_count
+        FROM chat_tags
+        WHERE user_id = ? AND timestamp >= ?
+        GROUP BY tag
+        ORDER BY tag_count DESC
+        LIMIT 3
+        """, (user_id, week_ago))
     
-    days_data = cur.fetchall()
-    days_map = {0: '일', 1: '월', 2: '화', 3: '수', 4: '목', 5: '금', 6: '토'}
-    report['by_day'] = [{'day': days_map.get(day, '?'), 'count': count} for day, count in days_data]
-    
-    # 8. 평가
-    if report['avg_emotion'] >= 7:
-        report['grade'] = '🔴 위험'
-        report['comment'] = '이번 주는 매우 불안정했습니다. 투자를 멈추고 휴식이 필요합니다.'
-    elif report['avg_emotion'] >= 5.5:
-        report['grade'] = '🟡 주의'
-        report['comment'] = '감정 기복이 있었습니다. 더 신중한 접근이 필요합니다.'
-    else:
-        report['grade'] = '🟢 안정'
-        report['comment'] = '비교적 안정적인 한 주를 보냈습니다. 이 상태를 유지하세요!'
+        report['top_tags'] = [{'tag': tag, 'count': count} for tag, count in cur.fetchall()]
     
-    conn.close()
+        # 5. 가장 위험했던 순간
+        cur.execute("""
+        SELECT timestamp, emotion_score, user_input
+        FROM chats
+        WHERE user_id = ? AND timestamp >= ? AND emotion_score IS NOT NULL
+        ORDER BY emotion_score DESC
+        LIMIT 1
+        """, (user_id, week_ago))
+    
+        dangerous = cur.fetchone()
+        if dangerous:
+            report['most_dangerous'] = {
+                'time': dangerous[0],
+                'score': round(dangerous[1], 1),
+                'input': dangerous[2][:50] + '...' if len(dangerous[2]) > 50 else dangerous[2]
+            }
+        else:
+            report['most_dangerous'] = None
+    
+        # 6. 거래 패턴 분석
+        if patterns is None:
+            patterns = analyze_trading_patterns(user_id)
+        report['patterns'] = {name: result['detected'] for name, result in patterns.items()}
+    
+        # 7. 요일별 상담 횟수
+        cur.execute(f"""
+        SELECT {sql_weekday('timestamp')} as day, COUNT(*)
+        FROM chats
+        WHERE user_id = ? AND timestamp >= ?
+        GROUP BY day
+        ORDER BY day
+        """, (user_id, week_ago))
+    
+        days_data = cur.fetchall()
+        days_map = {0: '일', 1: '월', 2: '화', 3: '수', 4: '목', 5: '금', 6: '토'}
+        report['by_day'] = [{'day': days_map.get(day, '?'), 'count': count} for day, count in days_data]
+    
+        # 8. 평가
+        if report['avg_emotion'] >= 7:
+            report['grade'] = '🔴 위험'
+            report['comment'] = '이번 주는 매우 불안정했습니다. 투자를 멈추고 휴식이 필요합니다.'
+        elif report['avg_emotion'] >= 5.5:
+            report['grade'] = '🟡 주의'
+            report['comment'] = '감정 기복이 있었습니다. 더 신중한 접근이 필요합니다.'
+        else:
+            report['grade'] = '🟢 안정'
+            report['comment'] = '비교적 안정적인 한 주를 보냈습니다. 이 상태를 유지하세요!'
     return report
 
 def create_report_text(report):
@@ -1598,6 +4216,219 @@ def get_strong_warning(risk_level):
     else:
         return ""
 
+# ============================================================================
+# 🔌 LLM 클라이언트 (연결 재사용 + 재시도 + 회로 차단기)
+# ============================================================================
+
+class LLMUnavailableError(RuntimeError):
+    """회로 차단기가 열려 있어 LLM 호출을 건너뜀"""
+
+@st.cache_resource
+def get_llm_client(api_key, base_url=None):
+    """
+    프로세스 전역 Groq 클라이언트 (API 키별 1개)
+    
+    - keep-alive 연결 풀을 재사용해 매 턴 TCP/TLS 연결을 새로 맺지 않음
+    - 재시도는 call_llm_with_retry가 담당하므로 SDK 자체 재시도는 끔
+    """
+    import httpx
+    
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+    )
+    return Groq(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+@st.cache_resource
+def get_llm_breaker():
+    """프로세스 전역 회로 차단기 상태"""
+    return {'lock': threading.Lock(), 'failures': 0, 'opened_at': None, 'probing': False}
+
+def _is_retryable_llm_error(error):
+    """재시도 대상: 429, 5xx, 연결/타임아웃 오류"""
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+def _retry_after_seconds(error):
+    """429 응답의 Retry-After 헤더 (초), 없으면 None"""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def _breaker_allows_call(breaker):
+    """닫힘 → 통과, 열림 → 쿨다운 후 시험 호출 1건만 통과"""
+    with breaker['lock']:
+        if breaker['opened_at'] is None:
+            return True
+        if breaker['probing'] or time.monotonic() - breaker['opened_at'] < LLM_BREAKER_COOLDOWN:
+            return False
+        breaker['probing'] = True
+        return True
+
+def _breaker_record(breaker, success):
+    """호출 결과 반영 (성공 시 닫힘, 연속 실패 누적 시 열림)"""
+    with breaker['lock']:
+        breaker['probing'] = False
+        if success:
+            breaker['failures'] = 0
+            breaker['opened_at'] = None
+        else:
+            breaker['failures'] += 1
+            if breaker['failures'] >= LLM_BREAKER_THRESHOLD or breaker['opened_at'] is not None:
+                breaker['opened_at'] = time.monotonic()
+
+def call_llm_with_retry(request):
+    """
+    LLM 요청 실행 (429/5xx/연결 오류는 지수 백오프 + 지터로 재시도)
+    
+    Args:
+        request: 인자 없는 호출 함수 (예: lambda: client.chat.completions.create(...))
+    
+    Raises:
+        LLMUnavailableError: 회로 차단기가 열려 있을 때 (즉시 실패)
+    """
+    breaker = get_llm_breaker()
+    
+    if not _breaker_allows_call(breaker):
+        raise LLMUnavailableError("AI 서버 응답이 불안정해 잠시 상담을 쉬고 있습니다. 잠시 후 다시 시도해주세요.")
+    
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            result = request()
+        except Exception as e:
+            if not _is_retryable_llm_error(e):
+                _breaker_record(breaker, success=True)  # 4xx는 서버 장애가 아님
+                raise
+            
+            _breaker_record(breaker, success=False)
+            if attempt == LLM_MAX_RETRIES or not _breaker_allows_call(breaker):
+                raise
+            
+            # full jitter: 0 ~ min(상한, 시작값 × 2^시도)
+            delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+            time.sleep(max(delay, _retry_after_seconds(e) or 0))
+            continue
+        
+        _breaker_record(breaker, success=True)
+        return result
+
+# ============================================================================
+# 🧠 LLM 응답 캐시 (메모리 LRU + SQLite, TTL)
+# ============================================================================
+
+@st.cache_resource
+def get_llm_cache():
+    """프로세스 전역 LRU 캐시 + 적중/실패 지표"""
+    return {
+        'lock': threading.Lock(),
+        'entries': OrderedDict(),   # key → (response, emotion_score, created_at)
+        'hits': 0,
+        'misses': 0,
+        'evictions': 0
+    }
+
+def _normalize_cache_text(text):
+    """캐시 키용 정규화 (유니코드 NFC, 소문자, 연속 공백 1칸)"""
+    text = unicodedata.normalize('NFC', text or '')
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+def llm_cache_key(messages):
+    """System Prompt + 최근 대화 메시지 → SHA-256 키"""
+    normalized = [(msg['role'], _normalize_cache_text(msg['content'])) for msg in messages]
+    payload = json.dumps(normalized, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def llm_cache_get(key):
+    """캐시 조회 → (response, emotion_score) 또는 None"""
+    cache = get_llm_cache()
+    now = time.time()
+    
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        if entry and now - entry[2] < LLM_CACHE_TTL:
+            cache['entries'].move_to_end(key)
+            cache['hits'] += 1
+            return entry[0], entry[1]
+        if entry:
+            del cache['entries'][key]
+    
+    row = None
+    if LLM_CACHE_PERSIST:
+        with get_connection() as conn:
+            row = conn.execute("""
+            SELECT response, emotion_score, created_at FROM llm_cache
+            WHERE cache_key = ? AND created_at >= ?
+            """, (key, now - LLM_CACHE_TTL)).fetchone()
+    
+    with cache['lock']:
+        if row is None:
+            cache['misses'] += 1
+            return None
+        cache['hits'] += 1
+        _llm_cache_store(cache, key, row)
+        return row[0], row[1]
+
+def _llm_cache_store(cache, key, entry):
+    """메모리 LRU에 저장 (크기 초과 시 가장 오래 안 쓴 항목 제거, lock 안에서 호출)"""
+    cache['entries'][key] = entry
+    cache['entries'].move_to_end(key)
+    while len(cache['entries']) > LLM_CACHE_MAX_ENTRIES:
+        cache['entries'].popitem(last=False)
+        cache['evictions'] += 1
+
+def llm_cache_put(key, response, emotion_score):
+    """캐시 저장 (메모리 + SQLite, 영구 저장분도 만료/개수 한도 정리)"""
+    cache = get_llm_cache()
+    created_at = time.time()
+    
+    with cache['lock']:
+        _llm_cache_store(cache, key, (response, emotion_score, created_at))
+    
+    if LLM_CACHE_PERSIST:
+        with get_connection() as conn:
+            conn.execute("""
+            INSERT INTO llm_cache (cache_key, response, emotion_score, created_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (cache_key) DO UPDATE SET
+                response = excluded.response, emotion_score = excluded.emotion_score, created_at = excluded.created_at
+            """, (key, response, emotion_score, created_at))
+            # 만료분 + 최신 N개 밖의 항목 삭제 (N+1번째 항목의 시각 이하)
+            conn.execute("""
+            DELETE FROM llm_cache
+            WHERE created_at < ?
+               OR created_at <= (
+                   SELECT created_at FROM llm_cache
+                   ORDER BY created_at DESC
+                   LIMIT 1 OFFSET ?
+               )
+            """, (created_at - LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES * 10))
+
+def clear_llm_cache():
+    """LLM 응답 캐시 전체 비우기"""
+    cache = get_llm_cache()
+    with cache['lock']:
+        cache['entries'].clear()
+    
+    if LLM_CACHE_PERSIST:
+        with get_connection() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+def get_llm_cache_stats():
+    """캐시 지표 (적중/실패/적중률/제거/크기)"""
+    cache = get_llm_cache()
+    with cache['lock']:
+        total = cache['hits'] + cache['misses']
+        return {
+            'hits': cache['hits'],
+            'misses': cache['misses'],
+            'hit_rate': round(cache['hits'] / total * 100, 1) if total else 0.0,
+            'evictions': cache['evictions'],
+            'size': len(cache['entries'])
+        }
+
 # ============================================================================
 # 🤖 Groq 상담 함수
 # ============================================================================
@@ -1644,6 +4475,128 @@ def build_guardian_system_prompt():
     
     return prompt
 
+EMOTION_TAG_PATTERN = re.compile(r'\[감정점수[:\s]*(\d+(?:\.\d+)?)\]')
+EMOTION_TAG_PREFIX = '[감정점수'
+EMOTION_TAG_MAX_LEN = 24    # '[감정점수: 10.0]' 등 태그 최대 길이 여유분
+
+def extract_emotion_score(full_response):
+    """응답에서 [감정점수: X] 추출/제거 → (본문, 점수)"""
+    emotion_match = EMOTION_TAG_PATTERN.search(full_response)
+    emotion_score = float(emotion_match.group(1)) if emotion_match else 5.0
+    
+    clean_response = EMOTION_TAG_PATTERN.sub('', full_response).strip()
+    
+    return clean_response, emotion_score
+
+def _could_be_emotion_tag(tail):
+    """'['로 시작하는 꼬리 문자열이 아직 완성되지 않은 감정점수 태그일 수 있는지"""
+    if len(tail) >= EMOTION_TAG_MAX_LEN or ']' in tail:
+        return False
+    return EMOTION_TAG_PREFIX.startswith(tail) or tail.startswith(EMOTION_TAG_PREFIX)
+
+def strip_emotion_tag_stream(chunks, result):
+    """
+    텍스트 조각 스트림에서 [감정점수: X] 태그를 걸러내며 그대로 흘려보냄
+    
+    - 태그가 여러 조각에 걸쳐 와도 태그일 수 있는 꼬리만 잠시 보류
+    - result['emotion_score'], result['scored'], result['text']는 스트림을 다 읽으면 확정
+    """
+    buffer = ''
+    started = False
+    
+    for chunk in chunks:
+        buffer += chunk
+        
+        match = EMOTION_TAG_PATTERN.search(buffer)
+        while match:
+            result['emotion_score'] = float(match.group(1))
+            result['scored'] = True
+            buffer = buffer[:match.start()] + buffer[match.end():]
+            match = EMOTION_TAG_PATTERN.search(buffer)
+        
+        hold_at = buffer.rfind('[')
+        if hold_at != -1 and _could_be_emotion_tag(buffer[hold_at:]):
+            ready, buffer = buffer[:hold_at], buffer[hold_at:]
+        else:
+            ready, buffer = buffer, ''
+        
+        # 응답 앞쪽 공백(태그 뒤 줄바꿈 등)은 버림
+        if not started:
+            ready = ready.lstrip()
+            started = bool(ready)
+        
+        if ready:
+            result['text'] += ready
+            yield ready
+    
+    if buffer:
+        result['text'] += buffer
+        yield buffer
+    
+    result['text'] = result['text'].strip()
+
+def groq_counsel_chat_stream(messages, client=None, use_cache=True, fallback_score=5.0):
+    """
+    Groq API 대화형 호출 (스트리밍) - st.write_stream에 바로 넘길 수 있는 제너레이터
+    
+    Args:
+        messages: 대화 메시지 리스트
+        client: Groq 호환 클라이언트 (테스트용 가짜 클라이언트 주입 가능)
+        use_cache: False면 응답 캐시를 건너뛰고 항상 API 호출
+        fallback_score: 응답에 감정점수 태그가 없거나 오류일 때 쓸 점수 (로컬 분류기 추정값)
+    
+    Returns:
+        (generator, dict): 텍스트 조각 제너레이터,
+                           스트림 종료 후 {'text', 'emotion_score', 'scored', 'cached', 'error'}
+                           ('scored'는 LLM이 감정점수를 직접 매겼는지 여부)
+    """
+    result = {'text': '', 'emotion_score': fallback_score, 'scored': False, 'cached': False, 'error': False}
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    cache_key = llm_cache_key(messages) if use_cache else None
+    
+    cached = llm_cache_get(cache_key) if use_cache else None
+    if cached:
+        result['text'] = cached[0]
+        if cached[1] is not None:
+            result['emotion_score'], result['scored'] = cached[1], True
+        result['cached'] = True
+        return iter([result['text']]), result
+    
+    def token_chunks():
+        if client is None and not GROQ_API_KEY:
+            result['error'] = True
+            yield "⚠️ Groq API 키가 설정되지 않았습니다."
+            return
+        
+        llm = client or get_llm_client(GROQ_API_KEY, GROQ_BASE_URL)
+        
+        try:
+            # 재시도는 스트림 연결까지만 (토큰이 나가기 시작하면 재시도 불가)
+            stream = call_llm_with_retry(lambda: llm.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500,
+                stream=True
+            ))
+            
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        
+        except Exception as e:
+            result['error'] = True
+            yield f"\n\n⚠️ API 오류: {str(e)}"
+    
+    def response_chunks():
+        yield from strip_emotion_tag_stream(token_chunks(), result)
+        
+        # 정상 응답만 캐시 (오류 문구는 저장하지 않음)
+        if use_cache and not result['error'] and result['text']:
+            llm_cache_put(cache_key, result['text'], result['emotion_score'] if result['scored'] else None)
+    
+    return response_chunks(), result
+
 def groq_counsel_chat(messages):
     """Groq API 대화형 호출"""
     
@@ -1651,25 +4604,19 @@ def groq_counsel_chat(messages):
         return "⚠️ Groq API 키가 설정되지 않았습니다.", 5.0
     
     try:
-        client = Groq(api_key=GROQ_API_KEY)
+        client = get_llm_client(GROQ_API_KEY, GROQ_BASE_URL)
         
-        response = client.chat.completions.create(
+        response = call_llm_with_retry(lambda: client.chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=messages,
             temperature=0.7,
             max_tokens=500
-        )
+        ))
         
         full_response = response.choices[0].message.content
         
-        # 감정 점수 추출
-        emotion_match = re.search(r'\[감정점수[:\s]*(\d+(?:\.\d+)?)\]', full_response)
-        emotion_score = float(emotion_match.group(1)) if emotion_match else 5.0
-        
-        # 감정 점수 제거
-        clean_response = re.sub(r'\[감정점수[:\s]*\d+(?:\.\d+)?\]', '', full_response).strip()
-        
-        return clean_response, emotion_score
+        # 감정 점수 추출 + 제거
+        return extract_emotion_score(full_response)
         
     except Exception as e:
         return f"⚠️ API 오류: {str(e)}", 5.0
@@ -1682,7 +4629,7 @@ def groq_counsel(user_text):
         if not api_key:
             return "⚠️ API 키가 없습니다.", 5.0
         
-        client = Groq(api_key=api_key)
+        client = get_llm_client(api_key, GROQ_BASE_URL)
         
         prompt = f"""당신은 전문적이고 객관적인 투자 심리 상담사입니다.
 감정적인 투자를 막고, 합리적 판단을 돕는 것이 목표입니다.
@@ -1706,686 +4653,937 @@ def groq_counsel(user_text):
 (전문적이고 명확한 상담 내용)
 """
         
-        response = client.chat.completions.create(
+        response = call_llm_with_retry(lambda: client.chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
             max_tokens=500
-        )
+        ))
         
         full_response = response.choices[0].message.content
         
-        emotion_match = re.search(r'\[감정점수[:\s]*(\d+(?:\.\d+)?)\]', full_response)
-        emotion_score = float(emotion_match.group(1)) if emotion_match else 5.0
-        
-        clean_response = re.sub(r'\[감정점수[:\s]*\d+(?:\.\d+)?\]', '', full_response).strip()
-        
-        return clean_response, emotion_score
+        return extract_emotion_score(full_response)
         
     except Exception as e:
         return f"상담 중 오류가 발생했습니다: {str(e)}", 5.0
 
 # ============================================================================
-# Session State 초기화
+# 👤 사용자 식별
 # ============================================================================
 
-if 'portfolio' not in st.session_state:
-    db_portfolio = load_portfolio_from_db()
+# 서버가 발급한 익명 ID 형식 (uuid4().hex) - 소문자 로그인 이메일과는 절대 겹치지 않음
+ANONYMOUS_USER_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+def get_current_user_id():
+    """
+    현재 세션의 사용자 ID (세션당 1회 결정)
     
-    if db_portfolio:
-        st.session_state.portfolio = db_portfolio
-    else:
-        st.session_state.portfolio = [
-            {'종목코드': '005930', '종목명': '삼성전자', '매입가': 70000, '수량': 10},
-            {'종목코드': '000660', '종목명': 'SK하이닉스', '매입가': 130000, '수량': 5}
-        ]
+    - MULTI_USER가 꺼져 있으면 항상 DEFAULT_USER_ID (단일 사용자)
+    - 로그인 이메일(st.user) → URL ?user=의 익명 ID → 새 익명 ID 순
+      (익명 ID는 URL에 남겨 새로고침/북마크해도 같은 데이터를 봄)
+    - URL로는 서버가 발급한 익명 ID만 받음 (?user=이메일로 로그인 사용자 데이터에 접근 불가)
+    """
+    if 'user_id' in st.session_state:
+        return st.session_state.user_id
+    
+    user_id = DEFAULT_USER_ID
+    if MULTI_USER:
+        user = getattr(st, "user", None)
+        email = getattr(user, "email", None) if getattr(user, "is_logged_in", False) else None
+        requested = st.query_params.get("user", "")
+        
+        if email:
+            user_id = email.lower()
+        elif ANONYMOUS_USER_ID_PATTERN.fullmatch(requested):
+            user_id = requested
+        else:
+            user_id = uuid.uuid4().hex
+            st.query_params["user"] = user_id
+    
+    st.session_state.user_id = user_id
+    return user_id
 
-# 채팅 히스토리 초기화
-if 'guardian_chat_history' not in st.session_state:
-    st.session_state.guardian_chat_history = []
+def is_admin_user(user_id):
+    """
+    프로세스 전역 관리 작업(AI 응답 캐시 비우기, 감정 분류기 재학습) 권한
+    
+    - 단일 사용자 모드는 그 사용자가 곧 관리자
+    - 다중 사용자 모드는 ADMIN_USERS에 있는 로그인 이메일만 (익명 ID는 해당 없음)
+    """
+    return not MULTI_USER or user_id in ADMIN_USERS
 
 # ============================================================================
-# 🌟 메인 UI
+# 🌟 Streamlit 화면 (streamlit run app.py)
 # ============================================================================
 
-st.markdown('<div class="header-animated">🛡️ GINI Guardian v4.5 Chat</div>', unsafe_allow_html=True)
-st.markdown('<div style="text-align: center; margin-bottom: 20px;"><span class="hot-badge" style="font-size: 1.2em; color: #ff4500;">NEW! Groq 대화형 상담 🔥</span></div>', unsafe_allow_html=True)
-
-# ============================================================================
-# 탭 구성
-# ============================================================================
+def main():
+    """
+    Streamlit 화면 전체 (재실행마다 호출)
+    
+    - 모듈 최상위에는 함수/설정만 두어 import app (retag.py, 테스트)으로 화면이 실행되지 않게 함
+    """
+    st.set_page_config(page_title="GINI Guardian v4.5 Chat", page_icon="🛡️", layout="wide")
+    st.markdown(THEME_CSS, unsafe_allow_html=True)
+    st.markdown(PWA_HEAD_HTML, unsafe_allow_html=True)
+    st.markdown(ANIMATION_CSS, unsafe_allow_html=True)
+    
+    create_tables()
+    
+    # Session State 초기화
+    current_user_id = get_current_user_id()
 
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
-    "🧭 AI 상담",
-    "📊 대시보드",
-    "📚 상담 기록",
-    "💼 실시간 포트폴리오",
-    "⚙️ 설정"
-])
+    if 'portfolio' not in st.session_state:
+        db_portfolio = load_portfolio_from_db(current_user_id)
+        
+        if db_portfolio:
+            st.session_state.portfolio = db_portfolio
+        else:
+            st.session_state.portfolio = [
+                {'종목코드': '005930', '종목명': '삼성전자', '매입가': 70000, '수량': 10},
+                {'종목코드': '000660', '종목명': 'SK하이닉스', '매입가': 130000, '수량': 5}
+            ]
+
+    # 채팅 히스토리 초기화
+    if 'guardian_chat_history' not in st.session_state:
+        st.session_state.guardian_chat_history = []
+
+    # 백그라운드로 미룬 LLM 상담 [(히스토리 메시지, Future)]
+    if 'pending_counsel' not in st.session_state:
+        st.session_state.pending_counsel = []
+
+    # ============================================================================
+    # 🌟 메인 UI
+    # ============================================================================
+
+    st.markdown('<div class="header-animated">🛡️ GINI Guardian v4.5 Chat</div>', unsafe_allow_html=True)
+    st.markdown('<div style="text-align: center; margin-bottom: 20px;"><span class="hot-badge" style="font-size: 1.2em; color: #ff4500;">NEW! Groq 대화형 상담 🔥</span></div>', unsafe_allow_html=True)
+
+    # ============================================================================
+    # 탭 구성
+    # ============================================================================
+
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        "🧭 AI 상담",
+        "📊 대시보드",
+        "📚 상담 기록",
+        "💼 실시간 포트폴리오",
+        "⚙️ 설정"
+    ])
+
+    # ============================================================================
+    # TAB 1: AI 상담 (텍스트 강화)
+    # ============================================================================
+
+    with tab1:
+        st.markdown('<div style="text-align: center; margin-bottom: 15px;"><span style="font-size: 1.8em;">💬 투자 심리 상담 (대화형)</span></div>', unsafe_allow_html=True)
+        
+        # API 키 확인
+        if not GROQ_API_KEY:
+            st.error("⚠️ **Groq API 키가 없습니다.** Streamlit secrets에 GROQ_API_KEY를 추가해주세요.")
+        else:
+            # 인트로 배너
+            st.markdown("""
+            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; margin-bottom: 20px;">
+                <p style="color: white; font-size: 1.1em; margin: 0; text-align: center; line-height: 1.6;">
+                안녕하세요. 저는 <strong>감정에 흔들린 투자 결정을 막아주는</strong><br>
+                <strong>'주식 과잉방지 AI 상담가'</strong>입니다.<br>
+                <br>
+                지금 당신의 심리·상황을 함께 점검하며<br>
+                <strong>안전한 투자를 돕겠습니다.</strong> 🛡️<br>
+                <br>
+                <strong>✨ NEW! 계속 대화가 가능합니다!</strong>
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # 종목명 자동 보정 안내
+            with st.expander("💡 종목명 자동 보정 기능", expanded=False):
+                st.write("""
+                **오타가 있어도 걱정 마세요!**
+                - '상승전자' → '삼성전자' 자동 보정
+                - '항미반도체' → '한미반도체' 자동 보정
+                - '네이바' → 'NAVER' 자동 보정
+                
+                AI가 자동으로 정확한 종목명을 찾아드립니다!
+                """)
+            
+            st.markdown("---")
+            
+            # 백그라운드 상담 완료분 반영
+            still_pending = []
+            for msg, future in st.session_state.pending_counsel:
+                if not future.done():
+                    still_pending.append((msg, future))
+                    continue
+                
+                try:
+                    reply = future.result()
+                    msg['content'] = reply['text']
+                    msg['meta'].update(risk=reply['risk'], emotion_score=reply['emotion_score'])
+                except Exception as e:
+                    # 실패한 답변은 오류 문구로 바꾸고 대기 목록에서 제외 (오류 기록은 작업 스레드에서 이미 남김)
+                    msg['content'] = f"상담 중 오류가 발생했습니다: {str(e)}"
+                msg.pop('pending', None)
+            st.session_state.pending_counsel = still_pending
+            
+            # 채팅 히스토리 표시
+            for msg in st.session_state.guardian_chat_history:
+                with st.chat_message(msg['role']):
+                    st.write(msg['content'])
+                    
+                    # AI 응답에 메타 정보 표시
+                    if msg['role'] == 'assistant' and 'meta' in msg:
+                        meta = msg['meta']
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.caption(f"📊 위험지표: {meta.get('risk', 0):.1f}/10")
+                        with col2:
+                            if meta.get('tags'):
+                                st.caption(f"🏷️ {', '.join(meta['tags'][:3])}")
+            
+            if st.session_state.pending_counsel:
+                if st.button("🔄 상담 답변 확인", key="check_pending_counsel"):
+                    st.rerun()
+            
+            # 사용자 입력
+            user_input = st.chat_input("💬 투자 고민을 솔직하게 말씀해주세요...")
+            
+            if user_input:
+                # 종목명 자동 보정
+                correction_result = extract_and_correct_stocks(user_input)
+                
+                if correction_result['found_stocks']:
+                    corrected_notice = []
+                    for stock in correction_result['found_stocks']:
+                        if stock['confidence'] < 1.0:
+                            corrected_notice.append(f"'{stock['original']}' → {stock['corrected']}")
+                    
+                    if corrected_notice:
+                        st.info(f"💡 종목명 보정: {', '.join(corrected_notice)}")
+                    
+                    user_input = correction_result['corrected']
+                
+                # 사용자 메시지 추가
+                st.session_state.guardian_chat_history.append({
+                    'role': 'user',
+                    'content': user_input
+                })
+                
+                with st.chat_message("user"):
+                    st.write(user_input)
+                
+                # System Prompt 생성
+                system_prompt = build_guardian_system_prompt()
+                
+                # 메시지 구성 (아직 준비 중인 백그라운드 답변 자리는 제외)
+                recent_history = st.session_state.guardian_chat_history[-10:]
+                messages = [{"role": "system", "content": system_prompt}]
+                
+                for msg in recent_history:
+                    if msg.get('pending'):
+                        continue
+                    messages.append({
+                        "role": msg['role'],
+                        "content": msg['content']
+                    })
+                
+                # LLM 응답 전에 로컬 분류기로 즉시 위험도 추정
+                local_score = predict_emotion_score(user_input)
+                volatility_score = get_volatility_score(st.session_state.portfolio)
+                news_score = 3.0
+                risk_estimate = calc_risk_score(local_score, volatility_score, news_score)
+                
+                # LLM 호출 전 안전 게이트 (감정 태그·압박 멘트·거래 패턴 먼저 판정)
+                gate = gate_message(current_user_id, user_input, risk_estimate)
+                tags = gate['tags']
+                pressure_msg = gate['pressure']
+                use_cache = not st.session_state.get('llm_cache_bypass', False)
+                pending_reply = None
+                
+                # AI 응답 생성
+                with st.chat_message("assistant"):
+                    st.caption(f"⚡ 즉시 위험 추정: {risk_estimate:.1f}/10")
+                    
+                    if gate['action'] == "llm":
+                        # 첫 토큰부터 바로 표시 (감정점수 태그는 스트림에서 제거)
+                        response_stream, stream_result = groq_counsel_chat_stream(
+                            messages,
+                            use_cache=use_cache,
+                            fallback_score=local_score
+                        )
+                        st.write_stream(response_stream)
+                        response, emotion_score = stream_result['text'], stream_result['emotion_score']
+                        emotion_source = "llm" if stream_result['scored'] else "local"
+                    else:
+                        # 고위험 메시지: LLM을 기다리지 않고 개입부터 즉시 표시
+                        render_pressure_intervention(pressure_msg)
+                        response, emotion_score, emotion_source = format_pressure_message(pressure_msg), local_score, "local"
+                    
+                    with st.spinner("🤔 AI가 분석 중..."):
+                        # 위험도 계산 (LLM이 감정점수를 주지 않았으면 로컬 추정값 사용)
+                        risk = calc_risk_score(emotion_score, volatility_score, news_score)
+                        risk_emoji = get_risk_emoji(risk)
+                        risk_level = detect_risk_level(risk)
+                        
+                        # 위험한 순간 기록
+                        if risk >= 6.5:
+                            save_dangerous_moment(current_user_id, risk, tags, user_input)
+                            now = datetime.now()
+                            update_addiction_pattern(current_user_id, now.hour, now.weekday(), "만회")
+                        
+                        # 상담 기록 저장 (defer면 백그라운드 LLM 응답이 끝난 뒤 저장)
+                        if gate['action'] == "defer":
+                            pending_reply = defer_counsel(
+                                current_user_id, messages, user_input, tags, local_score, volatility_score, news_score, use_cache
+                            )
+                            st.caption("💬 상담 답변은 준비되는 대로 대화에 추가됩니다.")
+                        else:
+                            save_chat(current_user_id, user_input, response, emotion_score, risk_level, tags, risk, emotion_source)
+                            schedule_emotion_model_training()
+                        
+                        # 거래 패턴 경고
+                        render_pattern_warnings(gate['pattern_warnings'])
+                        
+                        # 압박 메시지 (게이트에서 이미 표시했으면 생략)
+                        if pressure_msg and gate['action'] == "llm":
+                            render_pressure_intervention(pressure_msg)
+                        
+                        # 메타 정보 표시
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.caption(f"📊 위험지표: {risk:.1f}/10 {risk_emoji}")
+                        with col2:
+                            if tags and tags != ["중립"]:
+                                tag_colors = {
+                                    "탐욕": "🟠", "자포자기": "🔴", "충동": "🟡",
+                                    "FOMO": "🟡", "공포": "🔴", "불안": "🟡",
+                                    "분노": "🟠", "후회": "🔵", "우울": "🟣",
+                                    "흥분": "🟢", "회의감": "⚪", "냉정": "🟢"
+                                }
+                                tag_display = " ".join([f"{tag_colors.get(tag, '⚫')} {tag}" for tag in tags[:3]])
+                                st.caption(f"🏷️ {tag_display}")
+                
+                # AI 응답 히스토리에 추가
+                st.session_state.guardian_chat_history.append({
+                    'role': 'assistant',
+                    'content': response,
+                    'meta': {
+                        'risk': risk,
+                        'emotion_score': emotion_score,
+                        'tags': tags
+                    }
+                })
+                
+                # 백그라운드 상담 답변 자리 (완료되면 다음 실행에서 채워짐)
+                if pending_reply is not None:
+                    placeholder = {
+                        'role': 'assistant',
+                        'content': "⏳ 상담 답변을 준비하고 있습니다...",
+                        'meta': {'risk': risk, 'emotion_score': emotion_score, 'tags': tags},
+                        'pending': True
+                    }
+                    st.session_state.guardian_chat_history.append(placeholder)
+                    st.session_state.pending_counsel.append((placeholder, pending_reply))
+            
+            # 히스토리 관리
+            if len(st.session_state.guardian_chat_history) > 0:
+                st.markdown("---")
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("🗑️ 대화 내역 지우기", use_container_width=True):
+                        st.session_state.guardian_chat_history = []
+                        st.session_state.pending_counsel = []
+                        st.rerun()
+                with col2:
+                    st.caption(f"총 {len(st.session_state.guardian_chat_history)}개 메시지")
 
-# ============================================================================
-# TAB 1: AI 상담 (텍스트 강화)
-# ============================================================================
+    # ============================================================================
+    # TAB 2: 대시보드 (v4.1 NEW!)
+    # ============================================================================
 
-with tab1:
-    st.markdown('<div style="text-align: center; margin-bottom: 15px;"><span style="font-size: 1.8em;">💬 투자 심리 상담 (대화형)</span></div>', unsafe_allow_html=True)
-    
-    # API 키 확인
-    if not GROQ_API_KEY:
-        st.error("⚠️ **Groq API 키가 없습니다.** Streamlit secrets에 GROQ_API_KEY를 추가해주세요.")
-    else:
-        # 인트로 배너
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; margin-bottom: 20px;">
-            <p style="color: white; font-size: 1.1em; margin: 0; text-align: center; line-height: 1.6;">
-            안녕하세요. 저는 <strong>감정에 흔들린 투자 결정을 막아주는</strong><br>
-            <strong>'주식 과잉방지 AI 상담가'</strong>입니다.<br>
-            <br>
-            지금 당신의 심리·상황을 함께 점검하며<br>
-            <strong>안전한 투자를 돕겠습니다.</strong> 🛡️<br>
-            <br>
-            <strong>✨ NEW! 계속 대화가 가능합니다!</strong>
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # 종목명 자동 보정 안내
-        with st.expander("💡 종목명 자동 보정 기능", expanded=False):
-            st.write("""
-            **오타가 있어도 걱정 마세요!**
-            - '상승전자' → '삼성전자' 자동 보정
-            - '항미반도체' → '한미반도체' 자동 보정
-            - '네이바' → 'NAVER' 자동 보정
+    with tab2:
+        st.markdown('<div style="text-align: center; margin-bottom: 15px;"><span style="font-size: 1.8em;">📊 나의 투자 심리 대시보드</span></div>', unsafe_allow_html=True)
+        
+        st.info("✨ 당신의 감정 패턴과 위험 신호를 한눈에 확인하세요!")
+        
+        # 같은 실행에서 방금 저장된 상담까지 반영 (이 사용자의 쓰기가 큐에 있을 때만 대기)
+        flush_writes(current_user_id)
+        
+        # 통계 카드
+        stats = get_dashboard_stats(current_user_id)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric(
+                label="📝 총 상담 횟수",
+                value=f"{stats['total_chats']}회"
+            )
+        
+        with col2:
+            st.metric(
+                label="📊 평균 감정 점수",
+                value=f"{stats['avg_emotion']}/10",
+                delta=f"{'위험' if stats['avg_emotion'] > 6.5 else '주의' if stats['avg_emotion'] > 5 else '안정'}"
+            )
+        
+        with col3:
+            st.metric(
+                label="🚨 고위험 상담",
+                value=f"{stats['high_risk_count']}회"
+            )
+        
+        with col4:
+            st.metric(
+                label="📅 최근 7일",
+                value=f"{stats['week_chats']}회"
+            )
+        
+        st.divider()
+        
+        # v4.2: 거래 패턴 경고
+        st.markdown("### 🎯 거래 패턴 분석 (NEW!)")
+        
+        trading_patterns = analyze_trading_patterns(current_user_id)
+        pattern_warnings = get_trading_pattern_warnings(current_user_id, trading_patterns)
+        
+        if pattern_warnings:
+            st.error("⚠️ **위험한 거래 패턴이 감지되었습니다!**")
+            
+            for warning in pattern_warnings:
+                if warning['level'] == 'CRITICAL':
+                    st.markdown(f"### 🔴 {warning['type']}")
+                    st.error(warning['message'])
+                elif warning['level'] == 'HIGH':
+                    st.markdown(f"### 🟠 {warning['type']}")
+                    st.warning(warning['message'])
+                else:
+                    st.markdown(f"### 🟡 {warning['type']}")
+                    st.info(warning['message'])
+                
+                st.markdown("---")
+        else:
+            st.success(" **현재 건강한 투자 패턴입니다!**")
+            st.info("""
+            **안전한 투자 습관:**
+            - 충분한 고민 시간
+            - 감정적 거래 없음
+            - 계획적 접근
+            
+            이 상태를 유지하세요! 💪
+            """)
+        
+        st.divider()
+        
+        # 감정 히트맵
+        st.markdown("### 📅 언제 가장 위험한가요?")
+        
+        # 차트별 소요 시간 (조회 / Figure / 렌더)
+        chart_timings = {}
+        
+        try:
+            heatmap_fig = create_emotion_heatmap(current_user_id, chart_timings)
+            render_started = time.perf_counter()
+            st.plotly_chart(heatmap_fig, use_container_width=True)
+            st.caption(format_chart_timing(chart_timings['heatmap'], (time.perf_counter() - render_started) * 1000))
+            
+            st.info("💡 **히트맵 해석**: 빨간색일수록 감정이 불안정한 시간대입니다. 이 시간대에는 투자 결정을 피하세요!")
+        except Exception as e:
+            st.warning("⚠️ 히트맵을 생성하려면 최소 10개 이상의 상담 기록이 필요합니다.")
+        
+        st.divider()
+        
+        # 감정 점수 추이
+        st.markdown("### 📈 내 감정은 어떻게 변했나요?")
+        
+        try:
+            timeline_fig = create_risk_timeline(current_user_id, chart_timings)
+            if timeline_fig:
+                render_started = time.perf_counter()
+                st.plotly_chart(timeline_fig, use_container_width=True)
+                st.caption(format_chart_timing(chart_timings['timeline'], (time.perf_counter() - render_started) * 1000))
+                st.info("💡 **추이 분석**: 빨간 선(6.5) 이상이면 HIGH 위험, 주황 선(5.0) 이상이면 MID 주의입니다.")
+            else:
+                st.warning("⚠️ 데이터가 부족합니다. 상담을 더 진행해주세요!")
+        except Exception as e:
+            st.warning("⚠️ 차트를 생성하려면 상담 기록이 필요합니다.")
+        
+        st.divider()
+        
+        # 감정 태그 빈도
+        st.markdown("### 🏷️ 어떤 감정이 가장 많나요?")
+        
+        col_tag1, col_tag2 = st.columns([2, 1])
+        
+        with col_tag1:
+            try:
+                tag_fig = create_emotion_tag_chart(current_user_id, chart_timings)
+                if tag_fig:
+                    render_started = time.perf_counter()
+                    st.plotly_chart(tag_fig, use_container_width=True)
+                    st.caption(format_chart_timing(chart_timings['tags'], (time.perf_counter() - render_started) * 1000))
+                else:
+                    st.warning("⚠️ 감정 태그 데이터가 부족합니다.")
+            except Exception as e:
+                st.warning("⚠️ 차트를 생성하려면 상담 기록이 필요합니다.")
+        
+        with col_tag2:
+            st.markdown("#### 📌 가장 많은 감정")
+            st.metric(
+                label="",
+                value=stats['most_common_tag'],
+                delta=f"{stats['most_common_count']}회"
+            )
+            
+            st.markdown("---")
             
-            AI가 자동으로 정확한 종목명을 찾아드립니다!
+            st.markdown("#### 🎯 고위험 감정")
+            st.error("""
+            **주의 필요:**
+            - 탐욕
+            - 자포자기
+            - 충동
+            - FOMO
+            - 공포
             """)
+
+        st.divider()
         
-        st.markdown("---")
+        # v4.3: 주간 리포트
+        st.markdown("### 📝 주간 리포트 (NEW!)")
         
-        # 채팅 히스토리 표시
-        for msg in st.session_state.guardian_chat_history:
-            with st.chat_message(msg['role']):
-                st.write(msg['content'])
+        if st.button("📊 이번 주 리포트 생성", type="primary", use_container_width=True):
+            with st.spinner("📝 리포트 생성 중..."):
+                report = generate_weekly_report(current_user_id, trading_patterns)
+                
+                # 리포트 표시
+                st.markdown("---")
+                st.markdown(f"## 🛡️ GINI Guardian 주간 리포트")
+                st.markdown(f"**📅 기간**: {report['period']}")
+                st.markdown(f"**📝 생성**: {report['generated_at']}")
+                
+                st.divider()
                 
-                # AI 응답에 메타 정보 표시
-                if msg['role'] == 'assistant' and 'meta' in msg:
-                    meta = msg['meta']
+                # 기본 통계
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("총 상담 횟수", f"{report['total_chats']}회")
+                
+                with col2:
+                    st.metric("평균 감정 점수", f"{report['avg_emotion']}/10")
+                
+                with col3:
+                    st.metric("고위험 상담", f"{report['high_risk_count']}회")
+                
+                st.divider()
+                
+                # 종합 평가
+                st.markdown("### 💯 종합 평가")
+                
+                if '🔴' in report['grade']:
+                    st.error(f"**{report['grade']}**")
+                    st.error(report['comment'])
+                elif '🟡' in report['grade']:
+                    st.warning(f"**{report['grade']}**")
+                    st.warning(report['comment'])
+                else:
+                    st.success(f"**{report['grade']}**")
+                    st.success(report['comment'])
+                
+                st.divider()
+                
+                # 주요 감정
+                if report['top_tags']:
+                    st.markdown("### 🏷️ 주요 감정 TOP 3")
                     
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.caption(f"📊 위험지표: {meta.get('risk', 0):.1f}/10")
-                    with col2:
-                        if meta.get('tags'):
-                            st.caption(f"🏷️ {', '.join(meta['tags'][:3])}")
-        
-        # 사용자 입력
-        user_input = st.chat_input("💬 투자 고민을 솔직하게 말씀해주세요...")
-        
-        if user_input:
-            # 종목명 자동 보정
-            correction_result = extract_and_correct_stocks(user_input)
-            
-            if correction_result['found_stocks']:
-                corrected_notice = []
-                for stock in correction_result['found_stocks']:
-                    if stock['confidence'] < 1.0:
-                        corrected_notice.append(f"'{stock['original']}' → {stock['corrected']}")
+                    for i, tag_data in enumerate(report['top_tags'], 1):
+                        st.info(f"**{i}위**: {tag_data['tag']} ({tag_data['count']}회)")
                 
-                if corrected_notice:
-                    st.info(f"💡 종목명 보정: {', '.join(corrected_notice)}")
+                st.divider()
                 
-                user_input = correction_result['corrected']
-            
-            # 사용자 메시지 추가
-            st.session_state.guardian_chat_history.append({
-                'role': 'user',
-                'content': user_input
-            })
-            
-            with st.chat_message("user"):
-                st.write(user_input)
-            
-            # System Prompt 생성
-            system_prompt = build_guardian_system_prompt()
-            
-            # 메시지 구성
-            recent_history = st.session_state.guardian_chat_history[-10:]
-            messages = [{"role": "system", "content": system_prompt}]
+                # 가장 위험했던 순간
+                if report['most_dangerous']:
+                    st.markdown("### ⚠️ 가장 위험했던 순간")
+                    st.error(f"""
+    **시간**: {report['most_dangerous']['time']}  
+    **감정 점수**: {report['most_dangerous']['score']}/10  
+    **내용**: {report['most_dangerous']['input']}
+                    """)
+                
+                st.divider()
+                
+                # 거래 패턴
+                st.markdown("### 🎯 거래 패턴 분석")
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.metric("과매매", " 감지됨" if report['patterns']['overtrading'] else " 없음")
+                    st.metric("복수 매매", " 감지됨" if report['patterns']['revenge'] else " 없음")
+                
+                with col2:
+                    st.metric("연속 손실", " 감지됨" if report['patterns']['loss_streak'] else " 없음")
+                    st.metric("FOMO 중독", " 감지됨" if report['patterns']['fomo'] else " 없음")
+                
+                st.divider()
+                
+                # 요일별 상담
+                if report['by_day']:
+                    st.markdown("### 📅 요일별 상담 횟수")
+                    
+                    df = pd.DataFrame(report['by_day'])
+                    fig = px.bar(df, x='day', y='count',
+                                title='요일별 상담 패턴',
+                                labels={'day': '요일', 'count': '횟수'})
+                    st.plotly_chart(fig, use_container_width=True)
+                
+                st.divider()
+                
+                # 텍스트 리포트
+                st.markdown("### 📄 텍스트 리포트")
+                
+                report_text = create_report_text(report)
+                
+                st.text_area(
+                    "복사해서 저장하세요!",
+                    value=report_text,
+                    height=400
+                )
+                
+                st.success(" 리포트가 생성되었습니다! 위 텍스트를 복사하여 저장하세요.")
+
+    # ============================================================================
+    # TAB 3: 상담 기록
+    # ============================================================================
+
+    with tab3:
+        st.subheader("📚 과거 상담 기록")
+        
+        search_query = st.text_input(
+            "🔍 상담 내용 검색",
+            placeholder="예: 에코프로 손절 (띄어쓴 단어를 모두 포함한 상담)",
+            key="history_search"
+        ).strip()
+        
+        if search_query:
+            results = search_chats(current_user_id, search_query)
             
-            for msg in recent_history:
-                messages.append({
-                    "role": msg['role'],
-                    "content": msg['content']
-                })
+            if results:
+                st.success(f" '{search_query}' 검색 결과 {len(results)}개" + (" (상위 결과만 표시)" if len(results) == SEARCH_RESULT_LIMIT else ""))
+                st.divider()
+                
+                for chat_id, timestamp, tags, risk, snippet in results:
+                    with st.expander(f"🔍 상담 #{chat_id} | {timestamp} | {tags}", expanded=False):
+                        st.markdown(snippet)
+                        st.caption(f"⚠️ 위험지표: {(risk or '').upper()}")
+                        
+                        if st.toggle("🤖 AI의 답변 보기", key=f"search_answer_{chat_id}"):
+                            st.markdown(f"**🤖 AI의 답변:**\n{load_chat_response(current_user_id, chat_id)}")
+            else:
+                st.info(f"🔍 '{search_query}'이(가) 들어간 상담 기록이 없습니다.")
+        else:
+            # 필터 (날짜 범위 / 감정 태그 / 위험도) + 페이지 크기
+            col_date, col_tag, col_risk, col_size = st.columns([2, 1, 1, 1])
+        
+            with col_date:
+                date_range = st.date_input("📅 기간", value=(), key="history_date_range")
+            with col_tag:
+                history_tag = st.selectbox("🏷️ 태그", ["전체"] + list(EMOTION_LEXICON), key="history_tag")
+            with col_risk:
+                history_risk = st.selectbox("⚠️ 위험도", ["전체"] + list(HISTORY_RISK_LEVELS), key="history_risk")
+            with col_size:
+                page_size = st.selectbox("📄 페이지 크기", HISTORY_PAGE_SIZES, index=1, key="history_page_size")
+        
+            date_from = date_range[0].strftime('%Y-%m-%d') if len(date_range) >= 1 else None
+            date_to = date_range[1].strftime('%Y-%m-%d') if len(date_range) == 2 else None
+            history_filters = (
+                date_from, date_to,
+                None if history_tag == "전체" else history_tag,
+                None if history_risk == "전체" else history_risk,
+                page_size
+            )
+        
+            # 지나온 페이지의 커서 스택 (필터가 바뀌면 첫 페이지부터)
+            if st.session_state.get('history_filters') != history_filters:
+                st.session_state.history_filters = history_filters
+                st.session_state.history_cursors = [None]
+        
+            history, next_before_id = load_history_page(
+                current_user_id,
+                before_id=st.session_state.history_cursors[-1],
+                page_size=page_size,
+                date_from=date_from,
+                date_to=date_to,
+                tag=history_filters[2],
+                risk_level=history_filters[3]
+            )
+            page_number = len(st.session_state.history_cursors)
+        
+            if history:
+                st.success(f" {page_number}페이지 · {len(history)}개의 상담 기록")
+                st.divider()
             
-            # AI 응답 생성
-            with st.chat_message("assistant"):
-                with st.spinner("🤔 AI가 분석 중..."):
-                    response, emotion_score = groq_counsel_chat(messages)
-                    
-                    # 위험도 계산
-                    volatility_score = 5.0
-                    news_score = 3.0
-                    risk = calc_risk_score(emotion_score, volatility_score, news_score)
-                    risk_emoji = get_risk_emoji(risk)
-                    risk_level = detect_risk_level(risk)
-                    tags = detect_tags(user_input)
+                for chat_id, user, emo, risk, tags, timestamp in history:
+                    with st.expander(f"💬 상담 #{chat_id} | {timestamp} | {tags}", expanded=False):
+                        col1, col2 = st.columns([1, 1])
                     
-                    # 위험한 순간 기록
-                    if risk >= 6.5:
-                        save_dangerous_moment(risk, tags, user_input)
-                        now = datetime.now()
-                        update_addiction_pattern(now.hour, now.weekday(), "만회")
+                        with col1:
+                            st.markdown(f"**👤 당신의 질문:**\n{user}")
+                            st.markdown(f"**💙 감정 점수:** {emo} / 10")
                     
-                    # 상담 기록 저장
-                    save_chat(user_input, response, emotion_score, risk_level, tags)
+                        with col2:
+                            st.markdown(f"**⚠️ 위험지표:** {(risk or '').upper()}")
+                            st.markdown(f"**🏷️ 태그:** {tags}")
                     
-                    # 거래 패턴 경고
-                    pattern_warnings = get_trading_pattern_warnings()
-                    
-                    if pattern_warnings:
-                        st.markdown("### 🚨 거래 패턴 경고")
-                        for warning in pattern_warnings:
-                            if warning['level'] == 'CRITICAL':
-                                st.error(f"**🔴 {warning['type']}**: {warning['message']}")
-                            elif warning['level'] == 'HIGH':
-                                st.warning(f"**🟠 {warning['type']}**: {warning['message']}")
                         st.markdown("---")
-                    
-                    # 압박 메시지
-                    pressure_msg = get_pressure_message(tags)
-                    
-                    if pressure_msg:
-                        st.markdown(f"""
-                        <div class="danger-box">
-                            <h2 style="color: #dc3545; margin: 0;">{pressure_msg['title']}</h2>
-                            {pressure_msg['message']}
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        st.markdown("### 💡 지금 당장 해야 할 행동")
-                        for action in pressure_msg['actions']:
-                            st.markdown(f"- {action}")
-                        
-                        st.warning(f"⚠️ 계속하려면 **'{pressure_msg['blocking_word']}'** 를 입력하세요.")
-                    
-                    # AI 응답 표시
-                    st.write(response)
-                    
-                    # 메타 정보 표시
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.caption(f"📊 위험지표: {risk:.1f}/10 {risk_emoji}")
-                    with col2:
-                        if tags and tags != ["중립"]:
-                            tag_colors = {
-                                "탐욕": "🟠", "자포자기": "🔴", "충동": "🟡",
-                                "FOMO": "🟡", "공포": "🔴", "불안": "🟡",
-                                "분노": "🟠", "후회": "🔵", "우울": "🟣",
-                                "흥분": "🟢", "회의감": "⚪", "냉정": "🟢"
-                            }
-                            tag_display = " ".join([f"{tag_colors.get(tag, '⚫')} {tag}" for tag in tags[:3]])
-                            st.caption(f"🏷️ {tag_display}")
-            
-            # AI 응답 히스토리에 추가
-            st.session_state.guardian_chat_history.append({
-                'role': 'assistant',
-                'content': response,
-                'meta': {
-                    'risk': risk,
-                    'emotion_score': emotion_score,
-                    'tags': tags
-                }
-            })
+                        # 답변 본문은 켠 기록만 조회/전송
+                        if st.toggle("🤖 AI의 답변 보기", key=f"history_answer_{chat_id}"):
+                            st.markdown(f"**🤖 AI의 답변:**\n{load_chat_response(current_user_id, chat_id)}")
+            elif page_number == 1:
+                st.info("📝 아직 상담 기록이 없습니다." if not any(history_filters[:4]) else "🔍 조건에 맞는 상담 기록이 없습니다.")
+            else:
+                st.info("📝 더 이상 상담 기록이 없습니다.")
         
-        # 히스토리 관리
-        if len(st.session_state.guardian_chat_history) > 0:
-            st.markdown("---")
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button("🗑️ 대화 내역 지우기", use_container_width=True):
-                    st.session_state.guardian_chat_history = []
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+        
+            with col_prev:
+                if st.button("◀ 이전", disabled=page_number == 1, use_container_width=True, key="history_prev"):
+                    st.session_state.history_cursors.pop()
+                    st.rerun()
+            with col_page:
+                st.markdown(f"<div style='text-align: center;'>{page_number} 페이지</div>", unsafe_allow_html=True)
+            with col_next:
+                if st.button("다음 ▶", disabled=next_before_id is None, use_container_width=True, key="history_next"):
+                    st.session_state.history_cursors.append(next_before_id)
                     st.rerun()
-            with col2:
-                st.caption(f"총 {len(st.session_state.guardian_chat_history)}개 메시지")
 
-# ============================================================================
-# TAB 2: 대시보드 (v4.1 NEW!)
-# ============================================================================
+    # ============================================================================
+    # TAB 4: 실시간 포트폴리오
+    # ============================================================================
 
-with tab2:
-    st.markdown('<div style="text-align: center; margin-bottom: 15px;"><span style="font-size: 1.8em;">📊 나의 투자 심리 대시보드</span></div>', unsafe_allow_html=True)
-    
-    st.info("✨ 당신의 감정 패턴과 위험 신호를 한눈에 확인하세요!")
-    
-    # 통계 카드
-    stats = get_dashboard_stats()
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric(
-            label="📝 총 상담 횟수",
-            value=f"{stats['total_chats']}회"
-        )
-    
-    with col2:
-        st.metric(
-            label="📊 평균 감정 점수",
-            value=f"{stats['avg_emotion']}/10",
-            delta=f"{'위험' if stats['avg_emotion'] > 6.5 else '주의' if stats['avg_emotion'] > 5 else '안정'}"
-        )
-    
-    with col3:
-        st.metric(
-            label="🚨 고위험 상담",
-            value=f"{stats['high_risk_count']}회"
-        )
-    
-    with col4:
-        st.metric(
-            label="📅 최근 7일",
-            value=f"{stats['week_chats']}회"
-        )
-    
-    st.divider()
-    
-    # v4.2: 거래 패턴 경고
-    st.markdown("### 🎯 거래 패턴 분석 (NEW!)")
-    
-    pattern_warnings = get_trading_pattern_warnings()
-    
-    if pattern_warnings:
-        st.error("⚠️ **위험한 거래 패턴이 감지되었습니다!**")
+    with tab4:
+        st.markdown('<div style="text-align: center; margin-bottom: 15px;"><span class="hot-badge" style="font-size: 1.8em; color: #ff4500;">💼 실시간 포트폴리오 🔥</span></div>', unsafe_allow_html=True)
         
-        for warning in pattern_warnings:
-            if warning['level'] == 'CRITICAL':
-                st.markdown(f"### 🔴 {warning['type']}")
-                st.error(warning['message'])
-            elif warning['level'] == 'HIGH':
-                st.markdown(f"### 🟠 {warning['type']}")
-                st.warning(warning['message'])
-            else:
-                st.markdown(f"### 🟡 {warning['type']}")
-                st.info(warning['message'])
-            
-            st.markdown("---")
-    else:
-        st.success(" **현재 건강한 투자 패턴입니다!**")
-        st.info("""
-        **안전한 투자 습관:**
-        - 충분한 고민 시간
-        - 감정적 거래 없음
-        - 계획적 접근
-        
-        이 상태를 유지하세요! 💪
-        """)
-    
-    st.divider()
-    
-    # 감정 히트맵
-    st.markdown("### 📅 언제 가장 위험한가요?")
-    
-    try:
-        heatmap_fig = create_emotion_heatmap()
-        st.plotly_chart(heatmap_fig, use_container_width=True)
+        st.info("✨ pykrx 기반 실시간 주가 추적 (20분 지연)")
         
-        st.info("💡 **히트맵 해석**: 빨간색일수록 감정이 불안정한 시간대입니다. 이 시간대에는 투자 결정을 피하세요!")
-    except Exception as e:
-        st.warning("⚠️ 히트맵을 생성하려면 최소 10개 이상의 상담 기록이 필요합니다.")
-    
-    st.divider()
-    
-    # 감정 점수 추이
-    st.markdown("### 📈 내 감정은 어떻게 변했나요?")
-    
-    try:
-        timeline_fig = create_risk_timeline()
-        if timeline_fig:
-            st.plotly_chart(timeline_fig, use_container_width=True)
-            st.info("💡 **추이 분석**: 빨간 선(6.5) 이상이면 HIGH 위험, 주황 선(5.0) 이상이면 MID 주의입니다.")
-        else:
-            st.warning("⚠️ 데이터가 부족합니다. 상담을 더 진행해주세요!")
-    except Exception as e:
-        st.warning("⚠️ 차트를 생성하려면 상담 기록이 필요합니다.")
-    
-    st.divider()
-    
-    # 감정 태그 빈도
-    st.markdown("### 🏷️ 어떤 감정이 가장 많나요?")
-    
-    col_tag1, col_tag2 = st.columns([2, 1])
-    
-    with col_tag1:
-        try:
-            tag_fig = create_emotion_tag_chart()
-            if tag_fig:
-                st.plotly_chart(tag_fig, use_container_width=True)
-            else:
-                st.warning("⚠️ 감정 태그 데이터가 부족합니다.")
-        except Exception as e:
-            st.warning("⚠️ 차트를 생성하려면 상담 기록이 필요합니다.")
-    
-    with col_tag2:
-        st.markdown("#### 📌 가장 많은 감정")
-        st.metric(
-            label="",
-            value=stats['most_common_tag'],
-            delta=f"{stats['most_common_count']}회"
-        )
+        col_refresh, col_add = st.columns([1, 3])
         
-        st.markdown("---")
+        with col_refresh:
+            if st.button("🔄 포트폴리오 새로고침", use_container_width=True, type="primary"):
+                st.rerun()
         
-        st.markdown("#### 🎯 고위험 감정")
-        st.error("""
-        **주의 필요:**
-        - 탐욕
-        - 자포자기
-        - 충동
-        - FOMO
-        - 공포
-        """)
-
-    st.divider()
-    
-    # v4.3: 주간 리포트
-    st.markdown("### 📝 주간 리포트 (NEW!)")
-    
-    if st.button("📊 이번 주 리포트 생성", type="primary", use_container_width=True):
-        with st.spinner("📝 리포트 생성 중..."):
-            report = generate_weekly_report()
-            
-            # 리포트 표시
-            st.markdown("---")
-            st.markdown(f"## 🛡️ GINI Guardian 주간 리포트")
-            st.markdown(f"**📅 기간**: {report['period']}")
-            st.markdown(f"**📝 생성**: {report['generated_at']}")
+        st.divider()
+        
+        if st.session_state.portfolio:
+            with st.spinner("📊 실시간 데이터 조회 중..."):
+                updated_portfolio, summary = update_portfolio_realtime(st.session_state.portfolio)
             
-            st.divider()
+            col1, col2, col3, col4 = st.columns(4)
             
-            # 기본 통계
-            col1, col2, col3 = st.columns(3)
+            profit_color = "#28a745" if summary['총손익'] >= 0 else "#dc3545"
             
             with col1:
-                st.metric("총 상담 횟수", f"{report['total_chats']}회")
-            
+                st.markdown(f'<div class="success-float"><strong>총 매입액</strong><br>₩{summary["총매입액"]:,}</div>', unsafe_allow_html=True)
             with col2:
-                st.metric("평균 감정 점수", f"{report['avg_emotion']}/10")
-            
+                st.markdown(f'<div class="success-float"><strong>총 평가액</strong><br>₩{summary["총평가액"]:,}</div>', unsafe_allow_html=True)
             with col3:
-                st.metric("고위험 상담", f"{report['high_risk_count']}회")
+                st.markdown(f'<div style="background: {profit_color}22; color: {profit_color}; font-weight: bold; padding: 15px; border-radius: 10px;"><strong>총 손익</strong><br>₩{summary["총손익"]:+,}</div>', unsafe_allow_html=True)
+            with col4:
+                st.markdown(f'<div style="background: {profit_color}22; color: {profit_color}; font-weight: bold; padding: 15px; border-radius: 10px;"><strong>수익률</strong><br>{summary["수익률"]:+.2f}%</div>', unsafe_allow_html=True)
             
             st.divider()
             
-            # 종합 평가
-            st.markdown("### 💯 종합 평가")
-            
-            if '🔴' in report['grade']:
-                st.error(f"**{report['grade']}**")
-                st.error(report['comment'])
-            elif '🟡' in report['grade']:
-                st.warning(f"**{report['grade']}**")
-                st.warning(report['comment'])
-            else:
-                st.success(f"**{report['grade']}**")
-                st.success(report['comment'])
-            
-            st.divider()
+            st.markdown("### 📊 보유 종목")
             
-            # 주요 감정
-            if report['top_tags']:
-                st.markdown("### 🏷️ 주요 감정 TOP 3")
+            if len(updated_portfolio) > PORTFOLIO_CARD_LIMIT:
+                st.dataframe(
+                    updated_portfolio,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        '매입가': st.column_config.NumberColumn(format="₩%d"),
+                        '현재가': st.column_config.NumberColumn(format="₩%d"),
+                        '매입금액': st.column_config.NumberColumn(format="₩%d"),
+                        '평가금액': st.column_config.NumberColumn(format="₩%d"),
+                        '손익금액': st.column_config.NumberColumn(format="₩%d"),
+                        '수익률': st.column_config.NumberColumn(format="%+.2f%%"),
+                        '등락률': st.column_config.NumberColumn(format="%+.2f%%"),
+                    }
+                )
                 
-                for i, tag_data in enumerate(report['top_tags'], 1):
-                    st.info(f"**{i}위**: {tag_data['tag']} ({tag_data['count']}회)")
-            
-            st.divider()
-            
-            # 가장 위험했던 순간
-            if report['most_dangerous']:
-                st.markdown("### ⚠️ 가장 위험했던 순간")
-                st.error(f"""
-**시간**: {report['most_dangerous']['time']}  
-**감정 점수**: {report['most_dangerous']['score']}/10  
-**내용**: {report['most_dangerous']['input']}
-                """)
+                names = dict(zip(updated_portfolio['종목코드'], updated_portfolio['종목명']))
+                col_select, col_delete = st.columns([6, 1])
+                with col_select:
+                    delete_ticker = st.selectbox(
+                        "삭제할 종목",
+                        list(names),
+                        format_func=lambda ticker: f"{names[ticker]} ({ticker})",
+                        label_visibility="collapsed"
+                    )
+                with col_delete:
+                    if st.button("🗑️", key="delete_selected", help="선택 종목 삭제"):
+                        delete_portfolio_stock(current_user_id, delete_ticker)
+                        st.session_state.portfolio = [p for p in st.session_state.portfolio if p['종목코드'] != delete_ticker]
+                        st.rerun()
+            else:
+                for stock in updated_portfolio.to_dict('records'):
+                    status_emoji = "🔴" if stock['수익률'] < 0 else "🟢" if stock['수익률'] > 0 else "⚪"
+                    bg_color = "#fff3cd" if stock['수익률'] < 0 else "#d4edda" if stock['수익률'] > 0 else "#e9ecef"
+                    text_color = "#dc3545" if stock['수익률'] < 0 else "#28a745" if stock['수익률'] > 0 else "#6c757d"
+                    
+                    data_status = "⚠️ 실시간 데이터 없음" if stock['수익률'] == 0 and stock['등락률'] == 0 else ""
+                    
+                    col_stock, col_delete = st.columns([6, 1])
+                    
+                    with col_stock:
+                        st.markdown(f'''
+                        <div style="background-color: {bg_color}; padding: 12px; border-radius: 8px; margin-bottom: 8px;">
+                            {status_emoji} <strong>{stock["종목명"]}</strong> ({stock["종목코드"]}) {data_status}
+                            <br>
+                            {"평균 " if stock["매수횟수"] > 1 else ""}매입: ₩{stock["매입가"]:,} | 현재: ₩{stock["현재가"]:,} | 수량: {stock["수량"]}개{f" ({stock['매수횟수']}회 매수)" if stock["매수횟수"] > 1 else ""}
+                            <br>
+                            <span style="color: {text_color}; font-weight: bold;">
+                                수익률: {stock["수익률"]:+.2f}% | 손익: ₩{stock["손익금액"]:+,}
+                            </span>
+                        </div>
+                        ''', unsafe_allow_html=True)
+                    
+                    with col_delete:
+                        if st.button("🗑️", key=f"delete_{stock['종목코드']}", help="종목 삭제"):
+                            delete_portfolio_stock(current_user_id, stock['종목코드'])
+                            st.session_state.portfolio = [p for p in st.session_state.portfolio if p['종목코드'] != stock['종목코드']]
+                            st.rerun()
             
             st.divider()
             
-            # 거래 패턴
-            st.markdown("### 🎯 거래 패턴 분석")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.metric("과매매", " 감지됨" if report['patterns']['overtrading'] else " 없음")
-                st.metric("복수 매매", " 감지됨" if report['patterns']['revenge'] else " 없음")
+            if summary['수익률'] < -5:
+                st.error("🚨 포트폴리오 손실이 -5%를 넘었습니다! 감정적 매매를 조심하세요!")
             
-            with col2:
-                st.metric("연속 손실", " 감지됨" if report['patterns']['loss_streak'] else " 없음")
-                st.metric("FOMO 중독", " 감지됨" if report['patterns']['fomo'] else " 없음")
+            st.markdown("### 📈 성과 & 위험 분석")
             
-            st.divider()
+            try:
+                analytics = get_portfolio_analytics(portfolio_quantities(st.session_state.portfolio))
+            except Exception:
+                logger.exception("포트폴리오 성과 분석 실패")
+                analytics = None
             
-            # 요일별 상담
-            if report['by_day']:
-                st.markdown("### 📅 요일별 상담 횟수")
+            if analytics:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("연환산 변동성", f"{analytics['volatility']:.1f}%")
+                with col2:
+                    st.metric("최대 낙폭", f"{analytics['max_drawdown']:.1f}%")
+                with col3:
+                    st.metric("변동성 점수", f"{analytics['volatility_score']:.1f} / 10")
                 
-                import pandas as pd
-                df = pd.DataFrame(report['by_day'])
+                st.plotly_chart(create_portfolio_value_chart(analytics), use_container_width=True)
                 
-                import plotly.express as px
-                fig = px.bar(df, x='day', y='count',
-                            title='요일별 상담 패턴',
-                            labels={'day': '요일', 'count': '횟수'})
-                st.plotly_chart(fig, use_container_width=True)
-            
-            st.divider()
+                if analytics['beta']:
+                    st.markdown("**종목별 베타 (KOSPI 대비)**")
+                    names = dict(zip(updated_portfolio['종목코드'], updated_portfolio['종목명']))
+                    st.dataframe(
+                        pd.DataFrame(
+                            [(names.get(ticker, ticker), ticker, beta) for ticker, beta in analytics['beta'].items()],
+                            columns=['종목명', '종목코드', '베타']
+                        ),
+                        hide_index=True,
+                        use_container_width=True
+                    )
+            else:
+                st.info("📊 시세 이력이 부족해 성과 분석을 표시할 수 없습니다.")
             
-            # 텍스트 리포트
-            st.markdown("### 📄 텍스트 리포트")
+        else:
+            st.warning("📝 포트폴리오가 비어있습니다. 종목을 추가해주세요!")
+        
+        st.divider()
+        
+        st.markdown("### ➕ 종목 추가하기")
+        
+        with st.form("add_stock_form", clear_on_submit=True):
+            col1, col2, col3, col4 = st.columns(4)
             
-            report_text = create_report_text(report)
+            with col1:
+                new_ticker = st.text_input("종목코드", placeholder="042700")
+            with col2:
+                new_name = st.text_input("종목명", placeholder="한미반도체")
+            with col3:
+                new_buy_price = st.number_input("매입가", min_value=0, value=70000, step=1000)
+            with col4:
+                new_quantity = st.number_input("수량", min_value=1, value=10, step=1)
             
-            st.text_area(
-                "복사해서 저장하세요!",
-                value=report_text,
-                height=400
-            )
+            submitted = st.form_submit_button("➕ 포트폴리오에 추가", type="primary", use_container_width=True)
             
-            st.success(" 리포트가 생성되었습니다! 위 텍스트를 복사하여 저장하세요.")
-
-# ============================================================================
-# TAB 3: 상담 기록
-# ============================================================================
-
-with tab3:
-    st.subheader("📚 과거 상담 기록")
-    
-    history = load_history()
-    
-    if history:
-        st.success(f" 총 {len(history)}개의 상담 기록")
-        st.divider()
-        
-        for idx, (user, ai, emo, risk, tags, timestamp) in enumerate(history, 1):
-            with st.expander(f"💬 상담 #{idx} | {timestamp} | {tags}", expanded=False):
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    st.markdown(f"**👤 당신의 질문:**\n{user}")
-                    st.markdown(f"**💙 감정 점수:** {emo} / 10")
-                
-                with col2:
-                    st.markdown(f"**⚠️ 위험지표:** {risk.upper()}")
-                    st.markdown(f"**🏷️ 태그:** {tags}")
-                
-                st.markdown("---")
-                st.markdown(f"**🤖 AI의 답변:**\n{ai}")
-    else:
-        st.info("📝 아직 상담 기록이 없습니다.")
+            if submitted:
+                if new_ticker and new_name and new_buy_price > 0:
+                    save_portfolio_stock(current_user_id, new_ticker, new_name, new_buy_price, new_quantity)
+                    
+                    st.session_state.portfolio.append({
+                        '종목코드': new_ticker,
+                        '종목명': new_name,
+                        '매입가': new_buy_price,
+                        '수량': new_quantity
+                    })
+                    
+                    st.success(f" {new_name} ({new_ticker}) 추가 완료! 새로고침 버튼을 눌러주세요.")
+                    st.balloons()
+                else:
+                    st.warning("⚠️ 모든 항목을 올바르게 입력해주세요!")
 
-# ============================================================================
-# TAB 4: 실시간 포트폴리오
-# ============================================================================
+    # ============================================================================
+    # TAB 5: 설정
+    # ============================================================================
 
-with tab4:
-    st.markdown('<div style="text-align: center; margin-bottom: 15px;"><span class="hot-badge" style="font-size: 1.8em; color: #ff4500;">💼 실시간 포트폴리오 🔥</span></div>', unsafe_allow_html=True)
-    
-    st.info("✨ pykrx 기반 실시간 주가 추적 (20분 지연)")
-    
-    col_refresh, col_add = st.columns([1, 3])
-    
-    with col_refresh:
-        if st.button("🔄 포트폴리오 새로고침", use_container_width=True, type="primary"):
-            st.rerun()
-    
-    st.divider()
-    
-    if st.session_state.portfolio:
-        with st.spinner("📊 실시간 데이터 조회 중..."):
-            updated_portfolio, summary = update_portfolio_realtime(st.session_state.portfolio)
-        
-        col1, col2, col3, col4 = st.columns(4)
+    with tab5:
+        st.subheader("⚙️ 설정 & 정보")
         
-        profit_color = "#28a745" if summary['총손익'] >= 0 else "#dc3545"
+        st.info(f"""
+        **GINI Guardian v4.4 - 라이라 최종 수정 완료! ✨**
         
-        with col1:
-            st.markdown(f'<div class="success-float"><strong>총 매입액</strong><br>₩{summary["총매입액"]:,}</div>', unsafe_allow_html=True)
-        with col2:
-            st.markdown(f'<div class="success-float"><strong>총 평가액</strong><br>₩{summary["총평가액"]:,}</div>', unsafe_allow_html=True)
-        with col3:
-            st.markdown(f'<div style="background: {profit_color}22; color: {profit_color}; font-weight: bold; padding: 15px; border-radius: 10px;"><strong>총 손익</strong><br>₩{summary["총손익"]:+,}</div>', unsafe_allow_html=True)
-        with col4:
-            st.markdown(f'<div style="background: {profit_color}22; color: {profit_color}; font-weight: bold; padding: 15px; border-radius: 10px;"><strong>수익률</strong><br>{summary["수익률"]:+.2f}%</div>', unsafe_allow_html=True)
+        🆕 v4.4 라이라 피드백 반영:
+           -  **톤 통일**: 전문적이고 객관적인 중간 톤으로 통일
+           -  **경고 문구 전문화**: "지금 투자하면 손실 확률이 매우 높습니다" 등 명확한 표현
+           -  **행동 단계 추가**: 30초 호흡, 2분 자리 이탈, 투자 이유 적기 등 실행 가능한 액션
+           -  **압박 멘트 개선**: 더 전문적이고 분명한 경고
+           -  **행동경제학 검증**: "충동적 결정 95% 실패" 등 근거 제시
         
-        st.divider()
-        
-        st.markdown("### 📊 보유 종목")
-        
-        for stock in updated_portfolio:
-            status_emoji = "🔴" if stock['수익률'] < 0 else "🟢" if stock['수익률'] > 0 else "⚪"
-            bg_color = "#fff3cd" if stock['수익률'] < 0 else "#d4edda" if stock['수익률'] > 0 else "#e9ecef"
-            text_color = "#dc3545" if stock['수익률'] < 0 else "#28a745" if stock['수익률'] > 0 else "#6c757d"
-            
-            data_status = "⚠️ 실시간 데이터 없음" if stock['수익률'] == 0 and stock['등락률'] == 0 else ""
-            
-            col_stock, col_delete = st.columns([6, 1])
-            
-            with col_stock:
-                st.markdown(f'''
-                <div style="background-color: {bg_color}; padding: 12px; border-radius: 8px; margin-bottom: 8px;">
-                    {status_emoji} <strong>{stock["종목명"]}</strong> ({stock["종목코드"]}) {data_status}
-                    <br>
-                    매입: ₩{stock["매입가"]:,} | 현재: ₩{stock["현재가"]:,} | 수량: {stock["수량"]}개
-                    <br>
-                    <span style="color: {text_color}; font-weight: bold;">
-                        수익률: {stock["수익률"]:+.2f}% | 손익: ₩{stock["손익금액"]:+,}
-                    </span>
-                </div>
-                ''', unsafe_allow_html=True)
-            
-            with col_delete:
-                if st.button("🗑️", key=f"delete_{stock['종목코드']}", help="종목 삭제"):
-                    delete_portfolio_stock(stock['종목코드'])
-                    st.session_state.portfolio = [p for p in st.session_state.portfolio if p['종목코드'] != stock['종목코드']]
-                    st.rerun()
+         v4.3 기능:
+           - 주간 리포트 자동 생성
+           - 종합 평가 (🟢안정/🟡주의/🔴위험)
+           - TOP 3 감정 분석
+           - 텍스트 복사 가능
         
-        st.divider()
+         v4.2 기능:
+           - 과매매 감지 (3일 5회)
+           - 복수 매매 감지 (손실 후 1시간)
+           - 연속 손실 패턴
+           - FOMO 중독 감지
         
-        if summary['수익률'] < -5:
-            st.error("🚨 포트폴리오 손실이 -5%를 넘었습니다! 감정적 매매를 조심하세요!")
+         v4.1 기능:
+           - 감정 히트맵
+           - 위험지표 추이
+           - 감정 태그 빈도
+           - 통계 대시보드
         
-    else:
-        st.warning("📝 포트폴리오가 비어있습니다. 종목을 추가해주세요!")
-    
-    st.divider()
-    
-    st.markdown("### ➕ 종목 추가하기")
-    
-    with st.form("add_stock_form", clear_on_submit=True):
-        col1, col2, col3, col4 = st.columns(4)
+         v4.0 기능:
+           - 맥락 기억 시스템
+           - 감정 태그 12종
+           - 압박 멘트 시스템
+           - Text Input Blocking
         
-        with col1:
-            new_ticker = st.text_input("종목코드", placeholder="042700")
-        with col2:
-            new_name = st.text_input("종목명", placeholder="한미반도체")
-        with col3:
-            new_buy_price = st.number_input("매입가", min_value=0, value=70000, step=1000)
-        with col4:
-            new_quantity = st.number_input("수량", min_value=1, value=10, step=1)
+         기존 기능:
+           - 종목명 자동 보정
+           - 실시간 포트폴리오
+           - 감정 분석 & 위험지표
+           - 성능 최적화
         
-        submitted = st.form_submit_button("➕ 포트폴리오에 추가", type="primary", use_container_width=True)
+        **🎉 FINAL 버전 완성!**
+        **행동경제학 검증 + 라이라 UX 완성**
+        """)
         
-        if submitted:
-            if new_ticker and new_name and new_buy_price > 0:
-                save_portfolio_stock(new_ticker, new_name, new_buy_price, new_quantity)
-                
-                st.session_state.portfolio.append({
-                    '종목코드': new_ticker,
-                    '종목명': new_name,
-                    '매입가': new_buy_price,
-                    '수량': new_quantity
-                })
-                
-                st.success(f" {new_name} ({new_ticker}) 추가 완료! 새로고침 버튼을 눌러주세요.")
-                st.balloons()
-            else:
-                st.warning("⚠️ 모든 항목을 올바르게 입력해주세요!")
-
-# ============================================================================
-# TAB 5: 설정
-# ============================================================================
-
-with tab5:
-    st.subheader("⚙️ 설정 & 정보")
-    
-    st.info(f"""
-    **GINI Guardian v4.4 - 라이라 최종 수정 완료! ✨**
-    
-    🆕 v4.4 라이라 피드백 반영:
-       -  **톤 통일**: 전문적이고 객관적인 중간 톤으로 통일
-       -  **경고 문구 전문화**: "지금 투자하면 손실 확률이 매우 높습니다" 등 명확한 표현
-       -  **행동 단계 추가**: 30초 호흡, 2분 자리 이탈, 투자 이유 적기 등 실행 가능한 액션
-       -  **압박 멘트 개선**: 더 전문적이고 분명한 경고
-       -  **행동경제학 검증**: "충동적 결정 95% 실패" 등 근거 제시
-    
-     v4.3 기능:
-       - 주간 리포트 자동 생성
-       - 종합 평가 (🟢안정/🟡주의/🔴위험)
-       - TOP 3 감정 분석
-       - 텍스트 복사 가능
-    
-     v4.2 기능:
-       - 과매매 감지 (3일 5회)
-       - 복수 매매 감지 (손실 후 1시간)
-       - 연속 손실 패턴
-       - FOMO 중독 감지
-    
-     v4.1 기능:
-       - 감정 히트맵
-       - 위험지표 추이
-       - 감정 태그 빈도
-       - 통계 대시보드
-    
-     v4.0 기능:
-       - 맥락 기억 시스템
-       - 감정 태그 12종
-       - 압박 멘트 시스템
-       - Text Input Blocking
-    
-     기존 기능:
-       - 종목명 자동 보정
-       - 실시간 포트폴리오
-       - 감정 분석 & 위험지표
-       - 성능 최적화
-    
-    **🎉 FINAL 버전 완성!**
-    **행동경제학 검증 + 라이라 UX 완성**
-    """)
-    
-    st.markdown("#### 📋 기술 스택")
-    st.code("""
+        st.markdown("#### 📋 기술 스택")
+        st.code("""
 - Streamlit: UI/UX
 - Groq API: AI 상담
 - pykrx: 실시간 주식 데이터
@@ -2396,32 +5594,94 @@ with tab5:
 - 패턴 감지: 과매매/복수매매/연속손실/FOMO
 - 주간 리포트: 자동 생성 + 텍스트 복사 (NEW!)
     """, language="python")
-    
-    st.markdown("#### 🎯 v4.3 주간 리포트 전략")
-    st.write("""
-    **주간 리포트의 힘:**
-    - 객관적으로 나를 돌아보기
-    - 한 주 동안의 패턴 파악
-    - 다음 주 목표 설정
-    
-    **리포트 구성:**
-    1. 기본 통계 (상담 횟수, 평균 점수)
-    2. 종합 평가 (🟢안정/🟡주의/🔴위험)
-    3. 주요 감정 TOP 3
-    4. 가장 위험했던 순간
-    5. 거래 패턴 분석
-    6. 요일별 차트
-    
-    **v4.4 라이라 최종 수정:**
-    1. 톤 통일 (전문적 중간 톤)
-    2. 경고 문구 전문화
-    3. 행동 단계 추가 (행동경제학 검증)
-    
-    **🎉 FINAL 버전 완성!**
-    
-    **라이라 설계 × 미라클 구현 × 제미니 전략**
-    """)
+        
+        st.markdown("#### 🎯 v4.3 주간 리포트 전략")
+        st.write("""
+        **주간 리포트의 힘:**
+        - 객관적으로 나를 돌아보기
+        - 한 주 동안의 패턴 파악
+        - 다음 주 목표 설정
+        
+        **리포트 구성:**
+        1. 기본 통계 (상담 횟수, 평균 점수)
+        2. 종합 평가 (🟢안정/🟡주의/🔴위험)
+        3. 주요 감정 TOP 3
+        4. 가장 위험했던 순간
+        5. 거래 패턴 분석
+        6. 요일별 차트
+        
+        **v4.4 라이라 최종 수정:**
+        1. 톤 통일 (전문적 중간 톤)
+        2. 경고 문구 전문화
+        3. 행동 단계 추가 (행동경제학 검증)
+        
+        **🎉 FINAL 버전 완성!**
+        
+        **라이라 설계 × 미라클 구현 × 제미니 전략**
+        """)
+
+        st.markdown("#### 🧠 AI 응답 캐시")
+        
+        cache_stats = get_llm_cache_stats()
+        col_c1, col_c2, col_c3, col_c4 = st.columns(4)
+        col_c1.metric("적중", f"{cache_stats['hits']}회")
+        col_c2.metric("실패", f"{cache_stats['misses']}회")
+        col_c3.metric("적중률", f"{cache_stats['hit_rate']}%")
+        col_c4.metric("저장 항목", f"{cache_stats['size']}개")
+        
+        st.checkbox("캐시 사용 안 함 (항상 새로 상담)", key="llm_cache_bypass")
+        
+        st.markdown("#### 🔧 데이터 관리")
+        
+        if st.button("📊 내 대시보드 집계 다시 계산", use_container_width=True):
+            with st.spinner("📊 상담 기록 집계 중..."):
+                flush_writes(current_user_id)
+                rebuild_chat_aggregates(current_user_id)
+                _invalidate_chat_caches({current_user_id})
+            st.success(" 대시보드 집계를 다시 계산했습니다.")
+        
+        # 아래는 모든 사용자가 공유하는 데이터 → 관리자만
+        if is_admin_user(current_user_id):
+            st.markdown("#### 🛠️ 관리자")
+            
+            if st.button("🗑️ AI 응답 캐시 비우기 (전체 사용자)", use_container_width=True):
+                clear_llm_cache()
+                st.success(" 캐시를 비웠습니다.")
+            
+            emotion_model = get_emotion_model()['model']
+            if emotion_model:
+                st.caption(f"🧮 로컬 감정 분류기: {emotion_model['samples']:,}건 학습, 평균 오차 {emotion_model['mae']:.2f}점 ({emotion_model['trained_at']})")
+            else:
+                st.caption(f"🧮 로컬 감정 분류기: 학습 전 (감정점수가 있는 상담 {EMOTION_MODEL_MIN_SAMPLES}건 이상 필요, 그 전에는 감정 사전으로 추정)")
+            
+            if st.button("🧮 로컬 감정 분류기 다시 학습", use_container_width=True):
+                if schedule_emotion_model_training(force=True):
+                    st.success(" 백그라운드에서 학습을 시작했습니다. 잠시 후 새로고침하면 결과가 표시됩니다.")
+                else:
+                    st.info("이미 학습 중입니다.")
+            
+            # 전체 chats 재태깅은 요청 스레드에서 돌리지 않음 → retag.py를 별도 프로세스로 실행
+            retag_checkpoint = get_job_checkpoint()
+            retag_running = is_retag_job_running()
+            retag_resumable = retag_checkpoint is not None and retag_checkpoint['finished_at'] is None
+            if retag_running:
+                st.info(f"🏷️ 재태깅 진행 중 ({retag_checkpoint['processed'] if retag_checkpoint else 0:,}건 처리) - 새로고침하면 갱신됩니다.")
+            elif retag_resumable:
+                st.warning(f"⏸️ 중단된 재태깅 작업이 있습니다 ({retag_checkpoint['processed']:,}건까지 처리)")
+            elif retag_checkpoint:
+                st.caption(f"마지막 재태깅: {retag_checkpoint['finished_at']} ({retag_checkpoint['changed']:,}건 변경)")
+            
+            if st.button("🏷️ 감정 태그/위험도 다시 계산" + (" (이어하기)" if retag_resumable else ""),
+                         disabled=retag_running, use_container_width=True):
+                if start_retag_job():
+                    st.success(" 백그라운드에서 재태깅을 시작했습니다. 잠시 후 새로고침하면 진행 상황이 표시됩니다.")
+                else:
+                    st.info("이미 재태깅 중입니다.")
+            st.caption("🏷️ 서버에서 직접 실행: `python retag.py [--restart] [--workers N]` (중단되면 같은 명령으로 이어하기)")
+
+    st.divider()
 
-st.divider()
+    st.markdown("---\n🛡️ **GINI Guardian v4.4 FINAL** | ✨ 라이라 최종 수정 완료! | 💙 라이라 × 미라클 × 제미니")
 
-st.markdown("---\n🛡️ **GINI Guardian v4.4 FINAL** | ✨ 라이라 최종 수정 완료! | 💙 라이라 × 미라클 × 제미니")
+if __name__ == "__main__":
+    main()
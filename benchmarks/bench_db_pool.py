@@ -0,0 +1,86 @@
+"""
+채팅 1턴의 DB 오버헤드 - 호출마다 sqlite3.connect/close (기존 방식) vs get_connection() 풀
+
+    python benchmarks/bench_db_pool.py [--turns 300] [--history 2000]
+
+한 턴 = 데이터 함수 8회 호출 (상담 저장, 기록 조회, 패턴 감지 4종, 맥락 기억, 위험 순간 저장)
+- connect-per-call: 기존 코드처럼 호출마다 기본 PRAGMA(rollback 저널, synchronous=FULL) 연결을 열고 닫음
+- pooled: 같은 SQL을 get_connection()으로 실행 (WAL + 연결 재사용)
+"""
+import argparse
+import sqlite3
+
+from common import load_app, measure, report, scratch_dir
+
+SAVE_CHAT = (
+    "INSERT INTO chats (user_input, ai_response, emotion_score, risk_level, tags) VALUES (?, ?, ?, ?, ?)",
+    ("지금 물타기 할까요", "잠시 멈추세요", 7.5, "HIGH", "불안, 충동"),
+)
+
+# 데이터 함수 1개 = 연결 1회에서 실행하는 SQL 묶음
+TURN_CALLS = [
+    [SAVE_CHAT],
+    [("SELECT user_input, ai_response, emotion_score, risk_level, tags, timestamp FROM chats ORDER BY id DESC LIMIT 50", ())],
+    [("SELECT COUNT(*) FROM chats WHERE timestamp >= datetime('now', '-3 days')", ())],
+    [("SELECT user_input, emotion_score, timestamp FROM chats ORDER BY id DESC LIMIT 2", ())],
+    [("SELECT user_input, emotion_score FROM chats ORDER BY id DESC LIMIT 5", ())],
+    [("SELECT user_input FROM chats ORDER BY id DESC LIMIT 10", ())],
+    [
+        ("SELECT timestamp, risk_score, emotion_tags, user_input FROM dangerous_moments ORDER BY risk_score DESC LIMIT 5", ()),
+        ("SELECT hour_of_day, day_of_week, investment_purpose, pattern_count FROM addiction_patterns ORDER BY pattern_count DESC LIMIT 3", ()),
+        ("SELECT emotion_tag, SUM(CASE WHEN user_stopped = 1 THEN 1 ELSE 0 END), COUNT(*) FROM pressure_messages GROUP BY emotion_tag", ()),
+    ],
+    [(
+        "INSERT INTO dangerous_moments (timestamp, risk_score, emotion_tags, user_input) VALUES (datetime('now'), ?, ?, ?)",
+        (8.0, "불안", "지금 물타기 할까요"),
+    )],
+]
+
+
+def connect_per_call_turn(path):
+    for statements in TURN_CALLS:
+        conn = sqlite3.connect(path, timeout=5.0)
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params).fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def pooled_turn(app):
+    for statements in TURN_CALLS:
+        with app.get_connection() as conn:
+            for sql, params in statements:
+                conn.execute(sql, params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--history", type=int, default=2000, help="미리 넣어 둘 상담 기록 수")
+    args = parser.parse_args()
+
+    workdir = scratch_dir()
+    app = load_app(workdir)
+
+    # 같은 스키마/데이터로 시작: 풀 DB(WAL)를 복사한 뒤 복사본만 기존 기본값(rollback 저널)으로
+    app.create_tables()
+    with app.get_connection() as conn:
+        conn.executemany(SAVE_CHAT[0], [SAVE_CHAT[1]] * args.history)
+    plain_path = str(workdir / "connect_per_call.db")
+    source, plain = sqlite3.connect(app.DB_PATH), sqlite3.connect(plain_path)
+    source.backup(plain)
+    plain.execute("PRAGMA journal_mode=DELETE")
+    source.close()
+    plain.close()
+
+    print(f"\n{args.turns} turns x {len(TURN_CALLS)} calls, {args.history} chats in history\n")
+    report([
+        ("connect-per-call", measure(lambda: connect_per_call_turn(plain_path), args.turns)),
+        ("pooled", measure(lambda: pooled_turn(app), args.turns)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+로컬 감정 분류기 - 학습 시간, 평가 오차 (상수 예측 대비), 메시지 1건 예측 시간
+
+    python benchmarks/bench_emotion_model.py [--rows 2500] [--repeat 200]
+
+합성 상담: 감정 사전 키워드 + 일상 문장을 섞고, 고위험 키워드가 많을수록 높은 점수 (잡음 포함)
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from common import load_app, measure, report, scratch_dir
+
+FILLER = [
+    "오늘 장이", "삼성전자", "계좌를 보니", "퇴근하고", "어제부터", "주식 앱을", "친구가", "뉴스에서",
+    "생각보다", "조금", "이번 주", "반도체", "배당", "차트를", "시장이", "ETF",
+]
+
+
+def make_corpus(app, rows, seed):
+    rng = random.Random(seed)
+    risky = [word for tag in app.get_high_risk_tags() for word in app.EMOTION_LEXICON[tag]]
+    calm = list(app.EMOTION_LEXICON["냉정"])
+    texts, scores = [], []
+    for _ in range(rows):
+        hot = rng.randint(0, 4)
+        cool = rng.randint(0, 2)
+        words = rng.sample(FILLER, 6) + rng.choices(risky, k=hot) + rng.choices(calm, k=cool)
+        rng.shuffle(words)
+        texts.append(" ".join(words))
+        scores.append(float(np.clip(3 + 1.5 * hot - 1.2 * cool + rng.gauss(0, 0.7), 0, 10)))
+    return texts, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2500, help="학습 상담 수")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    app = load_app(scratch_dir())
+    app.create_tables()
+    texts, scores = make_corpus(app, args.rows, seed=1)
+    test_texts, test_scores = make_corpus(app, 500, seed=2)
+
+    start = time.perf_counter()
+    model = app.train_emotion_model(texts, scores)
+    train_s = time.perf_counter() - start
+    app.get_emotion_model()["model"] = model
+
+    predicted = np.array([app.predict_emotion_score(text) for text in test_texts])
+    mae = np.abs(predicted - np.array(test_scores)).mean()
+    baseline = np.abs(np.mean(scores) - np.array(test_scores)).mean()
+
+    message = " ".join(test_texts[:3])[:135]
+    print(f"\n{args.rows:,} training rows: training {train_s:.2f} s, test MAE {mae:.2f} (constant baseline {baseline:.2f})")
+    print(f"prediction for a {len(message)}-character message\n")
+    report([
+        ("predict_emotion_score", measure(lambda: app.predict_emotion_score(message), args.repeat)),
+        ("lexicon fallback", measure(lambda: app.lexicon_emotion_score(message), args.repeat)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+감정 태깅 + 패턴 키워드 - 키워드마다 `in` 검사 (기존 방식) vs 공유 오토마톤 1회 스캔 + 결과 캐시
+
+    python benchmarks/bench_keyword_tagger.py [--repeat 200]
+
+- cold: 캐시를 비운 상태에서 메시지 1개 태깅 (실제 상담 길이 / 긴 합성 메시지)
+- warm window: 한 턴의 분석처럼 최근 5개 상담에 태그 + 감지기 2종(손실, FOMO) 키워드 검사
+"""
+import argparse
+
+from common import load_app, measure, report, scratch_dir
+
+REALISTIC = (
+    "어제 삼성전자 손실 보고 너무 불안해서 잠을 못 잤어요. 다들 2차전지로 돈 벌었다는데 나만 놓쳤고, "
+    "지금이라도 몰빵해서 들어갈까 고민 중이에요. 어차피 이미 망했으니 상관없다는 생각도 들고, "
+    "계획 세워서 냉정하게 분석해야 하는 건 아는데 자꾸 급해져요. 떨어질 때마다 후회만 되고 "
+    "당장 뭐라도 사야 할 것 같아요. 남들은 급등주 잡아서 대박 났다는데 저만 마이너스예요. "
+    "진짜 우울하고 지쳤어요. 이번엔 정말 더 많이 벌고 싶은데 또 잃을까 봐 무서워요."
+)
+SYNTHETIC = (REALISTIC + " 와! 완전 미쳤다 진짜! 의심스럽고 조작 같아요 -5% ") * 2
+
+OLD_TAG_KEYWORDS = {
+    "불안": ["불안", "걱정", "두려", "무서", "떨려"],
+    "분노": ["손실", "떨어", "내려", "털렸", "씨발", "화나", "짜증"],
+    "충동": ["사도", "들어갈", "몰빵", "급", "지금", "당장"],
+    "후회": ["후회", "실수", "잘못", "했어야"],
+    "탐욕": ["더", "많이", "대박", "벌고", "수익", "올랐", "급등"],
+    "공포": ["망했", "끝났", "파산", "다 잃", "무섭"],
+    "FOMO": ["남들은", "다들", "나만", "놓쳤", "늦었", "올라가는데"],
+    "자포자기": ["어차피", "상관없", "아무거나", "됐어", "포기"],
+    "우울": ["우울", "힘들", "지쳤", "포기하고싶", "의미없"],
+    "흥분": ["와!", "대박", "완전", "진짜!", "미쳤"],
+    "회의감": ["의심", "믿을수없", "사기", "조작", "속았"],
+    "냉정": ["분석", "계획", "전략", "냉정", "객관"],
+}
+OLD_LOSS_WORDS = ["손실", "떨어", "손해", "마이너스", "잃", "물렸"]
+OLD_FOMO_WORDS = ["급등", "올라", "놓쳤", "남들", "다들", "나만", "뒤쳐"]
+
+
+def old_detect_tags(text):
+    tags = [tag for tag, words in OLD_TAG_KEYWORDS.items() if any(word in text for word in words)]
+    return tags if tags else ["중립"]
+
+
+def old_window(texts):
+    for text in texts:
+        old_detect_tags(text)
+    sum(1 for text in texts if any(word in text for word in OLD_LOSS_WORDS))
+    sum(1 for text in texts[:3] if any(word in text for word in OLD_FOMO_WORDS))
+
+
+def new_window(app, texts):
+    for text in texts:
+        app.detect_tags(text)
+    sum(1 for text in texts if app.tag_text(text)['counts']['loss_streak'])
+    sum(1 for text in texts[:3] if app.tag_text(text)['counts']['fomo_streak'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    app = load_app(scratch_dir())
+    cache = app.get_lexicon_automaton()['cache']
+
+    def cold_tag(text):
+        cache.clear()
+        app.tag_text(text)
+
+    for label, text in (("realistic", REALISTIC), ("synthetic", SYNTHETIC)):
+        print(f"\ncold, {label} {len(text)}-char message\n")
+        report([
+            ("any() per keyword", measure(lambda: old_detect_tags(text), args.repeat)),
+            ("automaton scan", measure(lambda: cold_tag(text), args.repeat)),
+        ])
+
+    window = [REALISTIC[i * 60:(i + 2) * 60] for i in range(5)]
+    print("\nwarm, tags + 2 detectors over a 5-message window\n")
+    report([
+        ("any() per keyword", measure(lambda: old_window(window), args.repeat)),
+        ("cached tag_text", measure(lambda: new_window(app, window), args.repeat)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
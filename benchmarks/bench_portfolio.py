@@ -0,0 +1,98 @@
+"""
+포트폴리오 평가 - lot마다 dict를 만드는 기존 루프 vs value_portfolio() (NumPy 벡터 연산)
+
+    python benchmarks/bench_portfolio.py [--repeat 20] [--tickers 2000]
+
+시세는 미리 받아 둔 상태 (조회 시간 제외), 종목 중 10%는 시세 없음
+"""
+import argparse
+import random
+
+from common import load_app, measure, report, scratch_dir
+
+LOT_COUNTS = (10, 1_000, 100_000)
+
+
+def make_portfolio(lots, tickers, seed=0):
+    rng = random.Random(seed)
+    codes = [f"{n:06d}" for n in range(min(lots, tickers))]
+    portfolio = [
+        {
+            '종목코드': rng.choice(codes),
+            '종목명': '테스트',
+            '매입가': rng.randrange(1_000, 500_000, 10),
+            '수량': rng.randrange(1, 100),
+        }
+        for _ in range(lots)
+    ]
+    quotes = {
+        code: None if rng.random() < 0.1 else {
+            '종목명': f"종목{code}",
+            '현재가': rng.randrange(1_000, 500_000, 10),
+            '등락률': round(rng.uniform(-5, 5), 2),
+        }
+        for code in codes
+    }
+    return portfolio, quotes
+
+
+def per_dict_loop(portfolio, quotes):
+    """변경 전 update_portfolio_realtime의 평가 루프"""
+    updated = []
+    total_buy = 0
+    total_value = 0
+    for item in portfolio:
+        data = quotes.get(item['종목코드'])
+        buy_amount = item['매입가'] * item['수량']
+        if data:
+            current_amount = data['현재가'] * item['수량']
+            updated.append({
+                '종목코드': item['종목코드'],
+                '종목명': data['종목명'],
+                '매입가': item['매입가'],
+                '현재가': data['현재가'],
+                '수량': item['수량'],
+                '매입금액': buy_amount,
+                '평가금액': current_amount,
+                '손익금액': current_amount - buy_amount,
+                '수익률': round((data['현재가'] - item['매입가']) / item['매입가'] * 100, 2),
+                '등락률': data['등락률'],
+            })
+        else:
+            current_amount = buy_amount
+            updated.append({
+                '종목코드': item['종목코드'],
+                '종목명': item.get('종목명', '정보없음'),
+                '매입가': item['매입가'],
+                '현재가': item['매입가'],
+                '수량': item['수량'],
+                '매입금액': buy_amount,
+                '평가금액': buy_amount,
+                '손익금액': 0,
+                '수익률': 0.0,
+                '등락률': 0.0,
+            })
+        total_buy += buy_amount
+        total_value += current_amount
+    return updated, total_buy, total_value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tickers", type=int, default=2000, help="서로 다른 종목 수 상한")
+    args = parser.parse_args()
+
+    app = load_app(scratch_dir())
+
+    for lots in LOT_COUNTS:
+        portfolio, quotes = make_portfolio(lots, args.tickers)
+        print(f"\n{lots:,} lots, {len(quotes):,} tickers\n")
+        report([
+            ("per-dict loop", measure(lambda: per_dict_loop(portfolio, quotes), args.repeat)),
+            ("value_portfolio", measure(lambda: app.value_portfolio(portfolio, quotes), args.repeat)),
+        ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+상담 전문 검색 - FTS5 trigram + 사용자 후보 순위 (search_chats) vs 전체 말뭉치 bm25()
+
+    python benchmarks/bench_search.py [--users 990] [--rows 1000] [--heavy 10000] [--lookups 100]
+
+- 사용자 --users명 x --rows건 + 기록이 많은 사용자 1명 (--heavy건), 트리거로 색인하며 적재
+- 검색어 종류별로 무작위 사용자 --lookups명 검색, 캐시를 거치지 않은 p50 / p95 (ms, 순위 + 스니펫 포함)
+- 흔한 단어는 FTS5 bm25() 정렬(전체 문서 수로 IDF 계산)과도 비교
+"""
+import argparse
+import random
+import statistics
+import time
+
+from common import load_app, scratch_dir
+
+SYLLABLES = "가나다라마바사아자차카타파하거너더러머버서어저처커터퍼허고노도로모보소오조초"
+# (단어, 상담에 들어갈 확률)
+PLANTED = [("삼성전자", 0.30), ("반도체", 0.05), ("급등", 0.05), ("손절", 0.05), ("에코프로비엠", 0.002)]
+HEAVY_USER = "heavy@example.com"
+
+
+def make_text(rng, vocabulary):
+    words = rng.choices(vocabulary, k=rng.randint(6, 15))
+    words += [word for word, rate in PLANTED if rng.random() < rate]
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def load_corpus(app, users, rows, heavy, rng):
+    vocabulary = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(3000)]
+    owners = [(f"user-{n}", rows) for n in range(users)] + [(HEAVY_USER, heavy)]
+    start = time.perf_counter()
+    total = 0
+    with app.get_connection() as conn:
+        for user_id, count in owners:
+            conn.executemany("""
+            INSERT INTO chats (user_id, user_input, ai_response, emotion_score, risk_level, tags)
+            VALUES (?, ?, ?, 5.0, 'low', '중립')
+            """, [(user_id, make_text(rng, vocabulary), make_text(rng, vocabulary)) for _ in range(count)])
+            total += count
+    return total, (time.perf_counter() - start) * 1000 / total
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=990)
+    parser.add_argument("--rows", type=int, default=1000, help="일반 사용자당 상담 수")
+    parser.add_argument("--heavy", type=int, default=10000, help="기록이 많은 사용자 1명의 상담 수")
+    parser.add_argument("--lookups", type=int, default=100)
+    args = parser.parse_args()
+
+    app = load_app(scratch_dir())
+    app.create_tables()
+    rng = random.Random(24)
+    total, insert_ms = load_corpus(app, args.users, args.rows, args.heavy, rng)
+
+    start = time.perf_counter()
+    with app.get_connection() as conn:
+        conn.execute("INSERT INTO chats_fts (chats_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO chats_fts (chats_fts) VALUES ('optimize')")
+        conn.execute("ANALYZE")
+    rebuild_s = time.perf_counter() - start
+
+    def search(user_id, query):
+        return app._search_chats.__wrapped__(user_id, None, tuple(query.split()), app.SEARCH_RESULT_LIMIT)
+
+    def global_bm25(user_id, query):
+        match = f'user_key : "#{user_id}#" AND "{query}"'
+        with app.get_connection() as conn:
+            conn.execute("""
+            SELECT rowid FROM chats_fts WHERE chats_fts MATCH ? ORDER BY bm25(chats_fts) LIMIT ?
+            """, (match, app.SEARCH_RESULT_LIMIT)).fetchall()
+
+    def timed(fn, user_ids, query):
+        samples = []
+        for user_id in user_ids:
+            start = time.perf_counter()
+            fn(user_id, query)
+            samples.append((time.perf_counter() - start) * 1000)
+        return percentiles(samples)
+
+    user_ids = [f"user-{rng.randrange(args.users)}" for _ in range(args.lookups)]
+    heavy_ids = [HEAVY_USER] * args.lookups
+    cases = [
+        ("rare word", search, user_ids, "에코프로비엠"),
+        ("common word", search, user_ids, "삼성전자"),
+        ("common word, global bm25()", global_bm25, user_ids, "삼성전자"),
+        ("two words", search, user_ids, "반도체 급등"),
+        ("FTS word + 2-char LIKE word", search, user_ids, "반도체 손절"),
+        ("no hit", search, user_ids, "없는단어"),
+        ("2-char word (LIKE only)", search, user_ids, "손절"),
+        ("rare word, heavy user", search, heavy_ids, "에코프로비엠"),
+        ("common word, heavy user", search, heavy_ids, "삼성전자"),
+    ]
+
+    print(f"\n{total:,} chats ({args.users} users x {args.rows:,} + 1 user x {args.heavy:,})")
+    print(f"insert with FTS trigger {insert_ms:.3f} ms/row, rebuild + optimize {rebuild_s:.1f} s\n")
+    width = max(len(name) for name, *_ in cases)
+    print(f"{'':{width}}  {'p50 ms':>8}  {'p95 ms':>8}")
+    for name, fn, ids, query in cases:
+        p50, p95 = timed(fn, ids, query)
+        print(f"{name:{width}}  {p50:8.2f}  {p95:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
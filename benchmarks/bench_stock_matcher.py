@@ -0,0 +1,84 @@
+"""
+종목명 퍼지 매칭 - 전 종목 SequenceMatcher 비교 (기존 방식) vs 글자 색인 + 상한 가지치기
+
+    python benchmarks/bench_stock_matcher.py [--repeat 20] [--names 2700]
+
+내장 종목에 무작위 종목명을 더해 전 종목 규모 목록을 만들고,
+채팅 메시지 4개의 토큰을 매칭 (토큰별 결과 캐시는 거치지 않음)
+"""
+import argparse
+import random
+import time
+
+from common import load_app, measure, report, scratch_dir
+
+SYLLABLES = "가나다라마바사아자차카타파하삼성전자현대기아에코프로셀트리온한미반도체카오게임즈뱅크화학금융지주바이오"
+
+MESSAGES = [
+    "상승전자 지금 물타기 해도 될까요 너무 떨어졌어요",
+    "에코프로비엠이랑 셀트리욘 중에 뭘 살지 고민돼요",
+    "카카오뱅크 손절하고 한미반도채로 갈아탈까 생각중",
+    "현대자동차 기아 둘 다 들고 있는데 불안해서 잠이 안와요",
+]
+
+
+def market_names(app, size, seed=7):
+    rng = random.Random(seed)
+    names = dict(app.STOCK_NAMES_DB)
+    while len(names) < size:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 7)))
+        names.setdefault(name, f"{len(names):06d}")
+    return names
+
+
+def linear_scan(app, names, word, threshold=0.7):
+    """색인 도입 전 find_similar_stock"""
+    similarities = [
+        (name, code, app.get_similarity(word, name))
+        for name, code in names.items()
+    ]
+    similarities = [item for item in similarities if item[2] >= threshold]
+    similarities.sort(key=lambda x: x[2], reverse=True)
+    return similarities[:3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--names", type=int, default=2700, help="종목명 수")
+    args = parser.parse_args()
+
+    app = load_app(scratch_dir())
+    names = market_names(app, args.names)
+    tokens = [message.split() for message in MESSAGES]
+
+    start = time.perf_counter()
+    index = app.build_stock_name_index(names)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    def scan_messages():
+        for words in tokens:
+            for word in words:
+                linear_scan(app, names, word)
+
+    def indexed_messages():
+        for words in tokens:
+            for word in words:
+                app._rank_similar_stocks(index, word, 0.7)
+
+    mismatches = [
+        word for words in tokens for word in words
+        if app._rank_similar_stocks(index, word, 0.7) != linear_scan(app, names, word)
+    ]
+
+    token_count = sum(len(words) for words in tokens)
+    print(f"\n{len(names):,} names, {len(MESSAGES)} messages, {token_count} tokens (times are per 4 messages)")
+    print(f"index build: {build_ms:.1f} ms, results differing from full scan: {len(mismatches)}\n")
+    report([
+        ("linear SequenceMatcher scan", measure(scan_messages, args.repeat)),
+        ("indexed", measure(indexed_messages, args.repeat)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
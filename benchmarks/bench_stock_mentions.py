@@ -0,0 +1,60 @@
+"""
+종목 언급 추출 - 공백 분리 + 단어마다 퍼지 매칭 (기존 방식) vs 오토마톤 1회 스캔 + 남은 단어만 퍼지 매칭
+
+    python benchmarks/bench_stock_mentions.py [--repeat 50] [--chars 1200]
+
+긴 상담 메시지 1개 기준, 퍼지 매칭 토큰 캐시는 채운 상태 (warm)
+"""
+import argparse
+
+from common import load_app, measure, report, scratch_dir
+
+SENTENCES = [
+    "어제 삼성전자를 7만원에 샀는데 오늘 또 떨어져서 너무 불안해요.",
+    "하이닉스가 오른다길래 SK하이닉스 추가 매수했는데 물려버렸어요.",
+    "카카오랑 NAVER 중에 뭘 손절해야 할지 모르겠어요 ㅠㅠ",
+    "에코프로비엠은 계속 빠지고 셀트리욘은 왜 이렇게 안 오르죠?",
+    "한미반도채 지금 들어가도 될까요? 다들 간다고 하던데.",
+    "현대자동차 기아 둘 다 들고 있는데 잠이 안 와요.",
+]
+
+
+def make_message(chars):
+    parts = []
+    while sum(len(part) + 1 for part in parts) < chars:
+        parts.append(SENTENCES[len(parts) % len(SENTENCES)])
+    return " ".join(parts)
+
+
+def split_and_fuzzy(app, text):
+    """오토마톤 도입 전 extract_and_correct_stocks"""
+    found_stocks = []
+    corrected_text = text
+    for word in text.split():
+        matches = app.find_similar_stock(word, threshold=0.7)
+        if matches:
+            stock_name, stock_code, similarity = matches[0]
+            corrected_text = corrected_text.replace(word, stock_name)
+            found_stocks.append((word, stock_name, stock_code, similarity))
+    return corrected_text, found_stocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--chars", type=int, default=1200, help="메시지 길이 (글자)")
+    args = parser.parse_args()
+
+    app = load_app(scratch_dir())
+    message = make_message(args.chars)
+
+    print(f"\n{len(message):,}-character message\n")
+    report([
+        ("split + fuzzy per word", measure(lambda: split_and_fuzzy(app, message), args.repeat)),
+        ("automaton scan only", measure(lambda: app.find_stock_mentions(message), args.repeat)),
+        ("extract_and_correct_stocks", measure(lambda: app.extract_and_correct_stocks(message), args.repeat)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
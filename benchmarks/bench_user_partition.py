@@ -0,0 +1,96 @@
+"""
+사용자별 조회 부하 - 사용자 수를 늘려도 (user_id, ...) 인덱스 조회 시간이 그대로인지
+
+    python benchmarks/bench_user_partition.py [--users 100 1000 10000] [--chats 200] [--lookups 300]
+
+- 단계마다 사용자를 추가 (사용자당 상담 --chats개, 지난 30일에 고르게, 태그 1~2개)
+- 무작위 사용자 --lookups명에 대해 조회 1회씩, 캐시를 거치지 않은 p50 (ms)
+  history: 상담 기록 첫 페이지 (20개) / window: 패턴 분석 구간 / week: 주간 상담 수 / tags7d: 주간 태그 상위 3개
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from common import load_app, scratch_dir
+
+TAGS = ["불안", "충동", "후회", "공포", "FOMO", "냉정"]
+WEEK_COUNT = "SELECT COUNT(*) FROM chats WHERE user_id = ? AND timestamp >= ?"
+TAGS_7D = """
+SELECT tag, COUNT(*) AS tag_count FROM chat_tags
+WHERE user_id = ? AND timestamp >= ?
+GROUP BY tag ORDER BY tag_count DESC LIMIT 3
+"""
+
+
+def add_users(app, first, last, chats, rng):
+    """user-{first}..user-{last-1}의 상담/태그 행을 직접 삽입"""
+    now = datetime.now()
+    with app.get_connection() as conn:
+        for n in range(first, last):
+            user_id = f"user-{n}"
+            for _ in range(chats):
+                timestamp = (now - timedelta(seconds=rng.randrange(30 * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+                tags = rng.sample(TAGS, rng.randint(1, 2))
+                chat_id = conn.execute("""
+                INSERT INTO chats (user_id, user_input, ai_response, emotion_score, risk_level, tags, timestamp)
+                VALUES (?, '지금 살까요', '잠시 멈추세요', ?, 'LOW', ?, ?)
+                """, (user_id, rng.uniform(0, 10), ", ".join(tags), timestamp)).lastrowid
+                conn.executemany(
+                    "INSERT INTO chat_tags (chat_id, user_id, tag, timestamp) VALUES (?, ?, ?, ?)",
+                    [(chat_id, user_id, tag, timestamp) for tag in tags],
+                )
+
+
+def p50(fn, user_ids):
+    samples = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        fn(user_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1000, 10000], help="단계별 누적 사용자 수")
+    parser.add_argument("--chats", type=int, default=200, help="사용자당 상담 수")
+    parser.add_argument("--lookups", type=int, default=300, help="단계마다 조회할 무작위 사용자 수")
+    args = parser.parse_args()
+
+    app = load_app(scratch_dir())
+    app.create_tables()
+    rng = random.Random(1)
+    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def week(user_id):
+        with app.get_connection() as conn:
+            conn.execute(WEEK_COUNT, (user_id, week_ago)).fetchone()
+
+    def tags7d(user_id):
+        with app.get_connection() as conn:
+            conn.execute(TAGS_7D, (user_id, week_ago)).fetchall()
+
+    queries = [
+        ("history", lambda user_id: app._load_history_page.__wrapped__(user_id, None, None, 20, None, None, None, None)),
+        ("window", app.load_pattern_window),
+        ("week", week),
+        ("tags7d", tags7d),
+    ]
+
+    print(f"\n{args.chats} chats per user, {args.lookups} random-user lookups per step, p50 ms\n")
+    print(f"{'users':>8}  {'rows':>10}" + "".join(f"  {name:>8}" for name, _ in queries))
+    loaded = 0
+    for users in args.users:
+        add_users(app, loaded, users, args.chats, rng)
+        loaded = users
+        with app.get_connection() as conn:
+            conn.execute("ANALYZE")
+        user_ids = [f"user-{rng.randrange(users)}" for _ in range(args.lookups)]
+        row = [p50(fn, user_ids) for _, fn in queries]
+        print(f"{users:>8,}  {users * args.chats:>10,}" + "".join(f"  {value:8.3f}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
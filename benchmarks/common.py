@@ -0,0 +1,65 @@
+"""
+벤치마크 공통 도구
+
+- DB 경로(gini.db 등)가 작업 디렉터리 기준 → .streamlit 설정만 복사한 임시 디렉터리에서 import
+  (import app은 화면을 그리지 않으므로 테이블이 필요하면 create_tables() 직접 호출)
+- 측정값은 ms 단위 평균 / p95
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def scratch_dir():
+    """.streamlit 설정만 복사한 임시 작업 디렉터리"""
+    path = Path(tempfile.mkdtemp(prefix="gini-bench-"))
+    shutil.copytree(ROOT / ".streamlit", path / ".streamlit")
+    return path
+
+
+def load_app(workdir):
+    """workdir로 이동한 뒤 app 모듈 import (이후 상대 경로 DB도 workdir 기준)"""
+    os.chdir(workdir)
+    sys.path.insert(0, str(ROOT))
+    import app
+    return app
+
+
+def measure(fn, repeat, warmup=3):
+    """fn()을 repeat번 실행한 시간 목록 (ms)"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    """(평균, p95) ms"""
+    ordered = sorted(samples)
+    return statistics.fmean(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def report(rows, baseline=None):
+    """
+    결과 표 출력
+    
+    Args:
+        rows: [(이름, 측정값 목록)]
+        baseline: 배수를 계산할 기준 행 이름 (없으면 첫 행)
+    """
+    base_mean = summarize(dict(rows)[baseline or rows[0][0]])[0]
+    width = max(len(name) for name, _ in rows)
+    print(f"{'':{width}}  {'mean ms':>10}  {'p95 ms':>10}  {'speedup':>8}")
+    for name, samples in rows:
+        mean, p95 = summarize(samples)
+        print(f"{name:{width}}  {mean:10.3f}  {p95:10.3f}  {base_mean / mean:7.1f}x")
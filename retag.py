@@ -0,0 +1,170 @@
+"""
+상담 기록 감정 태그/위험도 재계산 배치 작업
+
+    python retag.py [--restart] [--workers N] [--chunk-size N]
+
+detect_tags / detect_risk_level 규칙을 바꾼 뒤 기존 chats 행을 현재 규칙으로 다시 태깅.
+app.py를 모듈로 import하므로 Streamlit 화면 코드는 실행되지 않음 (저장소 설정은 app.py와 같음).
+설정 탭(관리자)의 재계산/이어하기 버튼도 이 스크립트를 별도 프로세스로 실행.
+"""
+
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from app import (
+    DEFAULT_VOLATILITY_SCORE,
+    RETAG_JOB,
+    _invalidate_chat_caches,
+    calc_risk_score,
+    create_tables,
+    detect_risk_level,
+    detect_tags,
+    flush_writes,
+    get_connection,
+    get_job_checkpoint,
+    rebuild_chat_aggregates,
+    split_tags,
+)
+
+RETAG_CHUNK_SIZE = 500      # 한 트랜잭션에서 처리할 상담 수
+LEGACY_NEWS_SCORE = 3.0     # risk_score 저장 이전 상담이 쓰던 뉴스 점수 (변동성은 DEFAULT_VOLATILITY_SCORE)
+
+def _rescore_chat(row):
+    """
+    상담 1건을 현재 규칙으로 다시 평가 (프로세스 풀에서도 돌 수 있도록 DB 접근 없음)
+    
+    Args:
+        row: (id, user_input, emotion_score, risk_score, risk_level, tags)
+    
+    Returns:
+        tuple or None: (id, tags 문자열, 태그 리스트, risk_level, risk_score), 바뀐 게 없으면 None
+    """
+    chat_id, user_input, emotion_score, stored_risk_score, risk_level, tags_str = row
+    
+    tags = detect_tags(user_input)
+    new_tags_str = ", ".join(tags)
+    
+    risk_score = stored_risk_score
+    if risk_score is None and emotion_score is not None:
+        risk_score = calc_risk_score(emotion_score, DEFAULT_VOLATILITY_SCORE, LEGACY_NEWS_SCORE)
+    new_risk_level = detect_risk_level(risk_score) if risk_score is not None else risk_level
+    
+    if new_tags_str == tags_str and new_risk_level == risk_level and risk_score == stored_risk_score:
+        return None
+    return chat_id, new_tags_str, tags, new_risk_level, risk_score
+
+def retag_chats(chunk_size=RETAG_CHUNK_SIZE, workers=0, restart=False, progress=None):
+    """
+    chats 전체를 현재 detect_tags / detect_risk_level 규칙으로 다시 태깅
+    
+    - id 기준 keyset 페이지로 chunk_size씩 읽음 → 전체를 메모리에 올리지 않음
+    - 청크마다 변경분 UPDATE + chat_tags 교체 + 체크포인트를 한 트랜잭션으로 커밋
+    - 중간에 멈춰도 다음 실행이 체크포인트 다음 id부터 이어서 진행 (restart=True면 처음부터)
+    - workers > 0이면 재평가를 프로세스 풀에서 병렬 실행 (CLI 전용 - _rescore_chat을
+      워커 프로세스로 넘기려면 이 모듈을 import할 수 있어야 함. Streamlit 안에서는 0으로)
+    - 마지막에 대시보드 집계를 다시 계산
+    - 실행 중인 앱의 조회 캐시는 다른 프로세스라 TTL(최대 30초~5분)이 지나야 반영
+    
+    Args:
+        progress: 청크마다 호출되는 콜백 (처리 건수, 전체 건수)
+    
+    Returns:
+        dict: 최종 체크포인트
+    """
+    flush_writes()
+    now = datetime.now().isoformat(timespec='seconds')
+    
+    with get_connection() as conn:
+        checkpoint = conn.execute(
+            "SELECT last_id, processed, changed, finished_at FROM job_checkpoints WHERE job = ?", (RETAG_JOB,)
+        ).fetchone()
+        if restart or checkpoint is None or checkpoint[3] is not None:
+            conn.execute("""
+            INSERT INTO job_checkpoints (job, last_id, processed, changed, started_at, updated_at, finished_at)
+            VALUES (?, 0, 0, 0, ?, ?, NULL)
+            ON CONFLICT (job) DO UPDATE SET
+                last_id = 0, processed = 0, changed = 0,
+                started_at = excluded.started_at, updated_at = excluded.updated_at, finished_at = NULL
+            """, (RETAG_JOB, now, now))
+            last_id, processed, changed = 0, 0, 0
+        else:
+            last_id, processed, changed = checkpoint[:3]
+        total = conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+    
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        while True:
+            with get_connection() as conn:
+                rows = conn.execute("""
+                SELECT id, user_input, emotion_score, risk_score, risk_level, tags
+                FROM chats WHERE id > ? ORDER BY id LIMIT ?
+                """, (last_id, chunk_size)).fetchall()
+            
+            if not rows:
+                break
+            
+            if pool:
+                results = pool.map(_rescore_chat, rows, chunksize=max(1, len(rows) // (workers * 4)))
+            else:
+                results = map(_rescore_chat, rows)
+            updates = [result for result in results if result is not None]
+            
+            last_id = rows[-1][0]
+            processed += len(rows)
+            changed += len(updates)
+            
+            with get_connection() as conn:
+                conn.executemany(
+                    "UPDATE chats SET tags = ?, risk_level = ?, risk_score = ? WHERE id = ?",
+                    [(tags_str, risk_level, risk_score, chat_id) for chat_id, tags_str, _, risk_level, risk_score in updates]
+                )
+                conn.executemany("DELETE FROM chat_tags WHERE chat_id = ?", [(update[0],) for update in updates])
+                conn.executemany("""
+                INSERT INTO chat_tags (chat_id, user_id, tag, timestamp)
+                SELECT id, user_id, ?, timestamp FROM chats WHERE id = ?
+                ON CONFLICT DO NOTHING
+                """, [(tag, update[0]) for update in updates for tag in split_tags(update[2])])
+                conn.execute("""
+                UPDATE job_checkpoints SET last_id = ?, processed = ?, changed = ?, updated_at = ?
+                WHERE job = ?
+                """, (last_id, processed, changed, datetime.now().isoformat(timespec='seconds'), RETAG_JOB))
+            
+            if progress:
+                progress(processed, total)
+    finally:
+        if pool:
+            pool.shutdown()
+    
+    rebuild_chat_aggregates()
+    
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE job_checkpoints SET finished_at = ? WHERE job = ?",
+            (datetime.now().isoformat(timespec='seconds'), RETAG_JOB)
+        )
+    
+    _invalidate_chat_caches()
+    return get_job_checkpoint()
+
+def main(argv=None):
+    """CLI 진입점 (스키마를 최신으로 올린 뒤 재태깅)"""
+    parser = argparse.ArgumentParser(description="상담 기록 감정 태그/위험도 재계산")
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터")
+    parser.add_argument("--workers", type=int, default=0, help="재평가 프로세스 수 (0이면 현재 프로세스)")
+    parser.add_argument("--chunk-size", type=int, default=RETAG_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    
+    create_tables()
+    result = retag_chats(
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        restart=args.restart,
+        progress=lambda done, total: print(f"\r{done:,}/{total:,}", end="", flush=True)
+    )
+    print(f"\n완료: {result['processed']:,}건 확인, {result['changed']:,}건 변경")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+공통 테스트 픽스처
+
+- app 모듈은 저장소 루트에서 1회 import (.streamlit/secrets.toml 기준)
+- 테스트마다 빈 임시 디렉터리의 gini.db / price_store.db 사용
+"""
+import sys
+from contextlib import chdir
+from pathlib import Path
+
+import pytest
+import streamlit as st
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+with chdir(ROOT):
+    import app as gini_app
+
+
+def reset_process_state():
+    """프로세스 전역 자원(연결 풀, 쓰기 큐)과 조회 캐시 초기화"""
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+@pytest.fixture
+def bare_app(tmp_path, monkeypatch):
+    """테이블 생성 전 빈 DB + 네트워크 없는 app 모듈"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gini_app, "PYKRX_AVAILABLE", False)
+    reset_process_state()
+    yield gini_app
+    gini_app.flush_writes()
+    reset_process_state()
+
+
+@pytest.fixture
+def app(bare_app):
+    """테이블까지 만든 빈 DB"""
+    bare_app.create_tables()
+    return bare_app
@@ -0,0 +1,60 @@
+"""대시보드 집계 테이블 - save_chat 증분 갱신이 전체 재계산/전체 스캔과 같은지"""
+import random
+from collections import Counter
+
+import pytest
+
+AGGREGATE_TABLES = ("chat_totals", "chat_tag_counts", "chat_emotion_grid")
+TAGS = ["불안", "공포", "충동", "후회", "중립"]
+USERS = ["default", "kim@example.com"]
+
+
+def _aggregates(app):
+    with app.get_connection() as conn:
+        return [conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() for table in AGGREGATE_TABLES]
+
+
+def _seed(app, count=60, seed=3):
+    rng = random.Random(seed)
+    for i in range(count):
+        tags = rng.sample(TAGS, rng.randint(1, 3))
+        app.save_chat(
+            rng.choice(USERS), f"질문 {i}", "답변",
+            rng.choice([None, 2.5, 5.0, 7.5, 9.0]),   # 이진수로 정확한 값 → 합계 순서와 무관
+            rng.choice(["HIGH", "high", "MEDIUM", "low"]),
+            tags if rng.random() < 0.5 else ", ".join(tags),
+        )
+    assert app.flush_writes()
+
+
+def test_incremental_matches_rebuild(app):
+    _seed(app)
+    incremental = _aggregates(app)
+
+    app.rebuild_chat_aggregates()
+    assert _aggregates(app) == incremental
+
+
+def test_rebuild_of_one_user_leaves_others(app):
+    _seed(app)
+    incremental = _aggregates(app)
+
+    app.rebuild_chat_aggregates(USERS[1])
+    assert _aggregates(app) == incremental
+
+
+@pytest.mark.parametrize("user_id", USERS)
+def test_dashboard_stats_match_full_scan(app, user_id):
+    _seed(app)
+    with app.get_connection() as conn:
+        rows = conn.execute("SELECT emotion_score, risk_level, tags FROM chats WHERE user_id = ?", (user_id,)).fetchall()
+
+    scores = [score for score, _, _ in rows if score is not None]
+    tag_counts = Counter(tag for _, _, tags in rows for tag in app.split_tags(tags))
+
+    stats = app.get_dashboard_stats(user_id)
+    assert stats["total_chats"] == len(rows)
+    assert stats["avg_emotion"] == round(sum(scores) / len(scores), 2)
+    assert stats["high_risk_count"] == sum(1 for _, risk, _ in rows if risk.upper() == "HIGH")
+    assert stats["most_common_count"] == max(tag_counts.values())
+    assert tag_counts[stats["most_common_tag"]] == stats["most_common_count"]
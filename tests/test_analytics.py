@@ -0,0 +1,129 @@
+"""포트폴리오 성과/위험 분석 - 지표 계산, 종가 이력 증분 동기화 (가짜 pykrx)"""
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+class FakePykrx:
+    """종목/지수 일별 종가 - 거래일마다 종목 100→101→..., 조회 구간을 기록"""
+
+    def __init__(self):
+        self.calls = []
+
+    def _closes(self, start, end, base):
+        days = pd.bdate_range(start, end)
+        return pd.DataFrame({"종가": [base + n for n in range(len(days))]}, index=days)
+
+    def get_market_ohlcv_by_date(self, start, end, ticker):
+        self.calls.append((ticker, start, end))
+        return self._closes(start, end, 100)
+
+    def get_index_ohlcv_by_date(self, start, end, index):
+        self.calls.append(("KOSPI", start, end))
+        return self._closes(start, end, 2500)
+
+
+@pytest.fixture
+def pykrx(app, monkeypatch):
+    fake = FakePykrx()
+    monkeypatch.setattr(app, "pykrx_stock", fake)
+    monkeypatch.setattr(app, "PYKRX_AVAILABLE", True)
+    return fake
+
+
+def kst(app, text):
+    return datetime.fromisoformat(text).replace(tzinfo=app.KST)
+
+
+def test_metrics_match_reference(app):
+    rng = np.random.default_rng(7)
+    market = 2500 * np.cumprod(1 + rng.normal(0, 0.01, 60))
+    stock = 100 * np.cumprod(np.r_[1, 1 + 2 * np.diff(market) / market[:-1]])
+    index = [d.strftime("%Y-%m-%d") for d in pd.bdate_range("2026-06-01", periods=60)]
+    closes = pd.DataFrame({"KOSPI": market, "005930": stock, "000660": market / 10}, index=index)
+
+    result = app.compute_portfolio_analytics(closes, {"005930": 3, "000660": 2})
+
+    value = closes["005930"].to_numpy() * 3 + closes["000660"].to_numpy() * 2
+    returns = np.diff(value) / value[:-1]
+    assert result["volatility"] == pytest.approx(returns.std(ddof=1) * np.sqrt(252) * 100, abs=0.01)
+    assert result["max_drawdown"] == pytest.approx((value / np.maximum.accumulate(value) - 1).min() * 100, abs=0.01)
+    assert result["beta"] == {"005930": 2.0, "000660": 1.0}
+    assert result["value"].iloc[-1] == pytest.approx(value[-1])
+    assert 0 <= result["volatility_score"] <= 10
+
+
+def test_too_little_history(app):
+    closes = pd.DataFrame({"005930": [100.0, 101.0]}, index=["2026-10-14", "2026-10-15"])
+    assert app.compute_portfolio_analytics(closes, {"005930": 1}) is None
+    assert app.compute_portfolio_analytics(closes, {"000660": 1}) is None
+
+
+def test_history_sync_is_incremental(app, pykrx):
+    end = app.sync_price_history(["005930"], kst(app, "2026-10-14 17:00"))
+    assert end == date(2026, 10, 14)
+    assert sorted(key for key, _, _ in pykrx.calls) == ["005930", "KOSPI"]
+
+    # 다음 날 장 마감 후 → 하루치만 조회
+    pykrx.calls.clear()
+    app.sync_price_history(["005930"], kst(app, "2026-10-15 17:00"))
+    assert sorted(pykrx.calls) == [("005930", "20261015", "20261015"), ("KOSPI", "20261015", "20261015")]
+
+    # 같은 날 다시 → 호출 없음
+    pykrx.calls.clear()
+    app.sync_price_history(["005930"], kst(app, "2026-10-15 18:00"))
+    assert pykrx.calls == []
+
+
+def test_intraday_close_is_refetched(app, pykrx):
+    app.sync_price_history(["005930"], kst(app, "2026-10-15 11:00"))
+    pykrx.calls.clear()
+
+    app.sync_price_history(["005930"], kst(app, "2026-10-15 17:00"))
+    assert sorted(pykrx.calls) == [("005930", "20261015", "20261015"), ("KOSPI", "20261015", "20261015")]
+
+
+def test_analytics_from_store(app, pykrx, monkeypatch):
+    monkeypatch.setattr(app, "now_kst", lambda: kst(app, "2026-10-15 17:00"))
+
+    analytics = app.get_portfolio_analytics(app.portfolio_quantities([
+        {"종목코드": "005930", "수량": 2}, {"종목코드": "005930", "수량": 1},
+    ]))
+
+    assert analytics["value"].iloc[-1] == 3 * (100 + len(analytics["value"]) - 1)
+    assert analytics["max_drawdown"] == 0.0
+
+
+def test_volatility_score_defaults_without_history(app):
+    assert app.get_volatility_score([]) == app.DEFAULT_VOLATILITY_SCORE
+    assert app.get_volatility_score([{"종목코드": "005930", "수량": 1}]) == app.DEFAULT_VOLATILITY_SCORE
+
+
+def test_volatility_score_syncs_history_in_background(app, pykrx, monkeypatch):
+    monkeypatch.setattr(app, "now_kst", lambda: kst(app, "2026-10-15 17:00"))
+    release = threading.Event()
+    fetch = pykrx.get_market_ohlcv_by_date
+    monkeypatch.setattr(pykrx, "get_market_ohlcv_by_date", lambda *args: release.wait(5) and fetch(*args))
+    portfolio = [{"종목코드": "005930", "수량": 1}]
+    state = app.get_history_sync_state()
+
+    # 상담 경로는 이력 조회를 기다리지 않음 → 이번 턴은 기본값
+    assert app.get_volatility_score(portfolio) == app.DEFAULT_VOLATILITY_SCORE
+    assert state["running"] == {("005930",)}
+
+    release.set()
+    deadline = time.monotonic() + 10
+    while state["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert state["version"] == 1
+
+    # 다음 턴은 동기화된 저장소 이력으로 계산, 같은 보유 종목은 PRICE_LIVE_TTL 동안 다시 동기화하지 않음
+    calls = len(pykrx.calls)
+    expected = app.get_portfolio_analytics((("005930", 1),))["volatility_score"]
+    assert app.get_volatility_score(portfolio) == expected
+    assert len(pykrx.calls) == calls
+    assert state["running"] == set()
@@ -0,0 +1,62 @@
+"""대시보드 차트 Figure 캐시 - 같은 데이터면 재사용, 바뀐 차트만 다시 생성"""
+import pytest
+
+USER = "kim@example.com"
+CHARTS = ("heatmap", "timeline", "tags")
+
+
+def _figures(app, user_id=USER):
+    timings = {}
+    figures = (
+        app.create_emotion_heatmap(user_id, timings),
+        app.create_risk_timeline(user_id, timings),
+        app.create_emotion_tag_chart(user_id, timings),
+    )
+    return figures, {chart: timings[chart]["cached"] for chart in CHARTS}
+
+
+@pytest.fixture
+def chats(app):
+    app.save_chat(USER, "불안해요", "천천히", 6.0, "LOW", ["불안"])
+    app.save_chat(USER, "또 불안해요", "괜찮아요", 6.0, "LOW", ["불안"])
+    assert app.flush_writes()
+    return app
+
+
+def test_rerun_reuses_every_figure(chats):
+    first, cached = _figures(chats)
+    assert all(fig is not None for fig in first)
+    assert cached == {"heatmap": False, "timeline": False, "tags": False}
+
+    again, cached = _figures(chats)
+    assert all(a is b for a, b in zip(first, again))
+    assert cached == {"heatmap": True, "timeline": True, "tags": True}
+
+
+def test_new_chat_rebuilds_only_changed_charts(chats):
+    first, _ = _figures(chats)
+
+    # 같은 시간대 칸의 평균(6.0)은 그대로 → 히트맵만 재사용
+    chats.save_chat(USER, "충동적으로 사고 싶어요", "멈추세요", 6.0, "LOW", ["충동"])
+    assert chats.flush_writes()
+    second, cached = _figures(chats)
+
+    assert cached == {"heatmap": True, "timeline": False, "tags": False}
+    assert second[0] is first[0]
+
+
+def test_figures_are_cached_per_user(chats):
+    _figures(chats)
+
+    # 빈 히트맵은 그려지지만 다른 사용자의 Figure를 재사용하지 않음
+    figures, cached = _figures(chats, "nobody")
+    assert figures[1:] == (None, None)
+    assert not any(cached.values())
+
+
+def test_cache_evicts_least_recently_used(chats, monkeypatch):
+    monkeypatch.setattr(chats, "FIGURE_CACHE_MAX_ENTRIES", 2)
+    for user_id in ("a", "b", USER):
+        chats.create_risk_timeline(user_id)
+
+    assert list(chats.get_figure_cache()["entries"]) == [("timeline", "b"), ("timeline", USER)]
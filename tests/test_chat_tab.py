@@ -0,0 +1,63 @@
+"""상담 탭 화면 (AppTest) - 백그라운드 상담 결과 반영"""
+import shutil
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def page(tmp_path, monkeypatch):
+    """임시 디렉터리 gini.db로 app.py 화면을 실행하는 AppTest"""
+    shutil.copytree(ROOT / ".streamlit", tmp_path / ".streamlit")
+    monkeypatch.chdir(tmp_path)
+    app_test = AppTest.from_file(str(ROOT / "app.py"), default_timeout=60)
+    app_test.secrets["GROQ_API_KEY"] = "test-key"     # 키가 없으면 상담 탭이 안내 문구만 표시
+    return app_test
+
+
+def _pending(future):
+    placeholder = {
+        "role": "assistant",
+        "content": "⏳ 상담 답변을 준비하고 있습니다...",
+        "meta": {"risk": 7.0, "emotion_score": 8.0, "tags": ["충동"]},
+        "pending": True,
+    }
+    return placeholder, future
+
+
+def test_failed_deferred_counsel_shows_error_once(page):
+    failed = Future()
+    failed.set_exception(RuntimeError("캐시 저장 실패"))
+    placeholder, future = _pending(failed)
+    page.session_state["guardian_chat_history"] = [placeholder]
+    page.session_state["pending_counsel"] = [(placeholder, future)]
+
+    page.run()
+    assert not page.exception
+
+    [message] = page.session_state["guardian_chat_history"]
+    assert message["content"] == "상담 중 오류가 발생했습니다: 캐시 저장 실패"
+    assert "pending" not in message
+    assert page.session_state["pending_counsel"] == []
+
+    page.run()
+    assert not page.exception
+
+
+def test_finished_deferred_counsel_fills_placeholder(page):
+    done = Future()
+    done.set_result({"text": "잠깐 멈추세요.", "risk": 6.35, "emotion_score": 8.5})
+    placeholder, future = _pending(done)
+    page.session_state["guardian_chat_history"] = [placeholder]
+    page.session_state["pending_counsel"] = [(placeholder, future)]
+
+    page.run()
+
+    [message] = page.session_state["guardian_chat_history"]
+    assert message["content"] == "잠깐 멈추세요."
+    assert (message["meta"]["risk"], message["meta"]["emotion_score"]) == (6.35, 8.5)
+    assert page.session_state["pending_counsel"] == []
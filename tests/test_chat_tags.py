@@ -0,0 +1,37 @@
+"""정규화 태그 테이블 chat_tags - 저장, 태그 통계"""
+from collections import Counter
+
+USER = "default"
+
+
+def _chat_tags(app):
+    with app.get_connection() as conn:
+        return conn.execute("""
+        SELECT chat_tags.chat_id, chat_tags.tag, chat_tags.timestamp = chats.timestamp
+        FROM chat_tags JOIN chats ON chats.id = chat_tags.chat_id
+        ORDER BY 1, 2
+        """).fetchall()
+
+
+def test_save_chat_writes_one_row_per_tag(app):
+    app.save_chat(USER, "물타기", "멈추세요", 8.0, "high", ["불안", "충동", "중립"])
+    app.save_chat(USER, "또", "멈추세요", 7.0, "high", "불안, 불안")
+    app.save_chat(USER, "그냥", "네", 3.0, "low", ["중립"])
+    assert app.flush_writes()
+
+    assert _chat_tags(app) == [(1, "불안", 1), (1, "충동", 1), (2, "불안", 1)]
+
+
+def test_weekly_top_tags_match_string_counts(app):
+    for i, tags in enumerate([["불안", "충동"], ["불안"], ["공포", "불안"], ["충동"], ["중립"]]):
+        app.save_chat(USER, f"질문 {i}", "답변", 5.0, "low", tags)
+    assert app.flush_writes()
+    with app.get_connection() as conn:
+        conn.execute("UPDATE chats SET timestamp = datetime('now', '-10 days') WHERE id = 1")
+        conn.execute("UPDATE chat_tags SET timestamp = datetime('now', '-10 days') WHERE chat_id = 1")
+        rows = conn.execute("SELECT tags FROM chats WHERE timestamp >= datetime('now', '-7 days')").fetchall()
+
+    expected = Counter(tag for (tags,) in rows for tag in app.split_tags(tags))
+    report = app.generate_weekly_report(USER, patterns=app.analyze_trading_patterns(USER))
+    assert {item["tag"]: item["count"] for item in report["top_tags"]} == dict(expected.most_common(3))
+
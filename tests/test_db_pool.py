@@ -0,0 +1,79 @@
+"""SQLite 연결 풀 (get_connection)"""
+import sqlite3
+import threading
+
+import pytest
+
+
+def test_connection_is_tuned_and_reused(app):
+    with app.get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert conn.execute("PRAGMA synchronous").fetchone() == (1,)  # NORMAL
+        assert conn.execute("PRAGMA cache_size").fetchone() == (-16000,)
+        with app.get_connection() as inner:
+            assert inner is conn
+
+    # 반납된 연결을 다음 대여에서 재사용 (새로 열지 않음)
+    with app.get_connection() as again:
+        assert again is conn
+
+
+def test_commit_and_rollback(app):
+    with app.get_connection() as conn:
+        conn.execute("INSERT INTO portfolio (ticker, buy_price, quantity) VALUES ('005930', 1, 1)")
+
+    with pytest.raises(ZeroDivisionError):
+        with app.get_connection() as conn:
+            conn.execute("INSERT INTO portfolio (ticker, buy_price, quantity) VALUES ('000660', 1, 1)")
+            1 / 0
+
+    with app.get_connection() as conn:
+        assert conn.execute("SELECT ticker FROM portfolio").fetchall() == [("005930",)]
+
+
+def test_threads_get_their_own_connection(app):
+    seen = {}
+    barrier = threading.Barrier(4)
+
+    def borrow(name):
+        with app.get_connection() as conn:
+            barrier.wait(timeout=5)
+            seen[name] = conn
+            conn.execute("INSERT INTO pressure_messages (message_type, emotion_tag) VALUES ('x', ?)", (name,))
+
+    threads = [threading.Thread(target=borrow, args=(f"t{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(conn) for conn in seen.values()}) == 4
+    with app.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM pressure_messages").fetchone() == (4,)
+
+
+def test_pool_is_bounded(app, monkeypatch):
+    monkeypatch.setattr(app, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(app, "DB_BUSY_TIMEOUT", 0.05)
+    app.get_db_pool.clear()
+
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with app.get_connection():
+            held.set()
+            release.wait(timeout=5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait(timeout=5)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            with app.get_connection():
+                pass
+    finally:
+        release.set()
+        holder.join()
+
+    with app.get_connection() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
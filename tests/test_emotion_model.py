@@ -0,0 +1,105 @@
+"""로컬 감정 분류기 - 해시 특징, 학습 정확도, 저장/재학습 대상, 사전 기반 대체값"""
+import random
+import time
+
+import numpy as np
+import pytest
+
+CALM = ["차분하게 분석해 보려고요", "계획대로 분할 매수 중입니다", "장기 투자 전략을 점검해요", "객관적으로 보면 괜찮아요"]
+PANIC = ["당장 몰빵해야 할 것 같아요", "다 잃을까 봐 무서워요 ㅠㅠ", "미쳤다 급등주 지금 들어갈래요", "어차피 망했으니 상관없어요"]
+
+
+def _corpus(count, seed):
+    """차분한 문장은 1~3점, 불안/충동 문장은 7~9점"""
+    rng = random.Random(seed)
+    texts, scores = [], []
+    for _ in range(count):
+        panic = rng.random() < 0.5
+        words = rng.sample(PANIC if panic else CALM, 2)
+        texts.append(f"{words[0]} {rng.randint(1, 99)} {words[1]}")
+        scores.append(rng.uniform(7, 9) if panic else rng.uniform(1, 3))
+    return texts, scores
+
+
+def test_features_are_stable_and_unique(app):
+    ids = app.emotion_features("물타기 물타기")
+    assert len(ids) == len(set(ids.tolist()))
+    assert np.array_equal(np.sort(ids), np.sort(app.emotion_features("  물타기   물타기 ")))
+    assert ids.max() < app.EMOTION_MODEL_FEATURES
+
+
+def test_model_beats_constant_baseline(app):
+    texts, scores = _corpus(400, seed=1)
+    model = app.train_emotion_model(texts, scores)
+    app.get_emotion_model()["model"] = model
+
+    test_texts, test_scores = _corpus(100, seed=2)
+    predicted = np.array([app.predict_emotion_score(text) for text in test_texts])
+    mae = np.abs(predicted - np.array(test_scores)).mean()
+    baseline = np.abs(np.mean(scores) - np.array(test_scores)).mean()
+
+    assert mae < baseline / 2
+
+
+def test_retrain_uses_llm_scores_only_and_persists(app):
+    texts, scores = _corpus(app.EMOTION_MODEL_MIN_SAMPLES, seed=3)
+    for text, score in zip(texts[:-1], scores):
+        app.save_chat("default", text, "답변", score, "low", ["중립"], None, "llm")
+    app.save_chat("kim@example.com", "로컬 추정값은 학습에서 제외", "답변", 9.9, "low", ["중립"], None, "local")
+    assert app.flush_writes()
+
+    assert app.retrain_emotion_model() is None    # LLM 점수 29건 → 부족
+
+    app.save_chat("kim@example.com", texts[-1], "답변", scores[-1], "low", ["중립"], None, None)   # 출처 없는 이전 상담은 LLM 점수
+    assert app.flush_writes()
+    model = app.retrain_emotion_model()
+    assert (model["samples"], model["label_count"]) == (app.EMOTION_MODEL_MIN_SAMPLES, app.EMOTION_MODEL_MIN_SAMPLES)
+
+    stored = app._load_emotion_model()
+    assert np.array_equal(stored["weights"], model["weights"])
+    assert stored["bias"] == pytest.approx(model["bias"])
+
+
+def test_lexicon_fallback_without_model(app):
+    assert app.get_emotion_model()["model"] is None
+    assert app.predict_emotion_score("당장 몰빵할래요") > app.predict_emotion_score("냉정하게 분석해요")
+    assert app.predict_emotion_score("안녕하세요") == 5.0
+
+
+def test_forced_retrain_runs_in_background(app):
+    texts, scores = _corpus(app.EMOTION_MODEL_MIN_SAMPLES, seed=4)
+    for text, score in zip(texts, scores):
+        app.save_chat("default", text, "답변", score, "low", ["중립"], None, "llm")
+    assert app.flush_writes()
+    holder = app.get_emotion_model()
+    first = app.retrain_emotion_model()
+    holder["next_check"] = float("inf")
+
+    assert app.schedule_emotion_model_training() is False
+    holder["training"] = True
+    assert app.schedule_emotion_model_training(force=True) is False    # 이미 학습 중
+    holder["training"] = False
+
+    # 확인 주기 전이고 새 라벨이 없어도 바로 다시 학습
+    assert app.schedule_emotion_model_training(force=True) is True
+    deadline = time.monotonic() + 10
+    while holder["training"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert holder["model"] is not first
+    assert holder["model"]["label_count"] == app.EMOTION_MODEL_MIN_SAMPLES
+
+
+def test_failed_training_is_logged(app, monkeypatch, caplog):
+    def broken_retrain():
+        raise RuntimeError("학습 데이터 손상")
+
+    monkeypatch.setattr(app, "EMOTION_MODEL_MIN_SAMPLES", 0)
+    monkeypatch.setattr(app, "retrain_emotion_model", broken_retrain)
+    holder = app.get_emotion_model()
+    holder["training"] = True
+
+    app._emotion_model_worker(holder, force=True)
+
+    assert holder["training"] is False
+    [record] = [record for record in caplog.records if record.name == "gini"]
+    assert record.exc_info[1].args == ("학습 데이터 손상",)
@@ -0,0 +1,107 @@
+"""LLM 호출 전 안전 게이트 - 정책별 판정, 백그라운드 상담 저장 (가짜 Groq)"""
+from types import SimpleNamespace
+
+import pytest
+
+MESSAGES = [{"role": "user", "content": "당장 몰빵할래요"}]
+USER = "kim@example.com"
+
+
+class FakeGroq:
+    """미리 정한 조각을 스트리밍하는 클라이언트"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        return (SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))]) for piece in self.pieces)
+
+
+@pytest.mark.parametrize("policy, expected", [("off", "llm"), ("defer", "defer"), ("skip", "skip")])
+def test_high_risk_message_action_follows_policy(app, policy, expected):
+    gate = app.gate_message(USER, "당장 몰빵할래요", 8.0, policy=policy)
+
+    assert "충동" in gate["tags"]
+    assert gate["pressure"] is app.PRESSURE_MESSAGES["충동"]
+    assert gate["action"] == expected
+
+
+@pytest.mark.parametrize("policy", ["off", "defer", "skip"])
+def test_calm_message_always_goes_to_llm(app, policy):
+    gate = app.gate_message(USER, "배당 일정이 궁금해요", 8.0, policy=policy)
+
+    assert gate["pressure"] is None
+    assert gate["action"] == "llm"
+    assert gate["pattern_warnings"] == []
+
+
+@pytest.mark.parametrize("text, risk_estimate", [
+    ("지금 좀 더 사고 싶어요", 8.0),    # 약한 충동/탐욕 단어만
+    ("급하게 지금 살까요", 8.0),
+    ("당장 몰빵할래요", 5.0),          # 강한 충동이지만 HIGH 위험 미만
+])
+def test_weak_signals_or_lower_risk_are_not_gated(app, text, risk_estimate):
+    gate = app.gate_message(USER, text, risk_estimate, policy="defer")
+
+    assert gate["pressure"] is not None     # 압박 멘트는 LLM 응답 뒤에 표시
+    assert gate["action"] == "llm"
+
+
+def test_gate_uses_the_strong_tags_pressure_message(app):
+    gate = app.gate_message(USER, "어차피 망했으니 아무거나 살래요", app.GATE_MIN_RISK, policy="defer")
+
+    assert gate["action"] == "defer"
+    assert gate["pressure"] is app.PRESSURE_MESSAGES["자포자기"]
+
+
+def test_default_policy_is_defer(app):
+    assert app.GATING_POLICY == "defer"
+    assert app.gate_message(USER, "당장 몰빵할래요", 8.0)["action"] == "defer"
+
+
+def test_pressure_message_as_history_markdown(app):
+    pressure = app.PRESSURE_MESSAGES["충동"]
+    text = app.format_pressure_message(pressure)
+
+    assert text.startswith(f"**{pressure['title']}**")
+    assert f"'{pressure['blocking_word']}'" in text
+
+
+def test_deferred_counsel_saves_llm_scored_chat(app, monkeypatch):
+    monkeypatch.setattr(app, "GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(app, "get_llm_client", lambda *args: FakeGroq(["잠깐 멈추세요.", " [감정점수: 8.5]"]))
+
+    future = app.defer_counsel(USER, MESSAGES, "당장 몰빵할래요", ["충동"], 6.0, 5.0, 3.0, use_cache=False)
+    reply = future.result(timeout=10)
+
+    assert reply == {"text": "잠깐 멈추세요.", "risk": app.calc_risk_score(8.5, 5.0, 3.0), "emotion_score": 8.5}
+    assert app.flush_writes()
+    with app.get_connection() as conn:
+        row = conn.execute("SELECT user_id, user_input, ai_response, emotion_score, risk_level, tags, emotion_source FROM chats").fetchone()
+    assert row == (USER, "당장 몰빵할래요", "잠깐 멈추세요.", 8.5, "mid", "충동", "llm")
+
+
+def test_deferred_counsel_failure_is_logged_in_the_worker(app, monkeypatch, caplog):
+    def broken_client(*args):
+        raise RuntimeError("연결 끊김")
+
+    monkeypatch.setattr(app, "GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(app, "get_llm_client", broken_client)
+
+    # 결과를 확인할 세션이 없어도 작업 스레드에서 오류를 남김
+    future = app.defer_counsel(USER, MESSAGES, "당장 몰빵할래요", ["충동"], 6.0, 5.0, 3.0, use_cache=False)
+    with pytest.raises(RuntimeError, match="연결 끊김"):
+        future.result(timeout=10)
+
+    assert [record.getMessage() for record in caplog.records if record.name == "gini"] == ["백그라운드 상담 실패"]
+
+def test_patterns_include_the_unsaved_message(app):
+    app.save_chat(USER, "배당 일정이 궁금해요", "다음 달입니다", 3.0, "LOW", ["냉정"])
+    assert app.flush_writes()
+
+    gate = app.gate_message(USER, "손실 봤는데 다시 들어갈래요", 5.0)
+
+    assert "복수매매" in [warning["type"] for warning in gate["pattern_warnings"]]
+    # 대시보드/주간 리포트의 캐시 경로는 저장된 상담만 봄
+    assert not app.analyze_trading_patterns(USER)["revenge"]["detected"]
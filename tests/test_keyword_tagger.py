@@ -0,0 +1,80 @@
+"""Aho–Corasick 키워드 태거 - 기존 any(word in text) 검사와 같은 결과인지"""
+import random
+
+import pytest
+
+# 오토마톤 도입 전 detect_tags / 패턴 감지기의 키워드 목록 (그대로 옮김)
+OLD_TAG_KEYWORDS = {
+    "불안": ["불안", "걱정", "두려", "무서", "떨려"],
+    "분노": ["손실", "떨어", "내려", "털렸", "씨발", "화나", "짜증"],
+    "충동": ["사도", "들어갈", "몰빵", "급", "지금", "당장"],
+    "후회": ["후회", "실수", "잘못", "했어야"],
+    "탐욕": ["더", "많이", "대박", "벌고", "수익", "올랐", "급등"],
+    "공포": ["망했", "끝났", "파산", "다 잃", "무섭"],
+    "FOMO": ["남들은", "다들", "나만", "놓쳤", "늦었", "올라가는데"],
+    "자포자기": ["어차피", "상관없", "아무거나", "됐어", "포기"],
+    "우울": ["우울", "힘들", "지쳤", "포기하고싶", "의미없"],
+    "흥분": ["와!", "대박", "완전", "진짜!", "미쳤"],
+    "회의감": ["의심", "믿을수없", "사기", "조작", "속았"],
+    "냉정": ["분석", "계획", "전략", "냉정", "객관"],
+}
+OLD_PATTERN_KEYWORDS = {
+    "revenge_loss": ["손실", "떨어", "손해", "마이너스", "잃", "-"],
+    "loss_streak": ["손실", "떨어", "손해", "마이너스", "잃", "물렸"],
+    "fomo_streak": ["급등", "올라", "놓쳤", "남들", "다들", "나만", "뒤쳐"],
+}
+
+FILLER = ["오늘", "삼성전자", "주식", "진짜", "와", "하고싶", "포기하", "다", "잃어", "-3%", "!", " ", "Ab"]
+
+
+def old_detect_tags(text):
+    tags = [tag for tag, words in OLD_TAG_KEYWORDS.items() if any(word in text for word in words)]
+    return tags if tags else ["중립"]
+
+
+def occurrences(text, word):
+    """겹치는 것까지 센 등장 횟수"""
+    return sum(text.startswith(word, i) for i in range(len(text)))
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(17)
+    words = [word for lexicon in (OLD_TAG_KEYWORDS, OLD_PATTERN_KEYWORDS) for ws in lexicon.values() for word in ws]
+    texts = ["", "중립적인 질문입니다", "포기하고싶다", "와!대박 진짜!", "다 잃었어 -5%"]
+    for _ in range(500):
+        pieces = [rng.choice(words if rng.random() < 0.3 else FILLER) for _ in range(rng.randint(1, 40))]
+        texts.append("".join(pieces) if rng.random() < 0.5 else " ".join(pieces))
+    return texts
+
+
+def test_lexicon_keeps_old_keywords(app):
+    assert {tag: sorted(words) for tag, words in app.EMOTION_LEXICON.items()} == \
+        {tag: sorted(words) for tag, words in OLD_TAG_KEYWORDS.items()}
+    assert {tag: sorted(words) for tag, words in app.PATTERN_LEXICON.items()} == \
+        {tag: sorted(words) for tag, words in OLD_PATTERN_KEYWORDS.items()}
+
+
+def test_detect_tags_matches_any_scan(app, corpus):
+    for text in corpus:
+        assert app.detect_tags(text) == old_detect_tags(text), text
+
+
+def test_counts_scores_and_spans(app, corpus):
+    lexicons = {**app.EMOTION_LEXICON, **app.PATTERN_LEXICON}
+
+    for text in corpus:
+        tagged = app.tag_text(text)
+        for tag, keywords in lexicons.items():
+            assert tagged["counts"][tag] == sum(occurrences(text, word) for word in keywords), (text, tag)
+            expected_score = sum(weight * occurrences(text, word) for word, weight in keywords.items())
+            assert tagged["scores"].get(tag, 0) == pytest.approx(expected_score)
+        for start, end, tag in tagged["spans"]:
+            assert text[start:end] in lexicons[tag]
+
+
+def test_pattern_keywords_match_any_scan(app, corpus):
+    for text in corpus:
+        counts = app.tag_text(text)["counts"]
+        for pattern, words in OLD_PATTERN_KEYWORDS.items():
+            assert (counts[pattern] > 0) == any(word in text for word in words), (text, pattern)
@@ -0,0 +1,80 @@
+"""LLM 응답 캐시 - 키 정규화, LRU/TTL, SQLite 영구 저장"""
+import unicodedata
+
+import pytest
+
+SYSTEM = {"role": "system", "content": "상담가입니다"}
+
+
+def _messages(text):
+    return [SYSTEM, {"role": "user", "content": text}]
+
+
+def test_key_ignores_case_spacing_and_unicode_form(app):
+    key = app.llm_cache_key(_messages("ETF 살까요?"))
+
+    assert app.llm_cache_key(_messages("  etf   살까요? ")) == key
+    assert app.llm_cache_key(_messages(unicodedata.normalize("NFD", "ETF 살까요?"))) == key
+    assert app.llm_cache_key(_messages("ETF 팔까요?")) != key
+    assert app.llm_cache_key([{"role": "assistant", "content": "ETF 살까요?"}]) != \
+        app.llm_cache_key([{"role": "user", "content": "ETF 살까요?"}])
+
+
+def test_memory_lru_is_bounded(app, monkeypatch):
+    monkeypatch.setattr(app, "LLM_CACHE_PERSIST", False)
+    monkeypatch.setattr(app, "LLM_CACHE_MAX_ENTRIES", 2)
+
+    for key in ("a", "b"):
+        app.llm_cache_put(key, f"답변 {key}", 5.0)
+    assert app.llm_cache_get("a") == ("답변 a", 5.0)   # a를 최근 사용으로
+    app.llm_cache_put("c", "답변 c", 5.0)
+
+    assert app.llm_cache_get("b") is None
+    assert app.llm_cache_get("a") and app.llm_cache_get("c")
+    assert app.get_llm_cache_stats() == {"hits": 3, "misses": 1, "hit_rate": 75.0, "evictions": 1, "size": 2}
+
+
+def test_expired_entries_miss(app, monkeypatch):
+    app.llm_cache_put("a", "답변", 5.0)
+    monkeypatch.setattr(app, "LLM_CACHE_TTL", 0)
+
+    assert app.llm_cache_get("a") is None
+
+
+def test_persisted_entries_survive_a_new_process(app):
+    app.llm_cache_put("a", "저장된 답변", 3.5)
+    app.get_llm_cache.clear()   # 새 프로세스: 메모리 캐시 없음
+
+    assert app.llm_cache_get("a") == ("저장된 답변", 3.5)
+    assert app.get_llm_cache_stats()["size"] == 1   # 메모리로 승격
+
+    app.clear_llm_cache()
+    app.get_llm_cache.clear()
+    assert app.llm_cache_get("a") is None
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_persisted_rows_are_pruned(app, monkeypatch, persist):
+    monkeypatch.setattr(app, "LLM_CACHE_PERSIST", persist)
+    monkeypatch.setattr(app, "LLM_CACHE_MAX_ENTRIES", 1)
+
+    for i in range(15):
+        app.llm_cache_put(f"k{i}", "답변", 5.0)
+
+    with app.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone() == ((10,) if persist else (0,))
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, True), (False, False), (0, False),
+    ("true", True), ("ON", True), (" 1 ", True),
+    ("false", False), ("False", False), ("0", False), ("off", False), ("", False),
+])
+def test_secret_flags_parse_strings(app, value, expected):
+    # secrets.toml에 LLM_CACHE_ENABLED = "false"처럼 문자열로 적어도 꺼짐
+    assert app.parse_flag(value) is expected
+
+
+def test_unknown_flag_string_is_rejected(app):
+    with pytest.raises(ValueError, match="disabled"):
+        app.parse_flag("disabled")
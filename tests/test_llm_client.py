@@ -0,0 +1,121 @@
+"""LLM 클라이언트 재시도/백오프/회로 차단기 (로컬 스텁 HTTP 서버)"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+MESSAGES = [{"role": "user", "content": "안녕"}]
+
+
+def _completion(text):
+    return {
+        "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "stub",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+    }
+
+
+class StubServer:
+    """OpenAI 호환 chat/completions 스텁 - 응답을 (상태코드, 본문, 지연초) 순서대로 돌려줌"""
+
+    def __init__(self):
+        self.script = []
+        self.requests = []   # 요청마다 클라이언트 포트 (keep-alive 확인용)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("content-length", 0)))
+                stub.requests.append(self.client_address[1])
+                status, body, delay = stub.script.pop(0) if stub.script else (200, _completion("ok"), 0)
+                time.sleep(delay)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                if status == 429:
+                    self.send_header("retry-after", "0")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub(app, monkeypatch):
+    monkeypatch.setattr(app, "LLM_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(app, "LLM_BACKOFF_MAX", 0.01)
+    server = StubServer()
+    yield server
+    server.close()
+
+
+def _ask(app, client):
+    response = app.call_llm_with_retry(lambda: client.chat.completions.create(
+        model="stub", messages=MESSAGES, max_tokens=10
+    ))
+    return response.choices[0].message.content
+
+
+def test_retries_429_and_5xx_on_one_pooled_connection(app, stub):
+    stub.script = [(503, {"error": "busy"}, 0), (429, {"error": "slow down"}, 0), (200, _completion("괜찮아요"), 0)]
+    client = app.get_llm_client("test-key", stub.url)
+
+    assert _ask(app, client) == "괜찮아요"
+    assert len(stub.requests) == 3
+    assert len(set(stub.requests)) == 1   # keep-alive: 같은 연결 재사용
+    assert app.get_llm_client("test-key", stub.url) is client
+    assert app.get_llm_breaker()["failures"] == 0
+
+
+def test_client_errors_are_not_retried(app, stub):
+    stub.script = [(400, {"error": "bad request"}, 0)]
+    client = app.get_llm_client("test-key", stub.url)
+
+    with pytest.raises(app.APIStatusError):
+        _ask(app, client)
+    assert len(stub.requests) == 1
+    assert app.get_llm_breaker()["opened_at"] is None
+
+
+def test_read_timeout_is_retried_then_raised(app, stub, monkeypatch):
+    monkeypatch.setattr(app, "LLM_READ_TIMEOUT", 0.2)
+    monkeypatch.setattr(app, "LLM_MAX_RETRIES", 1)
+    stub.script = [(200, _completion("늦음"), 0.5), (200, _completion("늦음"), 0.5)]
+    client = app.get_llm_client("timeout-key", stub.url)
+
+    with pytest.raises(app.APIConnectionError):
+        _ask(app, client)
+    assert len(stub.requests) == 2
+
+
+def test_breaker_opens_then_probes_after_cooldown(app, stub, monkeypatch):
+    monkeypatch.setattr(app, "LLM_MAX_RETRIES", 0)
+    stub.script = [(500, {"error": "down"}, 0)] * app.LLM_BREAKER_THRESHOLD
+    client = app.get_llm_client("test-key", stub.url)
+
+    for _ in range(app.LLM_BREAKER_THRESHOLD):
+        with pytest.raises(app.APIStatusError):
+            _ask(app, client)
+
+    # 열린 동안은 서버에 요청하지 않고 즉시 실패
+    with pytest.raises(app.LLMUnavailableError):
+        _ask(app, client)
+    assert len(stub.requests) == app.LLM_BREAKER_THRESHOLD
+
+    # 쿨다운이 지나면 시험 호출 1건 → 성공 시 닫힘
+    monkeypatch.setattr(app, "LLM_BREAKER_COOLDOWN", 0)
+    assert _ask(app, client) == "ok"
+    assert app.get_llm_breaker()["opened_at"] is None
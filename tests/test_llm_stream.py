@@ -0,0 +1,114 @@
+"""스트리밍 상담 응답 + [감정점수: X] 태그 제거 (가짜 Groq 클라이언트)"""
+from types import SimpleNamespace
+
+import pytest
+
+MESSAGES = [{"role": "user", "content": "물타기 할까요"}]
+
+
+class FakeGroq:
+    """chat.completions.create(stream=True)가 미리 정한 조각을 하나씩 내보내는 클라이언트"""
+
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.calls = 0
+        self.sent = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        self.calls += 1
+        return self._stream()
+
+    def _stream(self):
+        for i, piece in enumerate(self.pieces):
+            if self.fail_after is not None and i == self.fail_after:
+                raise RuntimeError("연결 끊김")
+            self.sent += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+def _strip(app, pieces):
+    result = {"text": "", "emotion_score": 5.0}
+    return list(app.strip_emotion_tag_stream(iter(pieces), result)), result
+
+
+@pytest.mark.parametrize("pieces", [
+    ["[감정점수: 7.5]\n\n지금은 멈추세요."],
+    ["[감", "정점수", ": 7", ".5]", "\n지금은 ", "멈추세요."],
+    ["지금은 멈추세요.", "[감정점수:7.5", "]"],
+    ["지금은 멈", "추세요.[", "감정점수: 7.5]"],
+])
+def test_tag_split_across_chunks_is_removed(app, pieces):
+    chunks, result = _strip(app, pieces)
+
+    assert "".join(chunks).strip() == "지금은 멈추세요."
+    assert not any("[" in chunk or "]" in chunk for chunk in chunks)
+    assert result["emotion_score"] == 7.5
+    assert result["text"] == "지금은 멈추세요."
+
+
+def test_other_brackets_pass_through(app):
+    chunks, result = _strip(app, ["[참고", "] 분산 투자", "를 권합니다 [", "1]"])
+
+    assert result["text"] == "[참고] 분산 투자를 권합니다 [1]"
+    assert result["emotion_score"] == 5.0
+
+
+def test_unfinished_tag_is_flushed_at_end(app):
+    _, result = _strip(app, ["조심하세요 [감정점"])
+
+    assert result["text"] == "조심하세요 [감정점"
+    assert result["emotion_score"] == 5.0
+
+
+def test_stream_yields_before_upstream_finishes(app):
+    client = FakeGroq(["첫 ", "문장입니다. ", "둘째 문장. ", "[감정점수: 4]"])
+    chunks, result = app.groq_counsel_chat_stream(MESSAGES, client=client, use_cache=False)
+
+    assert next(chunks) == "첫 "
+    assert client.sent == 1
+
+    rest = list(chunks)
+    assert "".join(rest) == "문장입니다. 둘째 문장. "
+    assert result["text"] == "첫 문장입니다. 둘째 문장."
+    assert result["emotion_score"] == 4.0 and not result["error"]
+
+
+def test_stream_is_cached_once_complete(app):
+    client = FakeGroq(["안정적입니다.", " [감정점수: 2]"])
+
+    chunks, result = app.groq_counsel_chat_stream(MESSAGES, client=client)
+    list(chunks)
+    chunks, cached = app.groq_counsel_chat_stream(MESSAGES, client=client)
+
+    assert "".join(chunks) == "안정적입니다."
+    assert cached["cached"] and cached["emotion_score"] == 2.0
+    assert client.calls == 1
+
+
+def test_broken_stream_reports_error_and_is_not_cached(app):
+    client = FakeGroq(["절반만 ", "오고"], fail_after=1)
+
+    chunks, result = app.groq_counsel_chat_stream(MESSAGES, client=client)
+    text = "".join(chunks)
+
+    assert text.startswith("절반만") and "⚠️ API 오류" in text
+    assert result["error"] and result["emotion_score"] == 5.0
+
+    list(app.groq_counsel_chat_stream(MESSAGES, client=client)[0])
+    assert client.calls == 2
+
+
+def test_unscored_answer_uses_fallback_and_caches_no_score(app):
+    client = FakeGroq(["점수 없는 답변입니다."])
+
+    chunks, result = app.groq_counsel_chat_stream(MESSAGES, client=client, fallback_score=8.2)
+    list(chunks)
+    assert (result["emotion_score"], result["scored"]) == (8.2, False)
+
+    # 캐시에는 점수 없이 저장 → 다음 요청도 그때의 로컬 추정값 사용
+    chunks, cached = app.groq_counsel_chat_stream(MESSAGES, client=client, fallback_score=3.0)
+    list(chunks)
+    assert cached["cached"] and (cached["emotion_score"], cached["scored"]) == (3.0, False)
@@ -0,0 +1,149 @@
+"""스키마 마이그레이션 + 주요 조회의 인덱스 사용 (EXPLAIN QUERY PLAN)"""
+import re
+
+LEGACY_CHATS = [
+    # (user_input, ai_response, emotion_score, risk_level, tags, timestamp)
+    ("물타기 할까", "멈추세요", 8.0, "HIGH", "손실회피, 복수심", "2024-01-01 10:00:00"),
+    ("다 팔까", "천천히", 6.0, "medium", "공포", "2024-01-02 23:30:00"),
+    ("그냥 물어봄", "네", None, "LOW", "중립", "2024-01-03 09:15:00"),
+]
+
+PARTITIONED_TABLES = ("chats", "chat_tags", "portfolio", "dangerous_moments", "addiction_patterns", "pressure_messages")
+FULL_SCAN = re.compile(rf"^SCAN ({'|'.join(PARTITIONED_TABLES)})$")
+
+
+def _migrate_to(app, monkeypatch, version):
+    with monkeypatch.context() as m:
+        m.setattr(app, "MIGRATIONS", [entry for entry in app.MIGRATIONS if entry[0] <= version])
+        return app.run_migrations()
+
+
+def _insert_legacy_rows(app):
+    with app.get_connection() as conn:
+        conn.executemany("""
+        INSERT INTO chats (user_input, ai_response, emotion_score, risk_level, tags, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, LEGACY_CHATS)
+        # UNIQUE 인덱스 도입 전에는 같은 시간대 패턴이 여러 행으로 쌓임
+        conn.executemany("""
+        INSERT INTO addiction_patterns (hour_of_day, day_of_week, investment_purpose, pattern_count, last_detected)
+        VALUES (?, ?, ?, ?, ?)
+        """, [(23, 5, "만회", 1, "2024-01-01 23:00:00"), (23, 5, "만회", 2, "2024-01-08 23:00:00"),
+              (9, 1, "만회", 1, "2024-01-02 09:00:00")])
+
+
+def test_fresh_database_reaches_latest_version(app):
+    latest = app.MIGRATIONS[-1][0]
+    with app.get_connection() as conn:
+        assert app.get_schema_version(conn.cursor()) == latest
+
+    # 다시 실행해도 아무 버전도 재적용하지 않음
+    assert app.run_migrations() == latest
+    with app.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone() == (latest,)
+
+
+def test_v2_splits_tags_without_app_helpers(bare_app, monkeypatch):
+    _migrate_to(bare_app, monkeypatch, 1)
+    _insert_legacy_rows(bare_app)
+    # 앱 쪽 태그 함수가 나중에 바뀌어도 v2 이관 결과는 그대로
+    monkeypatch.setattr(bare_app, "split_tags", lambda tags: ["바뀐 규칙"])
+    assert _migrate_to(bare_app, monkeypatch, 2) == 2
+
+    with bare_app.get_connection() as conn:
+        rows = conn.execute("SELECT chat_id, tag FROM chat_tags ORDER BY 1, 2").fetchall()
+    assert rows == [(1, "복수심"), (1, "손실회피"), (2, "공포")]
+
+
+def test_v3_seeds_global_aggregates_from_existing_chats(bare_app, monkeypatch):
+    _migrate_to(bare_app, monkeypatch, 1)
+    _insert_legacy_rows(bare_app)
+    assert _migrate_to(bare_app, monkeypatch, 3) == 3
+
+    with bare_app.get_connection() as conn:
+        totals = conn.execute("SELECT total_chats, emotion_sum, emotion_count, high_risk_count FROM chat_totals WHERE id = 1").fetchone()
+        tags = dict(conn.execute("SELECT tag, tag_count FROM chat_tag_counts").fetchall())
+        grid = conn.execute("SELECT SUM(emotion_sum), SUM(emotion_count) FROM chat_emotion_grid").fetchone()
+
+    assert totals == (3, 14.0, 2, 1)
+    assert tags == {"손실회피": 1, "복수심": 1, "공포": 1}
+    assert grid == (14.0, 2)
+
+
+def test_legacy_database_upgrades_in_place(bare_app, monkeypatch):
+    _migrate_to(bare_app, monkeypatch, 1)
+    _insert_legacy_rows(bare_app)
+    bare_app.run_migrations()
+
+    stats = bare_app.get_dashboard_stats(bare_app.DEFAULT_USER_ID)
+    assert (stats["total_chats"], stats["avg_emotion"], stats["high_risk_count"]) == (3, 7.0, 1)
+
+    with bare_app.get_connection() as conn:
+        tags = conn.execute("SELECT chat_id, tag, timestamp FROM chat_tags ORDER BY 1, 2").fetchall()
+        patterns = conn.execute("""
+        SELECT hour_of_day, day_of_week, pattern_count, last_detected FROM addiction_patterns ORDER BY 1
+        """).fetchall()
+    assert tags == [(1, "복수심", "2024-01-01 10:00:00"), (1, "손실회피", "2024-01-01 10:00:00"),
+                    (2, "공포", "2024-01-02 23:30:00")]
+    assert patterns == [(9, 1, 1, "2024-01-02 09:00:00"), (23, 5, 3, "2024-01-08 23:00:00")]
+
+    # v8 재집계 결과가 앱의 rebuild_chat_aggregates와 같아야 함
+    aggregates = ("chat_totals", "chat_tag_counts", "chat_emotion_grid")
+    with bare_app.get_connection() as conn:
+        before = [conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() for table in aggregates]
+    bare_app.rebuild_chat_aggregates()
+    with bare_app.get_connection() as conn:
+        after = [conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() for table in aggregates]
+    assert before == after
+
+
+def test_addiction_pattern_upsert_counts_repeats(app):
+    for _ in range(3):
+        app.update_addiction_pattern("u1", 23, 5)
+    assert app.flush_writes()
+
+    assert app.get_user_memory("u1")["addiction_patterns"] == [(23, 5, "만회", 3)]
+
+
+def _traced_statements(app, calls):
+    """calls 실행 중 gini.db에 나간 SELECT/INSERT 문 (바인딩 값 포함)"""
+    statements = []
+    with app.get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            for call in calls:
+                call()
+        finally:
+            conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "INSERT", "WITH"))]
+
+
+def test_hot_queries_do_not_full_scan(app):
+    user_id = "u1"
+    for i in range(20):
+        app.save_chat(user_id, f"질문 {i}", "답변", 5.0 + i % 4, "HIGH" if i % 3 == 0 else "LOW", ["공포"])
+        app.save_chat("u2", f"질문 {i}", "답변", 4.0, "LOW", ["욕심"])
+    app.save_dangerous_moment(user_id, 9.0, "공포", "전부 팔래")
+    assert app.flush_writes()
+
+    def upsert_pattern():
+        with app.get_connection() as conn:
+            app._write_addiction_pattern(conn.cursor(), user_id, 21, 1, "만회")
+
+    statements = _traced_statements(app, [
+        lambda: app.get_dashboard_stats(user_id),
+        lambda: app._get_user_memory(user_id, -1),
+        lambda: app.load_pattern_window(user_id),
+        lambda: app.load_history_page(user_id, page_size=5),
+        lambda: app.load_history_page(user_id, tag="공포", risk_level="HIGH"),
+        lambda: app.load_history_page(user_id, before_id=10, date_from="2020-01-01", date_to="2099-12-31"),
+        lambda: app.generate_weekly_report(user_id, patterns={}),
+        upsert_pattern,
+    ])
+    assert statements
+
+    with app.get_connection() as conn:
+        for sql in statements:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            full_scans = [detail for detail in plan if FULL_SCAN.match(detail)]
+            assert not full_scans, f"{sql.strip()}\n→ {plan}"
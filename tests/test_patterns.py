@@ -0,0 +1,74 @@
+"""거래 패턴 엔진 - 최근 상담 구간을 1회 조회해 4개 감지기를 함께 평가"""
+
+USER = "default"
+
+
+def _chat(app, text, minutes_ago):
+    app.save_chat(USER, text, "답변", 5.0, "LOW", ["중립"])
+    assert app.flush_writes()
+    with app.get_connection() as conn:
+        conn.execute("UPDATE chats SET timestamp = datetime('now', ?) WHERE id = (SELECT MAX(id) FROM chats)",
+                     (f"-{minutes_ago} minutes",))
+
+
+def _selects(app, fn):
+    """fn() 결과와 실행 중 나간 SELECT 문"""
+    statements = []
+    with app.get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            result = fn()
+        finally:
+            conn.set_trace_callback(None)
+    return result, [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def test_window_is_recent_days_plus_last_chats(app):
+    for i in range(4):
+        _chat(app, f"오래된 상담 {i}", 14400 - i)   # 10일 전
+    _chat(app, "최근 상담 0", 60)
+    _chat(app, "최근 상담 1", 30)
+
+    window = app.load_pattern_window(USER)
+    assert [row[2] for row in window] == ["최근 상담 1", "최근 상담 0", "오래된 상담 3", "오래된 상담 2", "오래된 상담 1"]
+    assert [row[3] for row in window] == [1, 1, 0, 0, 0]
+
+
+def test_detectors_share_one_cached_query(app):
+    _chat(app, "손실 났어", 10)
+
+    _, selects = _selects(app, lambda: app.analyze_trading_patterns(USER))
+    assert len(selects) == 1
+
+    _, selects = _selects(app, lambda: app.analyze_trading_patterns(USER))
+    assert selects == []
+
+    _chat(app, "또 떨어졌어", 5)   # save_chat이 이 사용자의 캐시 버전을 올림
+    patterns, selects = _selects(app, lambda: app.analyze_trading_patterns(USER))
+    assert len(selects) == 1
+    assert patterns["revenge"]["detected"]
+
+
+def test_patterns_and_report_reuse(app):
+    for minutes_ago, text in ((50, "급등주 놓쳤어"), (40, "다들 올라"), (30, "손실 났어"),
+                              (20, "또 떨어졌어"), (10, "손해 보고 팔까")):
+        _chat(app, text, minutes_ago)
+
+    patterns = app.analyze_trading_patterns(USER)
+    assert patterns["overtrading"]["detected"] and patterns["overtrading"]["count"] == 5
+    assert patterns["revenge"]["detected"] and patterns["revenge"]["time_diff"] == 10
+    assert patterns["loss_streak"]["detected"] and patterns["loss_streak"]["count"] == 3
+    assert not patterns["fomo"]["detected"]
+
+    assert [warning["type"] for warning in app.get_trading_pattern_warnings(USER, patterns)] == ["과매매", "복수매매", "연속손실"]
+    report = app.generate_weekly_report(USER, patterns)
+    assert report["patterns"] == {"overtrading": True, "revenge": True, "loss_streak": True, "fomo": False}
+
+
+def test_analysis_sees_a_just_queued_chat(app):
+    _chat(app, "배당 일정이 궁금해요", 30)
+    assert not app.analyze_trading_patterns(USER)["revenge"]["detected"]
+
+    # flush 없이 큐에만 넣은 상담도 다음 분석에 반영
+    app.save_chat(USER, "손실 봤어요", "답변", 5.0, "LOW", ["중립"])
+    assert app.analyze_trading_patterns(USER)["revenge"]["detected"]
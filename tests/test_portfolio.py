@@ -0,0 +1,86 @@
+"""포트폴리오 평가 (value_portfolio) - lot 합산, 시세 없는 종목, 스칼라 계산과 일치"""
+import random
+
+import pytest
+
+
+def scalar_reference(portfolio, quotes):
+    """종목별로 lot을 합산해 한 줄씩 계산하는 단순 루프 (비교 기준)"""
+    rows = {}
+    for item in portfolio:
+        row = rows.setdefault(item['종목코드'], {'수량': 0, '매입금액': 0, '매수횟수': 0, '종목명': item.get('종목명', '정보없음')})
+        row['수량'] += item['수량']
+        row['매입금액'] += item['매입가'] * item['수량']
+        row['매수횟수'] += 1
+
+    for ticker, row in rows.items():
+        data = quotes.get(ticker)
+        row['매입가'] = round(row['매입금액'] / row['수량'])
+        if data:
+            row['종목명'] = data['종목명']
+            row['현재가'] = data['현재가']
+            row['평가금액'] = data['현재가'] * row['수량']
+            row['등락률'] = data['등락률']
+        else:
+            row['현재가'] = row['매입가']
+            row['평가금액'] = row['매입금액']
+            row['등락률'] = 0.0
+        row['손익금액'] = row['평가금액'] - row['매입금액']
+        row['수익률'] = round(row['손익금액'] * 100 / row['매입금액'], 2)
+    return rows
+
+
+def test_repeated_buys_become_one_row(app):
+    portfolio = [
+        {'종목코드': '005930', '종목명': '삼성전자', '매입가': 70000, '수량': 10},
+        {'종목코드': '000660', '종목명': 'SK하이닉스', '매입가': 130000, '수량': 1},
+        {'종목코드': '005930', '종목명': '삼성전자', '매입가': 60000, '수량': 30},
+    ]
+    quotes = {'005930': {'종목명': '삼성전자', '현재가': 66000, '등락률': 1.2}, '000660': None}
+
+    holdings, summary = app.value_portfolio(portfolio, quotes)
+
+    assert list(holdings['종목코드']) == ['005930', '000660']
+    samsung = holdings.iloc[0]
+    assert (samsung['수량'], samsung['매입가'], samsung['매수횟수']) == (40, 62500, 2)
+    assert (samsung['평가금액'], samsung['손익금액'], samsung['수익률']) == (2_640_000, 140_000, 5.6)
+
+    hynix = holdings.iloc[1]
+    assert (hynix['현재가'], hynix['손익금액'], hynix['수익률'], hynix['종목명']) == (130000, 0, 0.0, 'SK하이닉스')
+
+    assert summary == {'총매입액': 2_630_000, '총평가액': 2_770_000, '총손익': 140_000, '수익률': 5.32}
+
+
+@pytest.mark.parametrize("lots", [1, 50, 2000])
+def test_matches_scalar_reference(app, lots):
+    rng = random.Random(lots)
+    codes = [f"{n:06d}" for n in range(max(1, lots // 4))]
+    portfolio = [
+        {'종목코드': rng.choice(codes), '종목명': '테스트', '매입가': rng.randrange(1000, 500000, 10), '수량': rng.randrange(1, 100)}
+        for _ in range(lots)
+    ]
+    quotes = {
+        code: None if rng.random() < 0.2 else {'종목명': f"종목{code}", '현재가': rng.randrange(1000, 500000, 10), '등락률': 0.5}
+        for code in codes
+    }
+
+    holdings, summary = app.value_portfolio(portfolio, quotes)
+    expected = scalar_reference(portfolio, quotes)
+
+    assert list(holdings['종목코드']) == list(expected)
+    for row in holdings.to_dict('records'):
+        reference = expected[row['종목코드']]
+        for column in ('종목명', '매입가', '현재가', '수량', '매입금액', '평가금액', '손익금액', '수익률', '등락률', '매수횟수'):
+            assert row[column] == reference[column], (row['종목코드'], column)
+
+    assert summary['총매입액'] == sum(row['매입금액'] for row in expected.values())
+    assert summary['총평가액'] == sum(row['평가금액'] for row in expected.values())
+
+
+def test_update_portfolio_realtime_without_pykrx(app):
+    holdings, summary = app.update_portfolio_realtime([
+        {'종목코드': '999999', '종목명': '비상장', '매입가': 5000, '수량': 3},
+    ])
+
+    assert holdings.to_dict('records')[0]['평가금액'] == 15000
+    assert summary['총손익'] == 0
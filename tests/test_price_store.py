@@ -0,0 +1,110 @@
+"""KRX 거래일 달력 + 시장 전체 시세 스냅샷 저장소 (가짜 pykrx)"""
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+
+class FakePykrx:
+    """get_market_ohlcv(날짜, market="ALL")만 흉내 - 호출 날짜를 기록, empty_days는 빈 결과"""
+
+    def __init__(self, empty_days=()):
+        self.calls = []
+        self.empty_days = set(empty_days)
+
+    def get_market_ohlcv(self, day, market="ALL"):
+        assert market == "ALL"
+        self.calls.append(day)
+        if day in self.empty_days:
+            return pd.DataFrame(columns=["종가", "등락률"])
+        bump = len(self.calls)
+        return pd.DataFrame(
+            {"종가": [70000 + bump, 120000 + bump], "등락률": [1.234, -0.5]},
+            index=pd.Index(["005930", "000660"], name="티커"),
+        )
+
+
+@pytest.fixture
+def pykrx(app, monkeypatch):
+    fake = FakePykrx()
+    monkeypatch.setattr(app, "pykrx_stock", fake)
+    monkeypatch.setattr(app, "PYKRX_AVAILABLE", True)
+    return fake
+
+
+def kst(app, text):
+    return datetime.fromisoformat(text).replace(tzinfo=app.KST)
+
+
+@pytest.mark.parametrize("now, expected", [
+    ("2026-10-15 10:00", "2026-10-15"),   # 목요일 장중
+    ("2026-10-15 08:59", "2026-10-14"),   # 장 시작 전 → 전 거래일
+    ("2026-10-17 12:00", "2026-10-16"),   # 토요일 → 금요일
+    ("2026-10-12 08:00", "2026-10-08"),   # 월요일 개장 전, 금요일(한글날) 휴장 → 목요일
+])
+def test_latest_trading_day(app, now, expected):
+    assert app.latest_trading_day(kst(app, now)) == date.fromisoformat(expected)
+
+
+def test_price_final_after_close(app):
+    day = date(2026, 10, 15)
+    assert not app.is_price_final(day, kst(app, "2026-10-15 15:59"))
+    assert app.is_price_final(day, kst(app, "2026-10-15 16:00"))
+    assert app.is_price_final(day, kst(app, "2026-10-16 08:00"))
+
+
+def test_intraday_snapshot_reused_within_ttl(app, pykrx):
+    assert app.refresh_price_snapshot(kst(app, "2026-10-15 10:00")) == "2026-10-15"
+    assert app.refresh_price_snapshot(kst(app, "2026-10-15 10:04")) == "2026-10-15"
+    assert pykrx.calls == ["20261015"]
+
+    app.refresh_price_snapshot(kst(app, "2026-10-15 10:06"))
+    assert pykrx.calls == ["20261015", "20261015"]
+
+
+def test_final_snapshot_cached_until_next_session(app, pykrx):
+    app.refresh_price_snapshot(kst(app, "2026-10-16 16:30"))
+    for now in ("2026-10-16 20:00", "2026-10-17 12:00", "2026-10-19 08:59"):
+        assert app.refresh_price_snapshot(kst(app, now)) == "2026-10-16"
+    assert pykrx.calls == ["20261016"]
+
+    # 다음 거래일 장이 열리면 새 스냅샷
+    assert app.refresh_price_snapshot(kst(app, "2026-10-19 09:01")) == "2026-10-19"
+    assert pykrx.calls == ["20261016", "20261019"]
+
+
+def test_unlisted_holiday_falls_back_to_previous_day(app, pykrx):
+    pykrx.empty_days = {"20261015"}   # 달력에 없는 임시 휴장
+
+    assert app.refresh_price_snapshot(kst(app, "2026-10-15 17:00")) == "2026-10-14"
+    assert pykrx.calls == ["20261015", "20261014"]
+
+
+def test_failed_snapshot_backs_off(app, pykrx):
+    pykrx.empty_days = {"20261015", "20261014", "20261013", "20261012", "20261008"}
+
+    assert app.refresh_price_snapshot(kst(app, "2026-10-15 10:00")) is None
+    assert len(pykrx.calls) == 5
+
+    # 재시도 간격 안에서는 네트워크 호출 없이 바로 None
+    assert app.refresh_price_snapshot(kst(app, "2026-10-15 10:00:30")) is None
+    assert len(pykrx.calls) == 5
+
+    pykrx.empty_days = set()
+    assert app.refresh_price_snapshot(kst(app, "2026-10-15 10:01:01")) == "2026-10-15"
+    assert len(pykrx.calls) == 6
+
+
+def test_load_price_bars_reads_store(app, pykrx, monkeypatch):
+    monkeypatch.setattr(app, "now_kst", lambda: kst(app, "2026-10-16 17:00"))
+
+    bars = app.load_price_bars(["005930", "999999"])
+    assert bars == {"005930": {"종가": 70001, "등락률": 1.23, "조회일": "2026-10-16"}}
+
+    app.load_price_bars(["000660"])
+    assert len(pykrx.calls) == 1
+
+
+def test_no_pykrx_and_no_snapshot(app):
+    assert app.refresh_price_snapshot(kst(app, "2026-10-15 10:00")) is None
+    assert app.load_price_bars(["005930"]) == {}
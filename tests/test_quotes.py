@@ -0,0 +1,137 @@
+"""
+여러 종목 시세 동시 조회 (get_stock_prices_batch) 테스트
+
+- 호출마다 지연이 있는 가짜 pykrx 모듈로 네트워크 없이 확인
+"""
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+CALL_DELAY = 0.2
+
+
+class FakePykrx:
+    """pykrx.stock 대역: 호출마다 CALL_DELAY만큼 지연, 호출 횟수 기록 (listed는 시장 스냅샷 종목)"""
+
+    def __init__(self, listed=("900000",), delay=CALL_DELAY, hang=()):
+        self.listed = list(listed)
+        self.delay = delay
+        self.hang = set(hang)
+        self.calls = {"by_date": 0, "name": 0, "snapshot": 0}
+        self.lock = threading.Lock()
+
+    def _count(self, kind):
+        with self.lock:
+            self.calls[kind] += 1
+
+    def get_market_ohlcv_by_date(self, start, end, ticker):
+        self._count("by_date")
+        time.sleep(1.5 if ticker in self.hang else self.delay)
+        index = pd.to_datetime(["2024-01-04", "2024-01-05"])
+        return pd.DataFrame({"종가": [1000, 1100], "등락률": [0.0, 10.0]}, index=index)
+
+    def get_market_ticker_name(self, ticker):
+        self._count("name")
+        time.sleep(self.delay)
+        return f"종목{ticker}"
+
+    def get_market_ohlcv(self, day, market="ALL"):
+        self._count("snapshot")
+        time.sleep(self.delay)
+        return pd.DataFrame(
+            {"종가": [2000] * len(self.listed), "등락률": [1.5] * len(self.listed)},
+            index=self.listed,
+        )
+
+
+@pytest.fixture
+def install_pykrx(app, monkeypatch):
+    def install(fake):
+        monkeypatch.setattr(app, "PYKRX_AVAILABLE", True)
+        monkeypatch.setattr(app, "pykrx_stock", fake, raising=False)
+        return fake
+    yield install
+    # 시간 초과로 버려진 조회가 다음 테스트의 가짜 모듈을 건드리지 않도록 대기
+    app.get_quote_executor().shutdown(wait=True)
+
+
+def test_small_batch_is_fetched_concurrently(app, install_pykrx):
+    tickers = [f"{n:06d}" for n in range(1, 7)]
+    fake = install_pykrx(FakePykrx())
+
+    started = time.perf_counter()
+    quotes = app.get_stock_prices_batch(tickers + tickers[:2])
+    elapsed = time.perf_counter() - started
+
+    assert list(quotes) == tickers
+    assert all(quote["현재가"] == 1100 for quote in quotes.values())
+    assert fake.calls["by_date"] == len(tickers)
+    # 종목명은 종목 마스터에서 → pykrx 호출 없음
+    assert fake.calls["name"] == 0
+    # 저장소 스냅샷은 세션/스레드가 몇 개든 1회만 받음
+    assert fake.calls["snapshot"] == 1
+    # 직렬이면 6 × 시세 조회 ≈ 1.2초
+    assert elapsed < len(tickers) * CALL_DELAY * 0.75
+
+
+def test_slow_ticker_falls_back_to_stored_close(app, install_pykrx, monkeypatch):
+    fake = install_pykrx(FakePykrx(hang={"005930", "000660", "999999"}))
+    monkeypatch.setattr(app, "QUOTE_FETCH_TIMEOUT", 0.8)
+    app.get_price_store_lock()
+    with app.get_connection(app.PRICE_STORE_PATH) as conn:
+        conn.execute("INSERT INTO daily_closes (ticker, trade_date, close) VALUES ('005930', '2026-10-14', 71000)")
+
+    quotes = app.get_stock_prices_batch(["005930", "000660", "999999", "000001"])
+
+    assert quotes["005930"] == {"종목코드": "005930", "종목명": "삼성전자", "현재가": 71000, "등락률": 0.0, "조회일": "2026-10-14"}
+    # 저장된 종가가 없으면 가짜 시세를 만들지 않음
+    assert quotes["000660"] is None
+    assert quotes["999999"] is None
+    assert quotes["000001"]["현재가"] == 1100
+    assert fake.calls["by_date"] == 4
+
+
+def test_listed_tickers_come_from_one_market_snapshot(app, install_pykrx):
+    tickers = [f"{n:06d}" for n in range(1, 20)]
+    fake = install_pykrx(FakePykrx(listed=tickers))
+
+    quotes = app.get_stock_prices_batch(tickers)
+
+    assert fake.calls["snapshot"] == 1
+    assert fake.calls["by_date"] == 0
+    assert set(quotes) == set(tickers)
+    assert all(quote["현재가"] == 2000 and quote["등락률"] == 1.5 for quote in quotes.values())
+
+
+def test_unlisted_tickers_fall_back_to_single_lookup(app, install_pykrx):
+    listed = [f"{n:06d}" for n in range(1, 4)]
+    fake = install_pykrx(FakePykrx(listed=listed))
+
+    quotes = app.get_stock_prices_batch(listed + ["777777"])
+
+    assert fake.calls["snapshot"] == 1
+    assert fake.calls["by_date"] == 1
+    assert quotes["777777"]["현재가"] == 1100
+
+
+class BrokenSnapshotPykrx(FakePykrx):
+    """시장 스냅샷 호출이 항상 실패하는 pykrx"""
+
+    def get_market_ohlcv(self, day, market="ALL"):
+        self._count("snapshot")
+        raise ConnectionError("KRX 응답 없음")
+
+
+def test_failed_snapshot_is_not_retried_per_ticker(app, install_pykrx):
+    tickers = [f"{n:06d}" for n in range(1, 7)]
+    fake = install_pykrx(BrokenSnapshotPykrx())
+
+    quotes = app.get_stock_prices_batch(tickers)
+    assert all(quote["현재가"] == 1100 for quote in quotes.values())
+
+    # 조회 전 1회만 시도, 재시도 간격 안에서는 다음 조회도 pykrx 스냅샷을 다시 부르지 않음
+    app.get_stock_prices_batch(tickers)
+    assert app.get_stock_price_realtime("000099")["현재가"] == 1100
+    assert fake.calls["snapshot"] == 1
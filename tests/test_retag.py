@@ -0,0 +1,112 @@
+"""상담 기록 재태깅 배치 작업 (retag.py) - 변경분만 갱신, 체크포인트 이어하기"""
+import shutil
+from pathlib import Path
+
+import pytest
+
+import retag
+
+CHATS = [
+    # (질문, 저장된 태그, 저장된 위험 레벨, 감정 점수, 저장된 위험 점수)
+    ("불안해서 몰빵할까", ["중립"], "low", 9.0, None),
+    ("오늘 날씨 좋네요", ["중립"], "low", 2.0, None),
+    ("차분하게 분석 중", ["냉정"], "low", 3.0, 3.0),
+    ("당장 사도 될까", ["중립"], "high", 8.0, 8.0),
+    ("후회돼요", ["후회"], "mid", 5.0, 5.0),
+]
+
+
+@pytest.fixture
+def chats(app):
+    for user_input, tags, risk_level, emotion, risk in CHATS:
+        app.save_chat("default", user_input, "답변", emotion, risk_level, tags, risk)
+    assert app.flush_writes()
+    return app
+
+
+def _stop(done, total):
+    """첫 청크 커밋 직후 중단"""
+    raise KeyboardInterrupt
+
+
+def _rows(app):
+    with app.get_connection() as conn:
+        chats = conn.execute("SELECT id, tags, risk_level, risk_score FROM chats ORDER BY id").fetchall()
+        tags = conn.execute("SELECT chat_id, tag FROM chat_tags ORDER BY chat_id, tag").fetchall()
+    return chats, tags
+
+
+def test_retag_updates_changed_rows(chats):
+    result = retag.retag_chats(chunk_size=2)
+
+    assert (result["processed"], result["changed"]) == (5, 3)
+    assert result["finished_at"] is not None
+
+    rows, tags = _rows(chats)
+    assert rows == [
+        (1, "불안, 충동", "high", 6.6),     # 저장 이전 상담: 당시 변동성/뉴스 점수로 복원
+        (2, "중립", "low", 3.1),
+        (3, "냉정", "low", 3.0),
+        (4, "충동", "high", 8.0),
+        (5, "후회", "mid", 5.0),
+    ]
+    # 중립은 save_chat처럼 chat_tags에 넣지 않음
+    assert tags == [(1, "불안"), (1, "충동"), (3, "냉정"), (4, "충동"), (5, "후회")]
+
+
+def test_interrupted_run_resumes_after_checkpoint(chats):
+    with pytest.raises(KeyboardInterrupt):
+        retag.retag_chats(chunk_size=2, progress=_stop)
+
+    checkpoint = chats.get_job_checkpoint()
+    assert (checkpoint["last_id"], checkpoint["processed"], checkpoint["finished_at"]) == (2, 2, None)
+
+    seen = []
+    result = retag.retag_chats(chunk_size=2, progress=lambda done, total: seen.append((done, total)))
+
+    assert seen == [(4, 5), (5, 5)]
+    assert (result["processed"], result["changed"]) == (5, 3)
+
+
+def test_finished_job_and_restart_start_over(chats):
+    retag.retag_chats(chunk_size=2)
+
+    # 완료된 작업을 다시 돌리면 처음부터, 이미 최신이라 변경 없음
+    again = retag.retag_chats(chunk_size=2)
+    assert (again["processed"], again["changed"]) == (5, 0)
+
+    with pytest.raises(KeyboardInterrupt):
+        retag.retag_chats(chunk_size=2, progress=_stop)
+    restarted = retag.retag_chats(chunk_size=10, restart=True)
+    assert restarted["processed"] == 5
+
+
+def test_rescore_chat_is_pure(app):
+    assert retag._rescore_chat((7, "차분하게 분석 중", 3.0, 3.0, "low", "냉정")) is None
+    assert retag._rescore_chat((8, "무서워요", None, None, "low", "중립")) == (8, "불안", ["불안"], "low", None)
+
+
+def test_cli_runs_with_process_pool(chats, capsys):
+    assert retag.main(["--workers", "2", "--chunk-size", "2"]) == 0
+
+    assert "5건 확인, 3건 변경" in capsys.readouterr().out
+    assert _rows(chats)[0][0] == (1, "불안, 충동", "high", 6.6)
+
+
+def test_settings_job_resumes_in_a_separate_process(chats):
+    # 설정 탭과 같은 작업 디렉터리(.streamlit/secrets.toml, gini.db)에서 실행
+    shutil.copytree(Path(retag.__file__).parent / ".streamlit", Path.cwd() / ".streamlit")
+    with pytest.raises(KeyboardInterrupt):
+        retag.retag_chats(chunk_size=2, progress=_stop)
+
+    assert chats.start_retag_job()
+    assert chats.is_retag_job_running()
+    assert not chats.start_retag_job()     # 실행 중에는 하나만
+
+    process = chats.get_retag_runner()["process"]
+    assert process.wait(timeout=60) == 0
+    assert not chats.is_retag_job_running()
+
+    checkpoint = chats.get_job_checkpoint()
+    assert (checkpoint["processed"], checkpoint["changed"]) == (5, 3)
+    assert checkpoint["finished_at"] is not None
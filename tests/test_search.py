@@ -0,0 +1,82 @@
+"""상담 전문 검색 (FTS5 trigram) - 전체 비교 결과와 같은지, 사용자 범위가 지켜지는지"""
+import random
+
+import pytest
+
+WORDS = ["에코프로", "에코프로비엠", "삼성전자", "손절", "물타기", "반도체", "급등", "불안해요", "ETF",
+         "코스닥", "익절", "배당", "\"따옴표\"", "50%", "오늘", "내일", "그냥", "전부", "팔까요", "살까요"]
+USERS = ["alice@gmail.com", "bob@gmail.com", "0123456789abcdef0123456789abcdef"]
+
+
+def reference_search(app, rows, user_id, query, limit=20):
+    """색인 없이 Python으로 전부 비교한 결과 (id 목록)"""
+    terms = tuple(dict.fromkeys(query.split()))
+    matched = [
+        (chat_id, user_input, ai_response)
+        for chat_id, owner, user_input, ai_response in rows
+        if owner == user_id and all(
+            term.lower() in user_input.lower() or term.lower() in ai_response.lower() for term in terms
+        )
+    ]
+    matched.sort(key=lambda row: (-app._search_score(row[1], row[2], terms), -row[0]))
+    return [chat_id for chat_id, _, _ in matched[:limit]]
+
+
+@pytest.fixture
+def corpus(app):
+    rng = random.Random(24)
+    for _ in range(300):
+        user_id = rng.choice(USERS)
+        user_input = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+        ai_response = "".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        app.save_chat(user_id, user_input, ai_response, 5.0, "LOW", ["중립"])
+    assert app.flush_writes()
+
+    with app.get_connection() as conn:
+        return conn.execute("SELECT id, user_id, user_input, ai_response FROM chats").fetchall()
+
+
+def test_fts_index_is_used(app):
+    with app.get_connection() as conn:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chats_fts'").fetchone()
+        plan = conn.execute("""
+        EXPLAIN QUERY PLAN
+        SELECT chats.id FROM chats_fts JOIN chats ON chats.id = chats_fts.rowid
+        WHERE chats_fts MATCH ? AND chats.user_id = ?
+        """, ('"에코프로"', "u1")).fetchall()
+    assert any("VIRTUAL TABLE INDEX" in row[3] for row in plan)
+
+
+@pytest.mark.parametrize("query", [
+    "에코프로", "에코프로비엠", "삼성전자 손절", "ETF", "etf 배당", "급등", "50%", "\"따옴표\"", "따옴",
+    "물타기 반도체 오늘", "코스", "코스닥 ETF 50%", "없는단어",
+])
+def test_results_match_full_comparison(app, corpus, query):
+    for user_id in USERS:
+        results = app.search_chats(user_id, query)
+        assert [row[0] for row in results] == reference_search(app, corpus, user_id, query), (user_id, query)
+        for _, _, _, _, snippet in results:
+            assert "**" in snippet
+
+
+def test_terms_do_not_match_user_key(app, corpus):
+    for query in ("gmail", "alice", "#", "0123456789abcdef", "bob@gmail.com"):
+        for user_id in USERS:
+            assert app.search_chats(user_id, query) == [], (user_id, query)
+
+
+def test_index_follows_chat_changes(app):
+    app.save_chat("u1", "에코프로 전부 팔까요", "기다리세요", 6.0, "LOW", ["중립"])
+    assert app.flush_writes()
+    [(chat_id, *_)] = app.search_chats("u1", "에코프로")
+
+    with app.get_connection() as conn:
+        conn.execute("UPDATE chats SET user_input = '삼성전자 살까요' WHERE id = ?", (chat_id,))
+    app._invalidate_chat_caches({"u1"})
+    assert app.search_chats("u1", "에코프로") == []
+    assert [row[0] for row in app.search_chats("u1", "삼성전자")] == [chat_id]
+
+    with app.get_connection() as conn:
+        conn.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+    app._invalidate_chat_caches({"u1"})
+    assert app.search_chats("u1", "삼성전자") == []
@@ -0,0 +1,71 @@
+"""종목명 퍼지 매칭 - 색인 후보 선별이 전 종목 SequenceMatcher 비교와 같은 결과인지"""
+import random
+
+import pytest
+
+SYLLABLES = "가나다라마바사아자차카타파하삼성전자현대기아에코프로셀트리온한미반도체카오게임즈뱅크화학금융지주바이오"
+
+
+def _full_scan(app, names, input_text, threshold):
+    """색인 도입 전 방식: 모든 종목명과 SequenceMatcher 비교"""
+    similarities = [
+        (name, code, app.get_similarity(input_text, name))
+        for name, code in names.items()
+    ]
+    similarities = [item for item in similarities if item[2] >= threshold]
+    similarities.sort(key=lambda x: x[2], reverse=True)
+    return similarities[:3]
+
+
+@pytest.fixture(scope="module")
+def market_names():
+    """내장 종목 + 무작위 종목명으로 전 종목 규모(약 2,700개) 목록"""
+    import app
+
+    rng = random.Random(7)
+    names = dict(app.STOCK_NAMES_DB)
+    while len(names) < 2700:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 7)))
+        names.setdefault(name, f"{len(names):06d}")
+    return names
+
+
+def _typos(names, count, seed):
+    rng = random.Random(seed)
+    queries = []
+    for name in rng.sample(sorted(names), count):
+        i = rng.randrange(len(name))
+        queries.append(name[:i] + rng.choice(SYLLABLES) + name[i + 1:])
+    return queries
+
+
+def test_shortlist_matches_full_scan(app, market_names):
+    index = app.build_stock_name_index(market_names)
+    queries = _typos(market_names, 50, seed=1) + list(app.COMMON_MISTAKES) + ["삼성", "에코프로비엠", "zzz"]
+
+    for threshold in (0.6, 0.7):
+        for query in queries:
+            assert app._rank_similar_stocks(index, query, threshold) == _full_scan(app, market_names, query, threshold), query
+
+
+def test_find_similar_stock_shortcuts_and_cache(app):
+    assert app.find_similar_stock("삼성전자") == [("삼성전자", "005930", 1.0)]
+    assert app.find_similar_stock("상승전자") == [("삼성전자", "005930", 0.95)]
+
+    first = app.find_similar_stock("셀트리욘")
+    assert first[0][:2] == ("셀트리온", "068270")
+
+    cache = app.get_stock_name_index()["cache"]
+    assert ("셀트리욘", 0.7) in cache
+    first.clear()   # 호출자가 결과를 바꿔도 캐시는 그대로
+    assert app.find_similar_stock("셀트리욘")[0][:2] == ("셀트리온", "068270")
+
+
+
+@pytest.mark.parametrize("word, name", [("세계", "신세계"), ("마트", "이마트")])
+def test_short_words_are_not_fuzzy_matched(app, monkeypatch, word, name):
+    monkeypatch.setattr(app, "get_stock_names", lambda: {"신세계": "004170", "이마트": "139480"})
+    assert app.get_similarity(word, name) == 0.8
+
+    assert app.find_similar_stock(word) == []
+    assert app.find_similar_stock(name) == [(name, app.get_stock_names()[name], 1.0)]
@@ -0,0 +1,43 @@
+"""종목 언급 찾기 (Aho–Corasick) + 위치 기반 보정"""
+import pytest
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("삼성전자를 샀어요", [(0, 4, "삼성전자", "005930", 1.0)]),
+    ("하이닉스가 올랐네", [(0, 4, "SK하이닉스", "000660", 0.95)]),
+    ("삼성전자우선주", []),                       # 뒤에 조사가 아닌 글자
+    ("신삼성전자", []),                           # 단어 중간에서 시작
+    ("SK하이닉스, 카카오!", [(0, 6, "SK하이닉스", "000660", 1.0), (8, 11, "카카오", "035720", 1.0)]),
+])
+def test_find_stock_mentions(app, text, expected):
+    assert app.find_stock_mentions(text) == expected
+
+
+def test_longest_match_wins(app):
+    mentions = app.find_stock_mentions("삼성바이오로직스 얘기")
+    assert [name for _, _, name, _, _ in mentions] == ["삼성바이오로직스"]
+
+
+def test_corrections_are_spliced_by_offset(app):
+    result = app.extract_and_correct_stocks("하이닉스가 SK하이닉스보다 싸다고? 상승전자도")
+
+    assert result["corrected"] == "SK하이닉스가 SK하이닉스보다 싸다고? 삼성전자도"
+    assert [(s["original"], s["corrected"], s["start"], s["end"]) for s in result["found_stocks"]] == [
+        ("하이닉스", "SK하이닉스", 0, 4),
+        ("SK하이닉스", "SK하이닉스", 6, 12),
+        ("상승전자", "삼성전자", 20, 24),
+    ]
+    assert result["needs_confirmation"]
+
+
+def test_exact_mentions_need_no_confirmation(app):
+    result = app.extract_and_correct_stocks("오늘 카카오랑 NAVER 둘 다 샀어요")
+
+    assert result["corrected"] == "오늘 카카오랑 NAVER 둘 다 샀어요"
+    assert [s["code"] for s in result["found_stocks"]] == ["035720", "035420"]
+    assert not result["needs_confirmation"]
+
+
+def test_strip_particle(app):
+    assert app.strip_particle("셀트리욘이랑") == "셀트리욘"
+    assert app.strip_particle("기아") == "기아"
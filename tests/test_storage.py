@@ -0,0 +1,309 @@
+"""
+저장소 함수 - 백엔드별 같은 시나리오
+
+- sqlite: 로컬 gini.db
+- pg-standin: PgConnection/PgCursor/_pg_sql 경로를 psycopg 대역(sqlite3 위에서 실행)으로 검증
+- postgres: GINI_TEST_DATABASE_URL이 있으면 실제 PostgreSQL (public 스키마를 비우고 시작하므로 전용 DB 사용)
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import pytest
+
+PG_PLACEHOLDER = re.compile(r"%(.)")
+
+
+def _sqlite_sql(sql):
+    """psycopg 형식 SQL → sqlite3 ('%s' → '?', '%%' → '%', 그 외 '%'는 psycopg처럼 오류)"""
+    def replace(match):
+        if match.group(1) == "s":
+            return "?"
+        if match.group(1) == "%":
+            return "%"
+        raise ValueError(f"psycopg가 거부하는 자리표시자: %{match.group(1)}")
+    return PG_PLACEHOLDER.sub(replace, sql)
+
+
+class StandInCursor:
+    """psycopg 커서 대역 - 받은 SQL을 기록하고 sqlite3로 실행"""
+
+    def __init__(self, raw, executed):
+        self.raw = raw
+        self.executed = executed
+
+    def execute(self, sql, params):
+        self.executed.append(sql)
+        self.raw.execute(_sqlite_sql(sql), params)
+
+    def executemany(self, sql, seq_of_params):
+        self.executed.append(sql)
+        self.raw.executemany(_sqlite_sql(sql), seq_of_params)
+
+    def fetchone(self):
+        return self.raw.fetchone()
+
+    def fetchall(self):
+        return self.raw.fetchall()
+
+
+class StandInConnection:
+    """psycopg 연결 대역 (PgConnection이 쓰는 cursor()만)"""
+
+    def __init__(self, raw, executed):
+        self.raw = raw
+        self.executed = executed
+
+    def cursor(self):
+        return StandInCursor(self.raw.cursor(), self.executed)
+
+
+class StandInPool:
+    """psycopg_pool 대역 - connection()이 정상 종료 시 커밋, 예외 시 롤백"""
+
+    def __init__(self, path):
+        self.path = path
+        self.executed = []
+        self.borrowed = 0
+
+    @contextmanager
+    def connection(self):
+        raw = sqlite3.connect(self.path, check_same_thread=False)
+        self.borrowed += 1
+        try:
+            yield StandInConnection(raw, self.executed)
+            raw.commit()
+        except BaseException:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+
+def _reset_pg_schema(url):
+    import psycopg
+
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute("DROP SCHEMA IF EXISTS public CASCADE")
+        conn.execute("CREATE SCHEMA public")
+
+
+@pytest.fixture(params=["sqlite", "pg-standin", "postgres"])
+def storage(request, bare_app, monkeypatch):
+    app = bare_app
+
+    if request.param == "postgres":
+        url = os.getenv("GINI_TEST_DATABASE_URL")
+        if not url or not app.PSYCOPG_AVAILABLE:
+            pytest.skip("GINI_TEST_DATABASE_URL 또는 psycopg 없음")
+        _reset_pg_schema(url)
+        monkeypatch.setattr(app, "DB_BACKEND", "postgres")
+        monkeypatch.setattr(app, "DATABASE_URL", url)
+        app.create_tables()
+        yield app
+        app.flush_writes()
+        app.get_pg_pool()['pool'].close()
+        return
+
+    app.create_tables()
+    if request.param == "pg-standin":
+        # SQLite 스키마를 만든 뒤 같은 파일을 PostgreSQL 어댑터 경로로 사용
+        # (대역은 sqlite3 위에서 실행 → SQL 방언 함수만 SQLite 식 유지)
+        state = {'pool': StandInPool(app.DB_PATH), 'local': threading.local()}
+        monkeypatch.setattr(app, "DB_BACKEND", "postgres")
+        monkeypatch.setattr(app, "get_pg_pool", lambda: state)
+        monkeypatch.setattr(app, "sql_weekday", lambda column: f"CAST(strftime('%w', {column}) AS INTEGER)")
+        monkeypatch.setattr(app, "sql_hour", lambda column: f"CAST(strftime('%H', {column}) AS INTEGER)")
+        monkeypatch.setattr(app, "sql_contains", lambda column: f"{column} LIKE ? ESCAPE '\\'")
+    yield app
+
+
+def _seed_chats(app):
+    app.save_chat("u1", "삼성전자 물타기 할까", "멈추세요", 8.0, "HIGH", ["손실회피", "복수심"], 8.5, "llm")
+    app.save_chat("u1", "100% 확신인데 풀매수", "확신은 위험합니다", 7.0, "MEDIUM", ["과신"], 7.0, "llm")
+    app.save_chat("u1", "오늘은 쉬어요", "좋습니다", 3.0, "LOW", ["중립"], 3.0, "local")
+    app.save_chat("u2", "삼성전자 손절", "괜찮아요", 6.0, "MEDIUM", ["공포"], 6.0, "llm")
+    assert app.flush_writes()
+
+
+def test_chat_aggregates_are_per_user(storage):
+    _seed_chats(storage)
+
+    stats = storage.get_dashboard_stats("u1")
+    assert stats["total_chats"] == 3
+    assert stats["avg_emotion"] == 6.0
+    assert stats["high_risk_count"] == 1
+    assert stats["week_chats"] == 3
+    assert stats["most_common_count"] == 1
+
+    assert storage.get_dashboard_stats("u2")["total_chats"] == 1
+    assert storage.get_dashboard_stats("nobody")["total_chats"] == 0
+
+
+def test_chat_insert_without_returning(app, monkeypatch):
+    # SQLite 3.35 미만 (RETURNING 없음) → lastrowid로 태그/집계 연결
+    monkeypatch.setattr(app, "SQLITE_HAS_RETURNING", False)
+    statements = []
+    with app.get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        for text in ("물타기 할까", "손절할까"):
+            app._write_chat(conn.cursor(), "u1", text, "멈추세요", 8.0, "HIGH", ["복수심"])
+        conn.set_trace_callback(None)
+        tags = conn.execute("SELECT chat_id, tag FROM chat_tags ORDER BY chat_id").fetchall()
+
+    assert not any("RETURNING" in sql for sql in statements)
+    assert tags == [(1, "복수심"), (2, "복수심")]
+    assert app.get_dashboard_stats("u1")["high_risk_count"] == 2
+
+
+def test_history_pages_by_id(storage):
+    _seed_chats(storage)
+
+    rows, next_before = storage.load_history_page("u1", page_size=2)
+    assert [row[1] for row in rows] == ["오늘은 쉬어요", "100% 확신인데 풀매수"]
+    rows, next_before = storage.load_history_page("u1", before_id=next_before, page_size=2)
+    assert [row[1] for row in rows] == ["삼성전자 물타기 할까"]
+    assert next_before is None
+
+    rows, _ = storage.load_history_page("u1", tag="과신")
+    assert [row[1] for row in rows] == ["100% 확신인데 풀매수"]
+    assert storage.load_chat_response("u1", rows[0][0]) == "확신은 위험합니다"
+    assert storage.load_chat_response("u2", rows[0][0]) is None
+
+
+def test_history_date_range_is_kst(storage):
+    for text in ("14일 밤", "15일 0시", "15일 밤", "16일 0시"):
+        storage.save_chat("u1", text, "네", 5.0, "low", ["중립"])
+    assert storage.flush_writes()
+    with storage.get_connection() as conn:
+        for text, utc in (("14일 밤", "2026-10-14 14:59:59"), ("15일 0시", "2026-10-14 15:00:00"),
+                          ("15일 밤", "2026-10-15 14:59:59"), ("16일 0시", "2026-10-15 15:00:00")):
+            conn.execute("UPDATE chats SET timestamp = ? WHERE user_input = ?", (utc, text))
+    storage._invalidate_chat_caches({"u1"})
+
+    rows, _ = storage.load_history_page("u1", date_from="2026-10-15", date_to="2026-10-15")
+    assert [row[1] for row in rows] == ["15일 밤", "15일 0시"]
+
+
+def test_portfolio_round_trip(storage):
+    storage.save_portfolio_stock("u1", "005930", "삼성전자", 70000, 10)
+    storage.save_portfolio_stock("u1", "000660", "SK하이닉스", 120000, 3)
+    storage.save_portfolio_stock("u2", "005930", "삼성전자", 65000, 1)
+
+    assert sorted(stock["종목코드"] for stock in storage.load_portfolio_from_db("u1")) == ["000660", "005930"]
+
+    storage.delete_portfolio_stock("u1", "005930")
+    assert storage.load_portfolio_from_db("u1") == [
+        {"종목코드": "000660", "종목명": "SK하이닉스", "매입가": 120000, "수량": 3}
+    ]
+    assert len(storage.load_portfolio_from_db("u2")) == 1
+
+
+def test_user_memory(storage):
+    storage.save_dangerous_moment("u1", 7.5, "공포", "다 팔래")
+    storage.save_dangerous_moment("u1", 9.0, "복수심", "몰빵")
+    for _ in range(2):
+        storage.update_addiction_pattern("u1", 22, 4)
+    storage.update_addiction_pattern("u2", 9, 1)
+    assert storage.flush_writes()
+    storage.save_pressure_result("u1", "경고", "공포", 1)
+    storage.save_pressure_result("u1", "경고", "공포", 0)
+
+    memory = storage.get_user_memory("u1")
+    assert [row[1] for row in memory["dangerous_moments"]] == [9.0, 7.5]
+    assert memory["addiction_patterns"] == [(22, 4, "만회", 2)]
+    assert memory["pressure_effectiveness"] == {"공포": {"stopped": 1, "total": 2, "rate": 50.0}}
+
+
+def test_pattern_window_includes_latest_chat(storage):
+    _seed_chats(storage)
+
+    window = storage.load_pattern_window("u1")
+    assert [row[2] for row in window] == ["오늘은 쉬어요", "100% 확신인데 풀매수", "삼성전자 물타기 할까"]
+    assert all(row[3] == 1 for row in window)
+
+
+def test_search_escapes_percent(storage):
+    _seed_chats(storage)
+
+    results = storage.search_chats("u1", "100%")
+    assert [row[0] for row in results] == [storage.load_history_page("u1", tag="과신")[0][0][0]]
+    assert storage.search_chats("u1", "삼성전자")[0][4].startswith("**삼성전자**")
+    assert storage.search_chats("u2", "물타기") == []
+
+
+def test_weekly_report(storage, monkeypatch):
+    _seed_chats(storage)
+    storage.save_chat("u1", "한 주 전 상담", "네", 9.0, "high", ["공포"])
+    storage.save_chat("u1", "일주일 안 상담", "네", 4.0, "high", ["공포"])
+    assert storage.flush_writes()
+
+    # timestamp는 UTC - 서버 로컬 시간대(KST)와 무관하게 정확히 7일 경계
+    with storage.get_connection() as conn:
+        conn.execute("UPDATE chats SET timestamp = ? WHERE user_input = ?",
+                     (storage.utc_timestamp(timedelta(days=-7, hours=-1)), "한 주 전 상담"))
+        conn.execute("UPDATE chats SET timestamp = ? WHERE user_input = ?",
+                     (storage.utc_timestamp(timedelta(days=-6, hours=-20)), "일주일 안 상담"))
+    storage._invalidate_chat_caches({"u1"})
+    with monkeypatch.context() as m:
+        m.setenv("TZ", "Asia/Seoul")
+        time.tzset()
+        report = storage.generate_weekly_report("u1", patterns={})
+    time.tzset()
+
+    assert report["total_chats"] == 4
+    assert report["high_risk_count"] == 2   # 'HIGH'와 저장 형식 'high' 모두
+    assert report["most_dangerous"]["score"] == 8.0
+    assert sum(day["count"] for day in report["by_day"]) == 4
+
+
+# ----------------------------------------------------------------------------
+# PostgreSQL 어댑터 (대역 기준)
+# ----------------------------------------------------------------------------
+
+def test_pg_sql_placeholders(app):
+    sql = "SELECT * FROM chats WHERE user_input LIKE ? ESCAPE '\\' AND tags = '100%' AND id = ?"
+    assert app._pg_sql(sql) == "SELECT * FROM chats WHERE user_input LIKE %s ESCAPE '\\' AND tags = '100%%' AND id = %s"
+    assert _sqlite_sql(app._pg_sql(sql)) == sql
+
+
+def test_pg_adapter_routes_and_transactions(app, monkeypatch):
+    pool = StandInPool(app.DB_PATH)
+    state = {'pool': pool, 'local': threading.local()}
+    monkeypatch.setattr(app, "DB_BACKEND", "postgres")
+    monkeypatch.setattr(app, "get_pg_pool", lambda: state)
+
+    # 같은 스레드의 중첩 호출은 바깥 연결에 합류, 시세 저장소는 항상 SQLite
+    with app.get_connection() as conn:
+        assert isinstance(conn, app.PgConnection)
+        with app.get_connection() as inner:
+            assert inner is conn
+        with app.get_connection(app.PRICE_STORE_PATH) as price_conn:
+            assert isinstance(price_conn, sqlite3.Connection)
+        cur = conn.cursor()
+        assert isinstance(cur, app.PgCursor)
+        assert cur.execute("SELECT ?, '50%'", (1,)).fetchone() == (1, "50%")
+    assert pool.borrowed == 1
+
+    # 예외 시 롤백
+    with pytest.raises(RuntimeError):
+        with app.get_connection() as conn:
+            conn.executemany("INSERT INTO portfolio (user_id, ticker, buy_price, quantity) VALUES (?, ?, ?, ?)",
+                             [["u1", "005930", 1, 1], ["u1", "000660", 1, 1]])
+            raise RuntimeError
+    with app.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM portfolio").fetchone() == (0,)
+
+    assert all("?" not in sql for sql in pool.executed)
+
+
+
+def test_missing_driver_names_the_requirements_file(app, monkeypatch):
+    monkeypatch.setattr(app, "PSYCOPG_AVAILABLE", False)
+
+    with pytest.raises(RuntimeError, match="requirements-postgres.txt"):
+        app.get_pg_pool()
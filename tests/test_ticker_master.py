@@ -0,0 +1,118 @@
+"""종목 마스터 - pykrx 전 종목 목록 저장/교체, 종목명 조회와 퍼지 매칭 반영 (가짜 pykrx)"""
+import threading
+from datetime import datetime
+
+import pytest
+
+
+class FakePykrx:
+    """get_market_ticker_list / get_market_ticker_name만 흉내"""
+
+    def __init__(self):
+        self.listing = {
+            "KOSPI": {"005930": "삼성전자", "123450": "가나다전자"},
+            "KOSDAQ": {"247540": "에코프로비엠"},
+        }
+        self.list_calls = 0
+
+    def get_market_ticker_list(self, day, market="KOSPI"):
+        self.list_calls += 1
+        return list(self.listing[market])
+
+    def get_market_ticker_name(self, ticker):
+        return next(names[ticker] for names in self.listing.values() if ticker in names)
+
+
+@pytest.fixture
+def pykrx(app, monkeypatch):
+    fake = FakePykrx()
+    monkeypatch.setattr(app, "pykrx_stock", fake)
+    monkeypatch.setattr(app, "PYKRX_AVAILABLE", True)
+    return fake
+
+
+def new_master(app):
+    """백그라운드 스레드 없이 저장소에서 로드한 마스터"""
+    master = {"lock": threading.Lock(), "version": 0, "listed_date": None, "by_code": {}, "by_name": {}}
+    app._publish_ticker_master(master, *app._load_ticker_master_rows())
+    return master
+
+
+def kst(app, text):
+    return datetime.fromisoformat(text).replace(tzinfo=app.KST)
+
+
+def test_empty_store_uses_builtin_names(app):
+    master = app.get_ticker_master()
+    assert master["listed_date"] is None
+    assert master["by_name"]["삼성전자"] == "005930"
+    assert app.get_ticker_name("005930") == "삼성전자"
+    assert app.get_ticker_name("999999") == ""
+
+
+def test_refresh_persists_and_bumps_version(app, pykrx):
+    master = new_master(app)
+    version = master["version"]
+
+    assert app.refresh_ticker_master(master, kst(app, "2026-10-15 10:00"))
+    assert master["version"] == version + 1
+    assert master["listed_date"] == "2026-10-15"
+    assert master["by_code"]["123450"] == "가나다전자"
+    assert master["by_name"]["카카오"] == "035720"   # 내장 종목은 유지
+
+    # 같은 거래일이면 다시 받지 않음
+    calls = pykrx.list_calls
+    assert not app.refresh_ticker_master(master, kst(app, "2026-10-15 14:00"))
+    assert pykrx.list_calls == calls
+
+    # 재시작하면 저장소에서 바로 로드
+    reloaded = new_master(app)
+    assert reloaded["listed_date"] == "2026-10-15"
+    assert reloaded["by_code"]["247540"] == "에코프로비엠"
+
+
+def test_fuzzy_index_follows_master_version(app):
+    assert app.find_similar_stock("가나다전자") != [("가나다전자", "123450", 1.0)]
+
+    app._publish_ticker_master(app.get_ticker_master(), [("123450", "가나다전자")], "2026-10-15")
+
+    assert app.find_similar_stock("가나다전자") == [("가나다전자", "123450", 1.0)]
+    assert app.find_similar_stock("가나다젼자")[0][:2] == ("가나다전자", "123450")
+
+
+def test_fallback_quotes_cover_master_tickers_only(app, pykrx):
+    app.refresh_ticker_master(app.get_ticker_master(), kst(app, "2026-10-15 10:00"))
+    with app.get_connection(app.PRICE_STORE_PATH) as conn:
+        conn.executemany("INSERT INTO daily_closes (ticker, trade_date, close) VALUES (?, '2026-10-14', 5000)",
+                         [("123450",), ("999999",)])
+
+    quote = app.get_mock_stock_data("123450")
+    assert (quote["종목명"], quote["현재가"], quote["등락률"]) == ("가나다전자", 5000, 0.0)
+    assert app.get_mock_stock_data("999999") is None
+
+
+class StopWorker(Exception):
+    """워커 루프를 첫 대기에서 끝내기 위한 예외"""
+
+
+def test_failed_refresh_is_logged_and_retried_later(app, pykrx, monkeypatch, caplog):
+    def broken_list(day, market="KOSPI"):
+        raise ConnectionError("KRX 응답 없음")
+
+    real_sleep = app.time.sleep
+
+    def stop_on_main_thread(seconds):
+        if threading.current_thread() is threading.main_thread():
+            raise StopWorker
+        real_sleep(seconds)
+
+    monkeypatch.setattr(pykrx, "get_market_ticker_list", broken_list)
+    monkeypatch.setattr(app.time, "sleep", stop_on_main_thread)
+    master = new_master(app)
+
+    with pytest.raises(StopWorker):
+        app._ticker_master_worker(master)
+
+    [record] = [record for record in caplog.records if record.name == "gini"]
+    assert record.exc_info[1].args == ("KRX 응답 없음",)
+    assert master["version"] == 1    # 기존 목록 그대로
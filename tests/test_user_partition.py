@@ -0,0 +1,103 @@
+"""사용자별 데이터 분리 - 조회 격리, 사용자별 캐시 무효화, 세션 사용자 결정"""
+import pytest
+import streamlit as st
+
+KIM = "kim@example.com"
+LEE = "lee@example.com"
+
+
+@pytest.fixture
+def two_users(app):
+    app.save_chat(KIM, "몰빵할까", "멈추세요", 8.0, "HIGH", ["충동"])
+    app.save_chat(KIM, "불안해요", "천천히", 6.0, "LOW", ["불안"])
+    app.save_chat(LEE, "배당 일정", "다음 달", 3.0, "LOW", ["냉정"])
+    app.update_addiction_pattern(KIM, 23, 5)
+    assert app.flush_writes()
+    return app
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """세션 사용자/URL 파라미터를 비운 뒤 테스트 후 복원"""
+    saved_user = st.session_state.get("user_id")
+    saved_params = dict(st.query_params)
+    st.session_state.pop("user_id", None)
+    st.query_params.clear()
+    yield st
+    st.query_params.clear()
+    st.query_params.update(saved_params)
+    if saved_user is not None:
+        st.session_state.user_id = saved_user
+
+
+def test_reads_see_only_own_rows(two_users):
+    app = two_users
+
+    assert [row[1] for row in app.load_history_page(KIM)[0]] == ["불안해요", "몰빵할까"]
+    assert [row[1] for row in app.load_history_page(LEE)[0]] == ["배당 일정"]
+    assert app.load_history_page("nobody") == ([], None)
+
+    assert app.get_dashboard_stats(KIM)["total_chats"] == 2
+    assert app.get_dashboard_stats(LEE)["total_chats"] == 1
+    assert app.get_user_memory(KIM)["addiction_patterns"] == [(23, 5, "만회", 1)]
+    assert app.get_user_memory(LEE)["addiction_patterns"] == []
+
+
+def test_write_invalidates_only_that_users_cache(two_users):
+    app = two_users
+    kim_before, lee_before = app.user_data_version(KIM), app.user_data_version(LEE)
+    assert len(app.load_history_page(LEE)[0]) == 1
+
+    app.save_chat(KIM, "또 떨어졌어요", "괜찮아요", 7.0, "LOW", ["분노"])
+    assert app.flush_writes()
+
+    assert app.user_data_version(KIM) != kim_before
+    assert app.user_data_version(LEE) == lee_before
+    assert len(app.load_history_page(KIM)[0]) == 3
+
+
+def test_full_rebuild_bumps_epoch_for_everyone(two_users):
+    app = two_users
+    before = {user: app.user_data_version(user) for user in (KIM, LEE)}
+
+    app._invalidate_chat_caches()
+
+    for user, (epoch, version) in before.items():
+        assert app.user_data_version(user) == (epoch + 1, version)
+
+
+def test_single_user_mode_always_uses_default(app, session, monkeypatch):
+    monkeypatch.setattr(app, "MULTI_USER", False)
+    session.query_params["user"] = "kim"
+
+    assert app.get_current_user_id() == app.DEFAULT_USER_ID
+
+
+def test_multi_user_mode_reads_url_then_creates_anonymous_id(app, session, monkeypatch):
+    monkeypatch.setattr(app, "MULTI_USER", True)
+    anonymous = "0123456789abcdef0123456789abcdef"
+    session.query_params["user"] = anonymous
+    assert app.get_current_user_id() == anonymous
+
+    # 익명 ID 형식이 아니면 (로그인 이메일 포함) 버리고 새 익명 ID를 URL에 남김
+    for requested in (KIM, "../etc/passwd"):
+        session.session_state.pop("user_id")
+        session.query_params["user"] = requested
+        user_id = app.get_current_user_id()
+        assert app.ANONYMOUS_USER_ID_PATTERN.fullmatch(user_id)
+        assert session.query_params["user"] == user_id
+
+    # 같은 세션에서는 다시 결정하지 않음
+    session.query_params["user"] = "other"
+    assert app.get_current_user_id() == user_id
+
+
+def test_only_admins_run_shared_jobs(app, monkeypatch):
+    monkeypatch.setattr(app, "MULTI_USER", False)
+    assert app.is_admin_user(app.DEFAULT_USER_ID)
+
+    monkeypatch.setattr(app, "MULTI_USER", True)
+    monkeypatch.setattr(app, "ADMIN_USERS", {"admin@example.com"})
+    assert app.is_admin_user("admin@example.com")
+    assert not app.is_admin_user(KIM)
+    assert not app.is_admin_user("0123456789abcdef0123456789abcdef")
@@ -0,0 +1,78 @@
+"""쓰기 큐 (write-behind) - 묶음 커밋, 실패 격리, 백프레셔, 배리어"""
+import queue
+import threading
+from collections import Counter
+
+USER = "default"
+
+
+def _chat_count(app):
+    with app.get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+
+
+def test_writes_are_grouped_into_transactions(app, monkeypatch):
+    batches = []
+    commit = app._commit_write_batch
+    monkeypatch.setattr(app, "_commit_write_batch", lambda batch: batches.append(len(batch)) or commit(batch))
+
+    for i in range(50):
+        app.save_chat(USER, f"질문 {i}", "답변", 5.0, "LOW", ["중립"])
+    assert app.flush_writes()
+
+    assert _chat_count(app) == 50
+    assert sum(batches) == 50 and len(batches) < 50
+    assert app.get_dashboard_stats(USER)["total_chats"] == 50
+
+
+def test_failed_write_does_not_drop_the_batch(app):
+    def broken(cur, user_id):
+        cur.execute("INSERT INTO no_such_table VALUES (1)")
+
+    app.save_chat(USER, "앞", "답변", 5.0, "LOW", ["중립"])
+    app.enqueue_write(broken, USER)
+    app.save_chat(USER, "뒤", "답변", 5.0, "LOW", ["중립"])
+    assert app.flush_writes()
+
+    assert _chat_count(app) == 2
+    assert "no_such_table" in app.get_write_queue()["last_error"]
+
+
+def test_full_queue_writes_synchronously(app, monkeypatch):
+    # 워커가 없는 꽉 찬 큐 → 호출자가 직접 기록
+    stalled = {"queue": queue.Queue(maxsize=1), "lock": threading.Lock(), "pending": Counter(), "written": 0, "last_error": None}
+    stalled["queue"].put(threading.Event())
+    with monkeypatch.context() as m:
+        m.setattr(app, "get_write_queue", lambda: stalled)
+        m.setattr(app, "DB_BUSY_TIMEOUT", 0.01)
+        app.save_chat(USER, "밀린 상담", "답변", 5.0, "LOW", ["중립"])
+
+    assert _chat_count(app) == 1
+    assert stalled["pending"][USER] == 0
+
+
+def test_pattern_window_sees_the_turn_just_saved(app):
+    app.save_chat(USER, "손실 났어", "답변", 5.0, "LOW", ["중립"])
+
+    # flush_writes를 따로 부르지 않아도 패턴 구간 조회가 배리어 역할
+    assert [row[2] for row in app.load_pattern_window(USER)] == ["손실 났어"]
+
+
+def test_flush_for_a_user_skips_the_barrier_when_nothing_is_queued(app, monkeypatch):
+    barriers = []
+    state = app.get_write_queue()
+    put = state["queue"].put
+    monkeypatch.setattr(state["queue"], "put", lambda item, **kwargs: barriers.append(item) or put(item, **kwargs))
+
+    assert app.flush_writes(USER)
+    assert barriers == []
+
+    app.save_chat(USER, "질문", "답변", 5.0, "LOW", ["중립"])
+    assert app.flush_writes("someone-else")
+    assert app.flush_writes(USER)
+    assert [type(item) for item in barriers] == [tuple, threading.Event]
+
+    # 커밋 후에는 다시 배리어 없이 반환
+    assert state["pending"] == {}
+    assert app.flush_writes(USER)
+    assert len(barriers) == 2